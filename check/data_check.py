@@ -14,6 +14,9 @@ class DataCheck:
         self.old_version_format = old_version_format
         self._format = self.data_parser_format(old_version_format=old_version_format)
         self.default_tags = tags
+        # tags of the current stage of the load shape, updated by the stage transition markers
+        self.stage_tags = {}
+        self._stage_format = self.stage_marker_format()
         self.sync_report = True
         self.db_client = DBClient(db_name="fouram")
         self.read_client = StreamRead(file_path=file_path, interval=interval)
@@ -66,8 +69,29 @@ class DataCheck:
         new_format += _float + _space + _float + _space
         return old_format if old_version_format else new_format
 
+    @staticmethod
+    def stage_marker_format():
+        """ Stage transition markers of the load shape, logged by LoadStageStats """
+        return r'\[\s{0,10}(?P<dt>\d+-\d+-\d+\s+\d+:\d+:\d+)[.,]\d+[^\n]*?\[LoadShape\] Stage transition: ' \
+               r'stage=(?P<stage>\S+) index=(?P<index>\d+) users=(?P<users>\d+)'
+
     def data_read(self, content: str) -> list:
-        return re.findall(re.compile(self._format, re.I), content)
+        return [m.group(0) for m in re.finditer(
+            re.compile("(?:{0})|(?:{1})".format(self._format, self._stage_format), re.I), content)]
+
+    def parser_stage(self, str_content: str):
+        m = re.match(self._stage_format, str_content, re.I)
+        if m is None:
+            return False
+        self.stage_tags = {"load_stage": m.group("stage")}
+        _time = m.group("dt").split()[0] + 'T' + m.group("dt").split()[-1] + 'Z'
+        # a point marking the transition, and the following stats are tagged with the stage
+        tags = {'method': 'locust', 'api_name': 'stage_transition'}
+        tags.update(self.default_tags)
+        tags.update(self.stage_tags)
+        self.db_client.influx_insert(tags=tags, fields={'stage_index': int(m.group("index")),
+                                                        'users': int(m.group("users"))}, time=_time)
+        return True
 
     def parser_content(self, str_content: str):
         if self.old_version_format:
@@ -90,6 +114,8 @@ class DataCheck:
     def data_parser(self, content: str):
         _contents = self.data_read(content)
         for _c in _contents:
+            if self.parser_stage(_c):
+                continue
             dt, k, _p = self.parser_content(_c)
             if dt is None:
                 continue
@@ -100,6 +126,7 @@ class DataCheck:
                 tags, fields = self.report_data_format(*_p)
                 # update tag
                 tags.update(self.default_tags)
+                tags.update(self.stage_tags)
                 self.db_client.influx_insert(tags=tags, fields=fields, time=_time)
             except Exception as e:
                 raise Exception("[DataCheck] Parser report data raise error: {0}, content:{1}".format(e, _c))
@@ -1,5 +1,7 @@
 from client.cases.accuracy_cases import AccCases
-from client.cases.common_cases import InsertBatch, BuildIndex, Load, Query, Search, SearchRecall
-from client.cases.concurrent_cases import GoBenchCases, ConcurrentClientBase
+from client.cases.common_cases import (
+    InsertBatch, InsertBatchTuner, BulkInsert, BuildIndex, Load, Query, Search, SearchRecall)
+from client.cases.concurrent_cases import GoBenchCases, ConcurrentClientBase, SearchPareto
 
-__all__ = [AccCases, InsertBatch, BuildIndex, Load, Query, Search, SearchRecall, GoBenchCases, ConcurrentClientBase]
+__all__ = [AccCases, InsertBatch, InsertBatchTuner, BulkInsert, BuildIndex, Load, Query, Search, SearchRecall,
+           GoBenchCases, ConcurrentClientBase, SearchPareto]
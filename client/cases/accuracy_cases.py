@@ -1,6 +1,5 @@
 import numpy as np
 import copy
-import time
 
 from client.cases.base import Base
 from client.cases.case_report import CasesReport
@@ -8,9 +7,11 @@ from client.parameters import params_name as pn
 from client.parameters.params import ParamsFormat, ParamsBase
 from client.util.params_check import check_params
 from client.common.common_type import Precision, CaseIterParams
+from client.common.common_type import DefaultValue as dv
+from client.common.common_measurement import MeasurementRunner
 from client.common.common_func import (
-    get_source_file, read_ann_hdf5_file, normalize_data, get_acc_metric_type, gen_combinations, update_dict_value,
-    get_vector_type, get_default_field_name, get_search_ids, get_recall_value, get_input_params)
+    get_source_file, read_ann_hdf5_file, read_ann_train_chunks, read_ann_cached_file, normalize_data,
+    get_acc_metric_type, gen_combinations, update_dict_value, get_vector_type, get_default_field_name, get_search_ids, get_recall_value, get_input_params)
 
 from utils.util_log import log
 
@@ -19,7 +20,7 @@ class CommonCases(Base):
     """
     neighbors: used to compare with search results, topk <= columns(100), nq <= rows(10000)
     test: vector argument for search
-    train: vector to insert into database
+    train: vector to insert into database, memory-mapped from the normalized cache or read chunk by chunk while inserting
     distances: dis between neighbors and test
     """
 
@@ -35,16 +36,24 @@ class CommonCases(Base):
 
     def parsing_file(self, file_name, metric_type=""):
         src_file = get_source_file(file_name)
-        data_set = read_ann_hdf5_file(src_file)
         metric_type = metric_type or get_acc_metric_type(file_name)
         vector_type = get_vector_type(file_name.split('-')[0])
 
+        if self.params_obj.dataset_params.get(pn.ann_cache, dv.default_ann_cache):
+            cache = read_ann_cached_file(src_file, metric_type)
+            if cache is not None:
+                # normalized arrays are memory-mapped from the cache, binary vectors are packed into uint8
+                self.dataset_neighbors = cache[pn.neighbors]
+                self.dataset_test = cache[pn.test] if cache[pn.test].dtype != np.uint8 else [
+                    bytes(v) for v in cache[pn.test]]
+                self.dataset_train = cache[pn.train]
+                return metric_type, vector_type
+
+        data_set = read_ann_hdf5_file(src_file)
         self.dataset_neighbors = np.array(data_set[pn.neighbors])
         self.dataset_test = normalize_data(metric_type, np.array(data_set[pn.test]))
-        self.dataset_train = normalize_data(metric_type, np.array(data_set[pn.train]))
-        if len(self.dataset_train) != data_set["train"].shape[0]:
-            raise Exception("[AccCases] Row count of insert vectors: %d is not equal to dataset size: %d" % (
-                len(self.dataset_train), data_set["train"].shape[0]))
+        # train vectors are not loaded into memory, they are read and normalized by chunks while inserting
+        self.dataset_train = data_set
         return metric_type, vector_type
 
     def parsing_params(self, params):
@@ -74,10 +83,15 @@ class CommonCases(Base):
             self.create_collection(**_collection_params)
             self.get_collection_schema()
 
-            # insert vectors
-            res_insert = self.ann_insert(source_vectors=self.dataset_train,
-                                         ni=self.params_obj.dataset_params[pn.ni_per],
-                                         scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}))
+            # insert vectors, chunks are aligned with batches to avoid concatenating
+            ni = int(self.params_obj.dataset_params[pn.ni_per])
+            chunk_rows = max(dv.default_ann_chunk_rows // ni, 1) * ni
+            cached = isinstance(self.dataset_train, np.ndarray)
+            res_insert = self.ann_insert(
+                source_vectors=self.dataset_train if cached else read_ann_train_chunks(
+                    self.dataset_train, metric_type, chunk_rows),
+                ni=ni, scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}),
+                size=len(self.dataset_train) if cached else self.dataset_train[pn.train].shape[0])
             self.case_report.add_attr(**res_insert)
 
             if self.params_obj.flush_params.get(pn.prepare_flush, True):
@@ -187,30 +201,27 @@ class CommonCases(Base):
 
         try:
             log.info("[AccCases] Params of search: {}".format(_params))
-            start_time = time.time()
-            end_time = start_time + 500
-
-            cnt = 0
-            search_rt = []
-            while cnt < 100 and start_time < end_time:
-                res_search = self.search(**_params)
-                search_rt.append(round(res_search.rt, Precision.SEARCH_PRECISION))
-                cnt += 1
-                start_time = time.time()
+            # at most 100 searches within 500s as before, unless overwritten by measurement_params
+            search_rt, measure_report = MeasurementRunner(
+                lambda: round(self.search(**_params).rt, Precision.SEARCH_PRECISION),
+                **update_dict_value(self.params_obj.measurement_params,
+                                    {pn.max_counts: dv.default_acc_search_counts,
+                                     pn.time_budget: dv.default_acc_search_time_budget})).run()
 
             result = self.search(**_params)
             rt = result.rt
             search_rt.append(rt)
 
-            result_ids = get_search_ids(result.response)
-            acc_value = get_recall_value(self.dataset_neighbors[:nq, :top_k].tolist(), result_ids)
+            result_ids = get_search_ids(result.response, limit=top_k)
+            acc_value = get_recall_value(self.dataset_neighbors[:nq, :top_k], result_ids)
 
-            search_res = {"Recall": acc_value,
-                          "RT": round(float(np.mean(search_rt)), Precision.SEARCH_PRECISION),
-                          "LastRT": round(rt, Precision.SEARCH_PRECISION),
-                          "MinRT": round(float(np.min(search_rt)), Precision.SEARCH_PRECISION),
-                          "MaxRT": round(float(np.max(search_rt)), Precision.SEARCH_PRECISION)
-                          }
+            search_res = update_dict_value({
+                "Recall": acc_value,
+                "RT": round(float(np.mean(search_rt)), Precision.SEARCH_PRECISION),
+                "LastRT": round(rt, Precision.SEARCH_PRECISION),
+                "MinRT": round(float(np.min(search_rt)), Precision.SEARCH_PRECISION),
+                "MaxRT": round(float(np.max(search_rt)), Precision.SEARCH_PRECISION)
+            }, measure_report)
             self.case_report.add_attr(**{"search": search_res})
 
             log.info("[AccCases] Search result:{0}".format(search_res))
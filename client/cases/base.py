@@ -1,20 +1,25 @@
 import time
 import random
 import copy
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pprint import pformat
 
-from pymilvus import DefaultConfig, DataType
+from pymilvus import DefaultConfig, DataType, BulkInsertState
 
 from client.client_base import (
     ApiConnectionsWrapper, ApiCollectionWrapper, ApiIndexWrapper, ApiPartitionWrapper, ApiCollectionSchemaWrapper,
     ApiFieldSchemaWrapper, ApiUtilityWrapper, ApiRoleWrapper, ApiDBWrapper)
 from client.common.common_func import (
-    gen_collection_schema, gen_unique_str, get_file_list, read_npy_file, parser_data_size, loop_files, loop_ids,
-    gen_vectors, gen_entities, run_go_bench_process, go_bench, GoSearchParams, loop_gen_files, remove_list_values, loop_gen_parquet_files,
-    parser_segment_info, gen_scalar_values, update_dict_value, get_default_search_params, parser_search_params_expr,
+    gen_collection_schema, gen_unique_str, get_file_list, get_cohere_file_list, read_npy_file, parser_data_size, loop_files, loop_ids,
+    gen_vectors, gen_np_vectors, gen_random_seed, gen_entities, run_go_bench_process, go_bench, GoSearchParams, loop_gen_files, remove_list_values, loop_gen_parquet_arrays,
+    parser_segment_info, get_dataset_shards, get_shards_offset, split_insert_size, get_latency_percentiles, get_insert_timeline, update_dict_value, get_default_search_params, parser_search_params_expr,
     hide_dict_value, read_parquet_file)
 from client.common.common_param import TransferNodesParams, TransferReplicasParams
-from client.common.common_type import Precision, CheckTasks
+from client.common.common_reader import PrefetchFilesReader, ArraysBatchCursor, read_shards_batches, gen_scalar_values
+from client.common.common_type import (
+    Precision, CheckTasks, InsertWorkerType, TokenBucket, concurrent_global_params)
 from client.common.common_type import DefaultValue as dv
 from client.parameters.params import (
     ConcurrentTaskSearch, ConcurrentTaskQuery, ConcurrentTaskFlush, ConcurrentTaskLoad, ConcurrentTaskRelease,
@@ -293,17 +298,17 @@ class Base:
         log.info("[Base] Collection schema: {0}".format(self.collection_schema))
 
     def insert_batch(self, vectors, ids, data_size, varchar_filled=False, collection_obj: callable = None,
-                     collection_schema=None, log_level=LogLevel.INFO, insert_scalars_params={}, **kwargs):
+                     collection_schema=None, log_level=LogLevel.INFO, insert_scalars_params={},
+                     rate_limiter: TokenBucket = None, **kwargs):
         if self.collection_schema is None and collection_schema is None:
             self.get_collection_schema()
             collection_schema = self.collection_schema
         else:
             collection_schema = collection_schema or self.collection_schema
 
-        if isinstance(vectors, list):
-            entities = gen_entities(collection_schema, vectors, ids, varchar_filled, insert_scalars_params)
-        else:
-            entities = gen_entities(collection_schema, vectors.tolist(), ids, varchar_filled, insert_scalars_params)
+        entities = gen_entities(collection_schema, vectors, ids, varchar_filled, insert_scalars_params)
+        if rate_limiter is not None:
+            rate_limiter.acquire(len(ids))
 
         log.customize(log_level)(
             "[Base] Start inserting, ids: {0} - {1}, data size: {2}".format(ids[0], ids[-1], data_size))
@@ -313,81 +318,231 @@ class Base:
         return res.rt
 
     def insert(self, data_type, dim, size, ni, varchar_filled=False, collection_obj: callable = None,
-               collection_schema=None, collection_name="", log_level=LogLevel.INFO, scalars_params={}, **kwargs):
+               collection_schema=None, collection_name="", log_level=LogLevel.INFO, scalars_params={}, seed=None,
+               prefetch=dv.default_read_prefetch, insert_workers=dv.default_insert_workers,
+               worker_type=dv.default_insert_worker_type, start_id=0, target_rows_per_sec=None, burst=None,
+               **kwargs):
+        """
+        :param seed: only for data_type `local`, seed of the random vectors generator, random seed if None
+        :param prefetch: number of insert batches read ahead in the background, read synchronously if 0
+        :param insert_workers: number of workers inserting in parallel, each worker uses its own connection
+                               to insert into the collection of collection_obj, or collection_name
+        :param worker_type: thread or process
+        :param start_id: id of the first row
+        :param target_rows_per_sec: insert at a steady rate instead of as fast as possible, not limited if None
+        :param burst: maximum rows inserted ahead of the target rate, rows of one second if None
+        """
+        if int(insert_workers) > 1:
+            if collection_obj is not None:
+                # the workers insert by their own connections, so the target collection is passed by its name
+                if collection_name and collection_name != collection_obj.name:
+                    log.warning("[Base] Collection name {0} is not the name of collection_obj, insert into {1}".format(
+                        collection_name, collection_obj.name))
+                collection_name = collection_obj.name
+                collection_schema = collection_schema or collection_obj.schema.to_dict()
+            return self.parallel_insert(
+                data_type=data_type, dim=dim, size=size, ni=ni, varchar_filled=varchar_filled,
+                collection_schema=collection_schema, collection_name=collection_name, log_level=log_level,
+                scalars_params=scalars_params, seed=seed, prefetch=prefetch, insert_workers=insert_workers,
+                worker_type=worker_type, start_id=start_id, target_rows_per_sec=target_rows_per_sec, burst=burst,
+                **kwargs)
+
         data_size = parser_data_size(size)
+        collection_name = collection_name or self.collection_name
+        log.customize(log_level)(
+            "[Base] Start inserting {0} vectors to collection {1}".format(data_size, collection_name))
+
+        seed = gen_random_seed() if data_type == "local" and seed is None else seed
+        start_time = time.time()
+        batches, insert_report = self.insert_rows(
+            data_type=data_type, dim=dim, data_size=data_size, ni=ni, varchar_filled=varchar_filled,
+            collection_obj=collection_obj, collection_schema=collection_schema, log_level=log_level,
+            scalars_params=scalars_params, seed=seed, prefetch=prefetch, start_id=start_id,
+            target_rows_per_sec=target_rows_per_sec, burst=burst, **kwargs)
+
+        batch_rts = batches["rt"]
+        ni_cunt = int(data_size / int(ni)) if int(ni) != 0 else 0
+        batch_rt = sum(batch_rts[:ni_cunt])
+        total_time = round(sum(batch_rts), Precision.COMMON_PRECISION)
+        ips = round(int(data_size) / total_time, Precision.INSERT_PRECISION) if total_time != 0 else 0
+        ni_time = round(batch_rt / ni_cunt, Precision.INSERT_PRECISION) if ni_cunt != 0 else 0
+        msg = "[Base] Total time of insert: {0}s, average number of vector bars inserted per second: {1}," + \
+              " average time to insert {2} vectors per time: {3}s"
+        log.customize(log_level)(msg.format(total_time, ips, ni, ni_time))
+        insert_report.update({
+            "total_time": total_time,
+            "VPS": ips,
+            "batch_time": ni_time,
+            "batch": ni,
+            "batch_latency": get_latency_percentiles(batch_rts)
+        })
+        log.customize(log_level)("[Base] Latency of insert batches: {0}".format(insert_report["batch_latency"]))
+        if target_rows_per_sec:
+            log.customize(log_level)("[Base] Rate-limited insert report: {0}".format(insert_report))
+        # timeline of each second exposes the stalls of inserting, e.g. flush backpressure or segment sealing
+        insert_report.update(get_insert_timeline(batches, start_time))
+        return {"insert": insert_report}
+
+    def insert_rows(self, data_type, dim, data_size, ni, varchar_filled=False, collection_obj: callable = None,
+                    collection_schema=None, log_level=LogLevel.INFO, scalars_params={}, seed=None,
+                    prefetch=dv.default_read_prefetch, start_id=0, target_rows_per_sec=None, burst=None, **kwargs):
+        """
+        Insert rows [start_id, start_id + data_size) of the dataset, ids are the same as the row numbers
+        :return: ({"rt": [response time of each batch], "end_time": [timestamp], "rows": [rows of each batch]},
+                  report of the data source and the rate limiter)
+        """
         data_size_format = str(format(data_size, ',d'))
         ni_cunt = int(data_size / int(ni)) if int(ni) != 0 else 0
         last_insert = data_size % int(ni) if int(ni) != 0 else 0
 
-        batch_rt = 0
-        last_rt = 0
+        batches = {"rt": [], "end_time": [], "rows": []}
 
-        collection_name = collection_name or self.collection_name
-        log.customize(log_level)(
-            "[Base] Start inserting {0} vectors to collection {1}".format(data_size, collection_name))
+        def record(rt, rows):
+            batches["rt"].append(rt)
+            batches["end_time"].append(time.time())
+            batches["rows"].append(int(rows))
 
-        _loop_ids = loop_ids(int(ni))
-        insert_scalars_params = gen_scalar_values(scalars_params, ni)
+        _loop_ids = loop_ids(int(ni), start_id=int(start_id))
+        insert_scalars_params = gen_scalar_values(scalars_params, ni, start_row=start_id)
+        rate_limiter = TokenBucket(target_rows_per_sec, burst) if target_rows_per_sec else None
 
         if data_type == "local":
+            rng = np.random.default_rng(seed)
+            log.customize(log_level)("[Base] Seed of the local vectors generator: {0}".format(seed))
 
             for i in range(0, ni_cunt):
-                batch_rt += self.insert_batch(gen_vectors(ni, dim), next(_loop_ids), data_size_format, varchar_filled,
-                                              collection_obj, collection_schema, log_level, next(insert_scalars_params),
-                                              **kwargs)
+                record(self.insert_batch(
+                    gen_np_vectors(ni, dim, rng), next(_loop_ids), data_size_format, varchar_filled, collection_obj,
+                    collection_schema, log_level, next(insert_scalars_params), rate_limiter, **kwargs), ni)
 
             if last_insert > 0:
-                last_rt = self.insert_batch(
-                    gen_vectors(last_insert, dim), next(_loop_ids)[:last_insert], data_size_format,
-                    varchar_filled, collection_obj, collection_schema, log_level, next(insert_scalars_params), **kwargs)
-
-        else:
-            # files = get_file_list(data_size, dim, data_type)
-            # if len(files) == 0:
-            #     raise Exception("[insert] Can not get files, please check.")
-            #
-            # _loop_file = loop_files(files)
-            _loop_file = loop_gen_files(dim, data_type)
-            vectors = []
-
+                record(self.insert_batch(
+                    gen_np_vectors(last_insert, dim, rng), next(_loop_ids)[:last_insert], data_size_format,
+                    varchar_filled, collection_obj, collection_schema, log_level, next(insert_scalars_params),
+                    rate_limiter, **kwargs), last_insert)
+            return batches, {"seed": seed, **(rate_limiter.report() if rate_limiter is not None else {})}
+
+        shards = get_dataset_shards(dim, data_type, int(start_id) + data_size)
+        shards, file_offset = get_shards_offset(shards, start_id)
+        if sum(shard["rows"] for shard in shards) - file_offset < data_size:
+            msg = "[Base] The dataset {0} with dim {1} has less than {2} rows, please check.".format(
+                data_type, dim, int(start_id) + data_size)
+            log.error(msg)
+            raise Exception(msg)
+
+        # files are memory-mapped and the rows of the next batches are copied by the prefetch thread,
+        # so reading the disk is counted as the read stall instead of the insert time
+        _loop_file = PrefetchFilesReader(read_shards_batches(shards, ni, offset=file_offset, rows=data_size),
+                                         read_func=None, prefetch=prefetch)
+        vectors = ArraysBatchCursor(_loop_file)
+
+        try:
             for i in range(0, ni_cunt):
-                if len(vectors) < ni:
-                    while True:
-                        vectors.extend(read_npy_file(next(_loop_file)))
-                        if len(vectors) >= ni:
-                            break
-                batch_rt += self.insert_batch(vectors[:ni], next(_loop_ids), data_size_format, varchar_filled,
-                                              collection_obj, collection_schema, log_level, next(insert_scalars_params),
-                                              **kwargs)
-                vectors = vectors[ni:]
+                record(self.insert_batch(
+                    vectors.next_batch(ni), next(_loop_ids), data_size_format, varchar_filled, collection_obj,
+                    collection_schema, log_level, next(insert_scalars_params), rate_limiter, **kwargs), ni)
 
             if last_insert > 0:
-                if len(vectors) < last_insert:
-                    while True:
-                        vectors.extend(read_npy_file(next(_loop_file)))
-                        if len(vectors) >= last_insert:
-                            break
-                last_rt = self.insert_batch(
-                    vectors[:last_insert], next(_loop_ids)[:last_insert], data_size_format, varchar_filled,
-                    collection_obj, collection_schema, log_level, next(insert_scalars_params), **kwargs)
+                record(self.insert_batch(
+                    vectors.next_batch(last_insert), next(_loop_ids)[:last_insert], data_size_format,
+                    varchar_filled, collection_obj, collection_schema, log_level, next(insert_scalars_params),
+                    rate_limiter, **kwargs), last_insert)
+        finally:
+            _loop_file.stop()
+        read_stall_time = round(_loop_file.stall_time, Precision.COMMON_PRECISION)
+        log.customize(log_level)("[Base] Time of waiting for reading {0} batches: {1}s".format(
+            _loop_file.read_counts, read_stall_time))
+        return batches, {"read_stall_time": read_stall_time,
+                           **(rate_limiter.report() if rate_limiter is not None else {})}
+
+    def parallel_insert(self, data_type, dim, size, ni, varchar_filled=False, collection_schema=None,
+                        collection_name="", log_level=LogLevel.INFO, scalars_params={}, seed=None,
+                        prefetch=dv.default_read_prefetch, insert_workers=dv.default_insert_workers,
+                        worker_type=dv.default_insert_worker_type, start_id=0, target_rows_per_sec=None, burst=None,
+                        **kwargs):
+        """
+        Insert by multiple workers with their own connections, the workers insert disjoint ranges of ids and rows,
+        the target rate and burst are shared equally by the workers
+        """
+        data_size = parser_data_size(size)
+        collection_name = collection_name or self.collection_name
+        if self.collection_schema is None and collection_schema is None:
+            self.get_collection_schema()
+        collection_schema = collection_schema or self.collection_schema
+
+        ranges = split_insert_size(data_size, ni, insert_workers)
+        seed = gen_random_seed() if data_type == "local" and seed is None else seed
+        log.customize(log_level)("[Base] Start inserting {0} vectors to collection {1} by {2} {3} workers: {4}".format(
+            data_size, collection_name, len(ranges), worker_type, ranges))
+
+        workers_params = [dict(
+            worker_id=i, connect_params=get_connect_params(), collection_name=collection_name,
+            collection_schema=collection_schema, data_type=data_type, dim=dim, data_size=_size, ni=ni,
+            varchar_filled=varchar_filled, log_level=log_level, scalars_params=scalars_params,
+            seed=(seed + i if seed is not None else None), prefetch=prefetch, start_id=int(start_id) + _start,
+            target_rows_per_sec=(float(target_rows_per_sec) / len(ranges) if target_rows_per_sec else None),
+            burst=(float(burst) / len(ranges) if burst else None), **kwargs)
+            for i, (_start, _size) in enumerate(ranges)]
+
+        if worker_type == InsertWorkerType.THREAD:
+            executor = ThreadPoolExecutor(max_workers=len(ranges))
+        elif worker_type == InsertWorkerType.PROCESS:
+            # do not fork the grpc channels of the current process
+            executor = ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context("spawn"))
+        else:
+            msg = "[Base] Insert worker type not supported: {}".format(worker_type)
+            log.error(msg)
+            raise Exception(msg)
 
-        total_time = round((batch_rt + last_rt), Precision.COMMON_PRECISION)
+        with executor:
+            workers_result = list(executor.map(_insert_worker, workers_params))
+
+        total_time = round(max(r["end_time"] for r in workers_result) - min(r["start_time"] for r in workers_result),
+                           Precision.COMMON_PRECISION)
+        batches = {k: [v for r in workers_result for v in r["batches"][k]] for k in ["rt", "end_time", "rows"]}
+        batch_rts = batches["rt"]
         ips = round(int(data_size) / total_time, Precision.INSERT_PRECISION) if total_time != 0 else 0
-        ni_time = round(batch_rt / ni_cunt, Precision.INSERT_PRECISION) if ni_cunt != 0 else 0
-        msg = "[Base] Total time of insert: {0}s, average number of vector bars inserted per second: {1}," + \
-              " average time to insert {2} vectors per time: {3}s"
-        log.customize(log_level)(msg.format(total_time, ips, ni, ni_time))
-        return {
-            "insert": {
-                "total_time": total_time,
-                "VPS": ips,
-                "batch_time": ni_time,
-                "batch": ni
-            }
-        } 
-    
+        ni_time = round(float(np.mean(batch_rts)), Precision.INSERT_PRECISION) if len(batch_rts) != 0 else 0
+        batch_latency = get_latency_percentiles(batch_rts)
+
+        workers_report = []
+        for r in workers_result:
+            _report = {k: v for k, v in r.items() if k not in ["batches", "start_time", "end_time"]}
+            workers_report.append(_report)
+            log.customize(log_level)("[Base] Insert worker report: {0}".format(_report))
+
+        msg = "[Base] Total time of parallel insert: {0}s, average number of vector bars inserted per second: {1}," + \
+              " average time to insert {2} vectors per time: {3}s, latency of batches: {4}"
+        log.customize(log_level)(msg.format(total_time, ips, ni, ni_time, batch_latency))
+        insert_report = {
+            "total_time": total_time,
+            "VPS": ips,
+            "batch_time": ni_time,
+            "batch": ni,
+            "insert_workers": len(workers_report),
+            "worker_type": worker_type,
+            "batch_latency": batch_latency,
+            "workers": workers_report,
+            **get_insert_timeline(batches, min(r["start_time"] for r in workers_result))
+        }
+        if data_type == "local":
+            insert_report.update({"seed": seed})
+        if target_rows_per_sec:
+            insert_report.update({
+                "target_rows_per_sec": float(target_rows_per_sec),
+                "burst": float(burst or target_rows_per_sec),
+                "achieved_rows_per_sec": ips,
+                "lag": {"max": max(r["lag"]["max"] for r in workers_report),
+                        "final": max(r["lag"]["final"] for r in workers_report)}
+            })
+        return {"insert": insert_report}
+
     def insert_cohere(self, data_type, dim, size, ni, varchar_filled=False, collection_obj: callable = None,
-               collection_schema=None, collection_name="", log_level=LogLevel.INFO, scalars_params={}, **kwargs):
+                      collection_schema=None, collection_name="", log_level=LogLevel.INFO, scalars_params={},
+                      prefetch=dv.default_read_prefetch, **kwargs):
+        """
+        :param prefetch: number of parquet record batches read ahead in the background, read synchronously if 0
+        """
         data_size = parser_data_size(size)
         data_size_format = str(format(data_size, ',d'))
         ni_cunt = int(data_size / int(ni)) if int(ni) != 0 else 0
@@ -403,30 +558,30 @@ class Base:
         _loop_ids = loop_ids(int(ni))
         insert_scalars_params = gen_scalar_values(scalars_params, ni)
 
-        
-        _loop_file = loop_gen_parquet_files(dim, data_type)
-        vectors = []
-
-        for i in range(0, ni_cunt):
-            if len(vectors) < ni:
-                while True:
-                    vectors.extend(read_parquet_file(next(_loop_file)))
-                    if len(vectors) >= ni:
-                        break
-            batch_rt += self.insert_batch(vectors[:ni], next(_loop_ids), data_size_format, varchar_filled,
-                                            collection_obj, collection_schema, log_level, next(insert_scalars_params),
-                                            **kwargs)
-            vectors = vectors[ni:]
+        files = get_cohere_file_list(data_size, dim, data_type)
+        if len(files) == 0:
+            raise Exception("[insert_cohere] Can not get files, please check.")
 
-        if last_insert > 0:
-            if len(vectors) < last_insert:
-                while True:
-                    vectors.extend(read_parquet_file(next(_loop_file)))
-                    if len(vectors) >= last_insert:
-                        break
-            last_rt = self.insert_batch(
-                vectors[:last_insert], next(_loop_ids)[:last_insert], data_size_format, varchar_filled,
-                collection_obj, collection_schema, log_level, next(insert_scalars_params), **kwargs)
+        # parquet files are streamed by record batches of ni rows and converted to float32 arrays
+        _loop_file = PrefetchFilesReader(loop_gen_parquet_arrays(files, batch_size=ni), read_func=None,
+                                         prefetch=prefetch)
+        vectors = ArraysBatchCursor(_loop_file)
+
+        try:
+            for i in range(0, ni_cunt):
+                batch_rt += self.insert_batch(vectors.next_batch(ni), next(_loop_ids), data_size_format,
+                                              varchar_filled, collection_obj, collection_schema, log_level,
+                                              next(insert_scalars_params), **kwargs)
+
+            if last_insert > 0:
+                last_rt = self.insert_batch(
+                    vectors.next_batch(last_insert), next(_loop_ids)[:last_insert], data_size_format, varchar_filled,
+                    collection_obj, collection_schema, log_level, next(insert_scalars_params), **kwargs)
+        finally:
+            _loop_file.stop()
+        read_stall_time = round(_loop_file.stall_time, Precision.COMMON_PRECISION)
+        log.customize(log_level)("[Base] Time of waiting for reading {0} record batches: {1}s".format(
+            _loop_file.read_counts, read_stall_time))
 
         total_time = round((batch_rt + last_rt), Precision.COMMON_PRECISION)
         ips = round(int(data_size) / total_time, Precision.INSERT_PRECISION) if total_time != 0 else 0
@@ -439,13 +594,90 @@ class Base:
                 "total_time": total_time,
                 "VPS": ips,
                 "batch_time": ni_time,
-                "batch": ni
+                "batch": ni,
+                "read_stall_time": read_stall_time
             }
-        } 
-    
-    
-    def ann_insert(self, source_vectors, ni=100, scalars_params={}):
-        size = len(source_vectors)
+        }
+
+    def bulk_insert(self, tasks_files: list, tasks_rows: list, bulk_insert_tasks=dv.default_bulk_insert_tasks,
+                    collection_name="", timeout=dv.default_bulk_insert_timeout, log_level=LogLevel.INFO):
+        """
+        Submit bulk insert tasks and keep at most `bulk_insert_tasks` tasks running,
+        the states of the tasks are polled with backoff until all tasks are completed
+
+        :param tasks_files: files of each task in the bucket of Milvus
+        :param tasks_rows: rows of each task
+        """
+        collection_name = collection_name or self.collection_name
+        pending = list(range(len(tasks_files)))
+        running, finished = {}, []
+        interval = dv.bulk_insert_poll_interval
+
+        log.customize(log_level)("[Base] Start bulk inserting {0} rows by {1} tasks to collection {2}".format(
+            sum(tasks_rows), len(tasks_files), collection_name))
+        start = time.perf_counter()
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < int(bulk_insert_tasks):
+                i = pending.pop(0)
+                res = self.utility_wrap.do_bulk_insert(collection_name, tasks_files[i])
+                if not res.res_result:
+                    msg = "[Base] Submit bulk insert task failed: {0}".format(res.response)
+                    log.error(msg)
+                    raise Exception(msg)
+                running[res.response] = {"task_id": res.response, "rows": tasks_rows[i],
+                                         "submit_time": time.perf_counter() - start}
+
+            time.sleep(interval)
+            state_changed = False
+            for task_id, task in list(running.items()):
+                state = self.utility_wrap.get_bulk_insert_state(task_id).response
+                _duration = round(time.perf_counter() - start - task["submit_time"], Precision.INSERT_PRECISION)
+
+                if state.state in [BulkInsertState.ImportFailed, BulkInsertState.ImportFailedAndCleaned]:
+                    msg = "[Base] Bulk insert task {0} failed: {1}".format(task_id, state.failed_reason)
+                    log.error(msg)
+                    raise Exception(msg)
+                if state.state in [BulkInsertState.ImportPersisted, BulkInsertState.ImportCompleted] and \
+                        "persisted_time" not in task:
+                    task["persisted_time"] = _duration
+                    state_changed = True
+                if state.state == BulkInsertState.ImportCompleted:
+                    # segments of the task are indexed and can be loaded
+                    task["completed_time"] = _duration
+                    finished.append(running.pop(task_id))
+                    log.customize(log_level)("[Base] Bulk insert task finished: {0}".format(task))
+
+            # poll quickly after state changes, and back off while tasks are running
+            interval = dv.bulk_insert_poll_interval if state_changed else \
+                min(interval * 2, dv.bulk_insert_max_poll_interval)
+            if time.perf_counter() - start > timeout:
+                msg = "[Base] Bulk insert tasks are not completed in {0}s: {1}".format(timeout, list(running.values()))
+                log.error(msg)
+                raise Exception(msg)
+
+        rows = sum(tasks_rows)
+        persisted_time = round(max([t["submit_time"] + t["persisted_time"] for t in finished] or [0]),
+                               Precision.INSERT_PRECISION)
+        indexed_time = round(max([t["submit_time"] + t["completed_time"] for t in finished] or [0]),
+                             Precision.INSERT_PRECISION)
+        report = {
+            "rows": rows,
+            "tasks": len(finished),
+            "bulk_insert_tasks": int(bulk_insert_tasks),
+            "RPS": round(rows / indexed_time, Precision.INSERT_PRECISION) if indexed_time != 0 else 0,
+            "time_to_persisted": persisted_time,
+            "time_to_indexed": indexed_time,
+            "task_duration": get_latency_percentiles([t["completed_time"] for t in finished]),
+        }
+        log.customize(log_level)("[Base] Bulk insert report: {0}".format(report))
+        return {"bulk_insert": report}
+
+    def ann_insert(self, source_vectors, ni=100, scalars_params={}, size=None):
+        """
+        :param source_vectors: np.ndarray, or iterator of np.ndarray chunks that are cut into batches of ni rows
+        :param size: total rows of the chunks, only needed if source_vectors is an iterator
+        """
+        size = len(source_vectors) if size is None else int(size)
         data_size_format = str(format(size, ',d'))
         ni_cunt = int(size / int(ni))
         last_insert = size % int(ni)
@@ -455,15 +687,27 @@ class Base:
 
         _loop_ids = loop_ids(int(ni))
         insert_scalars_params = gen_scalar_values(scalars_params, ni)
+        vectors = ArraysBatchCursor(iter([source_vectors]) if isinstance(source_vectors, (np.ndarray, list))
+                                    else iter(source_vectors))
+
+        def next_batch(length):
+            try:
+                batch = vectors.next_batch(length)
+            except StopIteration:
+                msg = "[Base] Row count of insert vectors is less than dataset size: %d" % size
+                log.error(msg)
+                raise Exception(msg)
+            # packed binary vectors are inserted as bytes
+            return [bytes(v) for v in batch] if isinstance(batch, np.ndarray) and batch.dtype == np.uint8 else batch
 
         log.info("[Base] Start inserting {} vectors".format(size))
 
         for i in range(ni_cunt):
-            batch_rt += self.insert_batch(source_vectors[int(i * ni):int((i + 1) * ni)], next(_loop_ids),
-                                          data_size_format, insert_scalars_params=next(insert_scalars_params))
+            batch_rt += self.insert_batch(next_batch(ni), next(_loop_ids), data_size_format,
+                                          insert_scalars_params=next(insert_scalars_params))
 
         if last_insert > 0:
-            last_rt = self.insert_batch(source_vectors[-last_insert:], next(_loop_ids)[:last_insert], data_size_format,
+            last_rt = self.insert_batch(next_batch(last_insert), next(_loop_ids)[:last_insert], data_size_format,
                                         insert_scalars_params=next(insert_scalars_params))
 
         total_time = round(batch_rt + last_rt, Precision.INSERT_PRECISION)
@@ -473,7 +717,6 @@ class Base:
                 "total_time": total_time
             }
         }
-    
 
     def build_index(self, field_name, index_type, metric_type, index_param, collection_obj: callable = None,
                     collection_name="", log_level=LogLevel.INFO):
@@ -820,6 +1063,8 @@ class Base:
 
     def concurrent_insert(self, params: ConcurrentTaskInsert):
         entities = gen_entities(self.collection_schema, params.get_vectors, params.get_ids, params.varchar_filled)
+        if params.rate_limiter is not None:
+            params.rate_limiter.acquire(params.nb)
         return self.collection_wrap.insert(entities, check_task=CheckTasks.assert_result, **params.obj_params)
     
     def concurrent_upsert(self, params: ConcurrentTaskUpsert):
@@ -892,11 +1137,12 @@ class Base:
         self.create_partition(self.collection_wrap.collection, partition_name, partition_obj=partition_obj,
                               log_level=log_level)
 
-        # insert vectors
-        self.insert(data_type="local", dim=_dim, size=params.data_size, ni=params.ni,
+        # insert vectors, ids do not overlap with the inserted rows
+        _data_size = parser_data_size(params.data_size)
+        self.insert(data_type="local", dim=_dim, size=_data_size, ni=params.ni,
                     collection_obj=self.collection_wrap, collection_name=self.collection_wrap.name,
                     collection_schema=self.collection_schema, log_level=log_level, partition_name=partition_name,
-                    **params.obj_params)
+                    start_id=concurrent_global_params.id_allocator.allocate(_data_size).start, **params.obj_params)
 
         if params.with_flush:
             self.flush_partition(partition_obj, log_level)
@@ -917,11 +1163,12 @@ class Base:
         self.create_partition(self.collection_wrap.collection, partition_name, partition_obj=partition_obj,
                               log_level=log_level)
 
-        # insert vectors
-        self.insert(data_type="local", dim=_dim, size=params.data_size, ni=params.ni,
+        # insert vectors, ids do not overlap with the inserted rows
+        _data_size = parser_data_size(params.data_size)
+        self.insert(data_type="local", dim=_dim, size=_data_size, ni=params.ni,
                     collection_obj=self.collection_wrap, collection_name=self.collection_wrap.name,
                     collection_schema=self.collection_schema, log_level=log_level, partition_name=partition_name,
-                    **params.obj_params)
+                    start_id=concurrent_global_params.id_allocator.allocate(_data_size).start, **params.obj_params)
 
         # flush partition
         self.flush_partition(partition_obj, log_level=log_level)
@@ -1151,3 +1398,46 @@ class Base:
             raise Exception("[Base] Search of concurrent_scene_search_test failed, please check.")
 
         return "[Base] concurrent_scene_search_test finished."
+
+
+def get_connect_params():
+    """ Params for connecting to the same server in a new process, where param_info is not set """
+    return {"host": param_info.param_host, "port": param_info.param_port, "uri": param_info.param_uri,
+            "token": param_info.param_token, "secure": param_info.param_secure,
+            "user": param_info.param_user, "password": param_info.param_password,
+            "db_name": param_info.param_db_name}
+
+
+def _insert_worker(params: dict):
+    """ Insert a range of rows with a new connection, run in a thread or a spawned process """
+    params = copy.deepcopy(params)
+    worker_id = params.pop("worker_id")
+    connect_params = params.pop("connect_params")
+    collection_name = params.pop("collection_name")
+    alias = "{0}_{1}".format(dv.default_insert_worker_alias, worker_id)
+
+    worker = Base()
+    worker.connect(alias=alias, log_level=LogLevel.DEBUG, **connect_params)
+    try:
+        collection_obj = ApiCollectionWrapper()
+        collection_obj.init_collection(collection_name, using=alias)
+
+        start_time = time.time()
+        batches, report = worker.insert_rows(collection_obj=collection_obj, **params)
+        end_time = time.time()
+    finally:
+        worker.remove_connect(alias=alias, log_level=LogLevel.DEBUG)
+
+    total_time = round(sum(batches["rt"]), Precision.COMMON_PRECISION)
+    report.update({
+        "worker": worker_id,
+        "start_id": params["start_id"],
+        "size": params["data_size"],
+        "total_time": total_time,
+        "VPS": round(params["data_size"] / total_time, Precision.INSERT_PRECISION) if total_time != 0 else 0,
+        "batch_latency": get_latency_percentiles(batches["rt"]),
+        "batches": batches,
+        "start_time": start_time,
+        "end_time": end_time
+    })
+    return report
@@ -1,3 +1,4 @@
+import time
 import numpy as np
 import copy
 
@@ -6,12 +7,17 @@ from client.cases.case_report import CasesReport
 from client.parameters.params import ParamsFormat, ParamsBase
 from client.parameters import params_name as pn
 from client.util.params_check import check_params
-from client.common.common_type import Precision, CaseIterParams
+from client.common.common_type import Precision, CaseIterParams, LatencyHistogram
 from client.common.common_type import DefaultValue as dv
 from client.common.common_func import (
     gen_combinations, update_dict_value, get_vector_type, get_default_field_name, get_vectors_from_binary,
-    parser_search_params_expr, get_ground_truth_ids, get_search_ids, get_recall_value, get_input_params)
+    parser_search_params_expr, get_search_ids, get_recall_value, get_input_params,
+    parser_data_size, get_schema_row_bytes, golden_section_search)
+from client.common.common_ground_truth import get_ground_truth_ids, get_filter_ground_truth_ids
+from client.common.common_bulk_insert import BulkInsertStorage, gen_bulk_insert_tasks, upload_bulk_insert_tasks
+from client.common.common_measurement import MeasurementRunner
 
+from commons.common_type import LogLevel
 from utils.util_log import log
 
 
@@ -58,17 +64,134 @@ class CommonCases(Base):
         log.info("[CommonCases] Prepare collection {0} done.".format(self.collection_wrap.name))
 
     def prepare_insert(self, data_type, dim, size, ni, varchar_filled=False):
+        if self.params_obj.bulk_insert_params.get(pn.prepare_bulk_insert, False):
+            return self.prepare_bulk_insert(data_type=data_type, dim=dim, size=size, varchar_filled=varchar_filled)
+
         varchar_filled = self.params_obj.dataset_params.get(pn.varchar_filled, varchar_filled)
         res_insert = self.insert(data_type=data_type, dim=dim, size=size, ni=ni, varchar_filled=varchar_filled,
-                                 scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}))
+                                 scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}),
+                                 seed=self.params_obj.dataset_params.get(pn.random_seed, None),
+                                 prefetch=self.params_obj.dataset_params.get(pn.read_prefetch, dv.default_read_prefetch),
+                                 insert_workers=self.params_obj.dataset_params.get(
+                                     pn.insert_workers, dv.default_insert_workers),
+                                 worker_type=self.params_obj.dataset_params.get(
+                                     pn.insert_worker_type, dv.default_insert_worker_type),
+                                 target_rows_per_sec=self.params_obj.dataset_params.get(pn.target_rows_per_sec, None),
+                                 burst=self.params_obj.dataset_params.get(pn.burst, None))
         self.case_report.add_attr(**res_insert)
     
     def prepare_insert_cohere(self, data_type, dim, size, ni, varchar_filled=False):
         varchar_filled = self.params_obj.dataset_params.get(pn.varchar_filled, varchar_filled)
-        res_insert = self.insert_cohere(data_type=data_type, dim=dim, size=size, ni=ni, varchar_filled=varchar_filled,
-                                 scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}))
+        res_insert = self.insert_cohere(
+            data_type=data_type, dim=dim, size=size, ni=ni, varchar_filled=varchar_filled,
+            scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}),
+            prefetch=self.params_obj.dataset_params.get(pn.read_prefetch, dv.default_read_prefetch))
         self.case_report.add_attr(**res_insert)
  
+    def prepare_insert_tuner(self, data_type, dim, varchar_filled=False):
+        """
+        Probe batch sizes over the collection, and search the ni with the max VPS whose TP99 of batches is within the
+        latency bound by golden-section search on log2(ni), each probe inserts probe_batches batches of new rows
+        """
+        _params = self.params_obj.insert_tuner_params
+        varchar_filled = self.params_obj.dataset_params.get(pn.varchar_filled, varchar_filled)
+        ni_min, ni_max = _params.get(pn.ni_range, dv.default_tuner_ni_range)
+        probe_batches = int(_params.get(pn.probe_batches, dv.default_tuner_probe_batches))
+        latency_bound = _params.get(pn.latency_bound, None)
+
+        # the insert request should not exceed the max message size of grpc
+        row_bytes = get_schema_row_bytes(self.collection_schema)
+        max_message_ni = int(_params.get(pn.max_message_size, dv.default_grpc_max_message_size) *
+                             dv.grpc_message_size_ratio // row_bytes)
+        ni_max = min(int(ni_max), max_message_ni)
+        if ni_max < int(ni_min):
+            msg = "[CommonCases] Max ni {0} limited by the message size is less than the min ni {1}, please check."\
+                .format(ni_max, ni_min)
+            log.error(msg)
+            raise Exception(msg)
+        log.info("[CommonCases] Bytes of each row: {0}, search ni in [{1}, {2}]".format(row_bytes, ni_min, ni_max))
+
+        probes = {}
+        inserted = 0
+
+        def probe(x):
+            nonlocal inserted
+            ni = int(round(2 ** x))
+            if ni not in probes:
+                res = self.insert(data_type=data_type, dim=dim, size=ni * probe_batches, ni=ni,
+                                  varchar_filled=varchar_filled,
+                                  scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}),
+                                  seed=self.params_obj.dataset_params.get(pn.random_seed, None), start_id=inserted,
+                                  log_level=LogLevel.DEBUG)["insert"]
+                inserted += ni * probe_batches
+                probes[ni] = {"VPS": res["VPS"], "TP99": res["batch_latency"].get("TP99", 0)}
+                log.info("[CommonCases] Probe ni: {0}, result: {1}".format(ni, probes[ni]))
+            # probes over the latency bound score below all the others, and the smaller latency the better
+            if latency_bound is not None and probes[ni]["TP99"] > latency_bound:
+                return -probes[ni]["TP99"]
+            return probes[ni]["VPS"]
+
+        golden_section_search(probe, np.log2(int(ni_min)), np.log2(ni_max),
+                              tolerance=_params.get(pn.tolerance, dv.default_tuner_tolerance),
+                              max_iterations=_params.get(pn.max_probes, dv.default_tuner_max_probes))
+
+        feasible = {k: v for k, v in probes.items() if latency_bound is None or v["TP99"] <= latency_bound}
+        if feasible:
+            best_ni = max(feasible, key=lambda k: feasible[k]["VPS"])
+        else:
+            best_ni = min(probes.keys())
+            log.warning("[CommonCases] TP99 of all probes are over the latency bound {0}s, use the min ni {1}".format(
+                latency_bound, best_ni))
+
+        curve = sorted(probes.keys())
+        res_tuner = {
+            "ni": best_ni,
+            "VPS": probes[best_ni]["VPS"],
+            "TP99": probes[best_ni]["TP99"],
+            "latency_bound": latency_bound,
+            "row_bytes": row_bytes,
+            "max_message_ni": max_message_ni,
+            "rows": inserted,
+            "curve": {"ni": curve, "VPS": [probes[k]["VPS"] for k in curve], "TP99": [probes[k]["TP99"] for k in curve]}
+        }
+        log.info("[CommonCases] Insert batch tuner result: {}".format(res_tuner))
+        self.case_report.add_attr(**{"insert_tuner": res_tuner})
+        return best_ni
+
+    def prepare_bulk_insert(self, data_type, dim, size, varchar_filled=False, bulk_insert_tasks=None):
+        """ Convert the dataset into numpy files of each field, upload to the bucket of Milvus and bulk insert """
+        _params = self.params_obj.bulk_insert_params
+        varchar_filled = self.params_obj.dataset_params.get(pn.varchar_filled, varchar_filled)
+        bulk_insert_tasks = bulk_insert_tasks or _params.get(pn.bulk_insert_tasks, dv.default_bulk_insert_tasks)
+
+        storage = BulkInsertStorage(endpoint=_params.get(pn.minio_endpoint, dv.default_minio_endpoint),
+                                    access_key=_params.get(pn.minio_access_key, dv.default_minio_access_key),
+                                    secret_key=_params.get(pn.minio_secret_key, dv.default_minio_secret_key),
+                                    bucket_name=_params.get(pn.minio_bucket_name, dv.default_minio_bucket_name),
+                                    secure=_params.get(pn.minio_secure, False))
+        remote_path = "{0}/{1}".format(_params.get(pn.remote_path, dv.default_bulk_insert_path),
+                                       self.collection_wrap.name)
+
+        tasks = gen_bulk_insert_tasks(data_type, dim, parser_data_size(size),
+                                      rows_per_task=_params.get(pn.rows_per_task, dv.default_dataset_shard_size),
+                                      seed=self.params_obj.dataset_params.get(pn.random_seed, None))
+        start = time.perf_counter()
+        tasks_files = upload_bulk_insert_tasks(
+            storage, tasks, remote_path, self.collection_schema, dim, varchar_filled=varchar_filled,
+            scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}), workers=bulk_insert_tasks)
+        upload_time = round(time.perf_counter() - start, Precision.INSERT_PRECISION)
+        log.info("[CommonCases] Upload files of {0} bulk insert tasks to {1} in {2}s".format(
+            len(tasks_files), remote_path, upload_time))
+
+        try:
+            res_bulk_insert = self.bulk_insert(tasks_files, [t["rows"] for t in tasks],
+                                               bulk_insert_tasks=bulk_insert_tasks,
+                                               timeout=_params.get(pn.timeout, dv.default_bulk_insert_timeout))
+        finally:
+            storage.remove(remote_path)
+        res_bulk_insert["bulk_insert"].update({"upload_time": upload_time})
+        self.case_report.add_attr(**res_bulk_insert)
+
     def prepare_load(self, **kwargs):
         res_load = self.load_collection(**kwargs)
         self.case_report.add_attr(**{"load": {"RT": round(res_load.rt, Precision.LOAD_PRECISION)}})
@@ -135,45 +258,82 @@ class CommonCases(Base):
         self.describe_collection_index()
         log.info("[CommonCases] Prepare scalars {0} index done.".format(scalars))
 
+    def measure_rt(self, func: callable, req_run_counts):
+        """
+        Run func req_run_counts times, or measure it by MeasurementRunner if measurement_params are set,
+        req_run_counts is the max number of samples unless max_counts is set in measurement_params
+        :return: latency histogram of the samples, report of the measurement
+        """
+        histogram = LatencyHistogram(scale=1e6)
+        if not self.params_obj.measurement_params:
+            for _ in range(req_run_counts):
+                histogram.record_value(func())
+            return histogram, {}
+        samples, measure_report = MeasurementRunner(func, **update_dict_value(
+            self.params_obj.measurement_params, {pn.max_counts: req_run_counts})).run()
+        histogram.record(samples)
+        return histogram, measure_report
+
+    @staticmethod
+    def get_rt_report(histogram: LatencyHistogram, precision: int):
+        return {"RT": round(histogram.mean, precision),
+                "MinRT": round(histogram.min, precision),
+                "MaxRT": round(histogram.max, precision),
+                **histogram.percentiles_report(precision=precision)}
+
     def prepare_query(self, req_run_counts, **kwargs):
-        query_rt = []
-        for i in range(req_run_counts):
-            res_query = self.query(**kwargs)
-            query_rt.append(round(res_query.rt, Precision.QUERY_PRECISION))
-
-        self.case_report.add_attr(**{"query": {
-            "RT": round(float(np.mean(query_rt)), Precision.QUERY_PRECISION),
-            "MinRT": round(float(np.min(query_rt)), Precision.QUERY_PRECISION),
-            "MaxRT": round(float(np.max(query_rt)), Precision.QUERY_PRECISION),
-            "TP99": round(np.percentile(query_rt, 99), Precision.QUERY_PRECISION),
-            "TP95": round(np.percentile(query_rt, 95), Precision.QUERY_PRECISION)}})
+        query_rt, measure_report = self.measure_rt(
+            lambda: round(self.query(**kwargs).rt, Precision.QUERY_PRECISION), req_run_counts)
+
+        self.case_report.add_attr(**{"query": update_dict_value(
+            measure_report, self.get_rt_report(query_rt, Precision.QUERY_PRECISION))})
         return self.case_report.to_dict(), True
 
     def prepare_search(self, req_run_counts, **kwargs):
-        search_rt = []
-        for i in range(req_run_counts):
-            res_search = self.search(**kwargs)
-            search_rt.append(round(res_search.rt, Precision.SEARCH_PRECISION))
-
-        self.case_report.add_attr(**{"search": {
-            "RT": round(float(np.mean(search_rt)), Precision.SEARCH_PRECISION),
-            "MinRT": round(float(np.min(search_rt)), Precision.SEARCH_PRECISION),
-            "MaxRT": round(float(np.max(search_rt)), Precision.SEARCH_PRECISION),
-            "TP99": round(np.percentile(search_rt, 99), Precision.SEARCH_PRECISION),
-            "TP95": round(np.percentile(search_rt, 95), Precision.SEARCH_PRECISION)}})
+        search_rt, measure_report = self.measure_rt(
+            lambda: round(self.search(**kwargs).rt, Precision.SEARCH_PRECISION), req_run_counts)
+
+        self.case_report.add_attr(**{"search": update_dict_value(
+            measure_report, self.get_rt_report(search_rt, Precision.SEARCH_PRECISION))})
         return self.case_report.to_dict(), True
 
     def prepare_search_recall(self, _nq, _top_k, **kwargs):
-        res_search = self.search(**kwargs)
-        true_ids = get_ground_truth_ids(data_size=self.params_obj.dataset_params[pn.dataset_size],
-                                        data_type=self.params_obj.dataset_params[pn.dataset_name])
-        result_ids = get_search_ids(res_search.response)
-        acc_value = get_recall_value(true_ids[:_nq, :_top_k].tolist(), result_ids)
-
-        self.case_report.add_attr(**{"search": {"Recall": acc_value,
-                                                "RT": round(res_search.rt, Precision.SEARCH_PRECISION)}})
+        self.case_report.add_attr(**{"search": self.get_search_recall(_nq, _top_k, **kwargs)})
         return self.case_report.to_dict(), True
 
+    def get_search_recall(self, _nq, _top_k, **kwargs):
+        """ Search once and calculate the recall against the ground truth """
+        res_search = self.search(**kwargs)
+        search_report = {}
+        if kwargs.get("expr", None):
+            # ground truth over the rows passing the same expression
+            true_ids, selectivity = get_filter_ground_truth_ids(
+                data_size=self.params_obj.dataset_params[pn.dataset_size],
+                data_type=self.params_obj.dataset_params[pn.dataset_name], dim=self.params_obj.dataset_params[pn.dim],
+                metric_type=self.params_obj.dataset_params[pn.metric_type], expr=kwargs["expr"],
+                collection_schema=self.collection_schema,
+                scalars_params=self.params_obj.dataset_params.get(pn.scalars_params, {}),
+                varchar_filled=self.params_obj.dataset_params.get(pn.varchar_filled, False), top_k=_top_k, nq=_nq)
+            if selectivity is not None:
+                search_report.update({"Selectivity": round(selectivity, Precision.SEARCH_PRECISION)})
+        else:
+            true_ids = get_ground_truth_ids(data_size=self.params_obj.dataset_params[pn.dataset_size],
+                                            data_type=self.params_obj.dataset_params[pn.dataset_name],
+                                            dim=self.params_obj.dataset_params[pn.dim],
+                                            metric_type=self.params_obj.dataset_params[pn.metric_type], top_k=_top_k,
+                                            nq=_nq)
+        if len(true_ids) < _nq:
+            msg = "[CommonCases] Can not get the ground truth of {0} queries, please check.".format(_nq)
+            log.error(msg)
+            raise Exception(msg)
+        result_ids = get_search_ids(res_search.response, limit=_top_k)
+        top_ks = [k for k in dv.default_recall_top_ks if k < _top_k] + [_top_k]
+        recalls = get_recall_value(true_ids[:_nq, :_top_k], result_ids, top_k=top_ks)
+
+        search_report.update({"Recall": recalls[_top_k], "RecallAtK": {str(k): v for k, v in recalls.items()},
+                              "RT": round(res_search.rt, Precision.SEARCH_PRECISION)})
+        return search_report
+
     def parser_search_params(self):
         search_params = copy.deepcopy(self.params_obj.search_params_parser(self.params_obj.search_params))
         s_p = gen_combinations({pn.top_k: search_params.pop(pn.top_k, 0),
@@ -283,6 +443,120 @@ class InsertBatch(CommonCases):
         yield True
 
 
+class InsertBatchTuner(CommonCases):
+
+    def __str__(self):
+        return """
+        1. create a collection or use an existing collection
+        2. probe insert batch sizes over the collection and converge on the ni with the max VPS
+        3. count the total number of rows
+        4. clean all collections or not
+        """
+
+    @check_params(ParamsFormat.common_scene_insert_batch_tuner)
+    def scene_insert_batch_tuner(self, **kwargs):
+        """
+        :param kwargs:
+            params: dict
+            prepare: bool
+            prepare_clean: bool
+            clean_collection: bool
+        :return:
+        """
+        # params prepare
+        params, prepare, prepare_clean, _, clean_collection = get_input_params(**kwargs)
+        log.info("[InsertBatchTuner] The detailed test steps are as follows: {}".format(self))
+
+        # params parsing
+        self.parsing_params(params)
+        vector_type = get_vector_type(self.params_obj.dataset_params[pn.dataset_name])
+        vector_default_field_name = get_default_field_name(
+            vector_type, self.params_obj.dataset_params.get(pn.vector_field_name, ""))
+
+        def run():
+            try:
+                self.prepare_collection(vector_default_field_name, prepare, prepare_clean)
+                self.prepare_insert_tuner(data_type=self.params_obj.dataset_params[pn.dataset_name],
+                                          dim=self.params_obj.dataset_params[pn.dim])
+                self.count_entities()
+                return self.case_report.to_dict(), True
+            except Exception as e:
+                log.error("[InsertBatchTuner] Insert batch tuner raise error: {}".format(e))
+                return {}, False
+
+        params_list = []
+        p = CaseIterParams(callable_object=run, actual_params_used=params, case_type=self.__class__.__name__)
+        params_list.append(p)
+        yield params_list
+
+        # clear env
+        self.clear_collections(clean_collection=clean_collection)
+        yield True
+
+
+class BulkInsert(CommonCases):
+
+    def __str__(self):
+        return """
+        1. create a collection or use an existing collection
+        2. build index on vector column or not
+        3. convert the dataset into numpy files of each field and upload to the bucket of Milvus
+        4. submit bulk insert tasks and wait until all tasks are completed
+        5. count the total number of rows
+        6. clean all collections or not
+        """
+
+    @check_params(ParamsFormat.common_scene_bulk_insert)
+    def scene_bulk_insert(self, **kwargs):
+        """
+        :param kwargs:
+            params: dict
+            prepare: bool
+            prepare_clean: bool
+            clean_collection: bool
+        :return:
+        """
+        # params prepare
+        params, prepare, prepare_clean, _, clean_collection = get_input_params(**kwargs)
+        log.info("[BulkInsert] The detailed test steps are as follows: {}".format(self))
+
+        # params parsing
+        self.parsing_params(params)
+        vector_type = get_vector_type(self.params_obj.dataset_params[pn.dataset_name])
+        vector_default_field_name = get_default_field_name(
+            vector_type, self.params_obj.dataset_params.get(pn.vector_field_name, ""))
+        bulk_insert_tasks = self.params_obj.bulk_insert_params.get(pn.bulk_insert_tasks, dv.default_bulk_insert_tasks)
+        bulk_insert_tasks = bulk_insert_tasks if isinstance(bulk_insert_tasks, list) else [bulk_insert_tasks]
+
+        def run(tasks):
+            try:
+                self.prepare_collection(vector_default_field_name, prepare, prepare_clean)
+                if self.params_obj.index_params.get(pn.index_type, None):
+                    # time to indexed includes building index of the imported segments
+                    self.prepare_index(vector_field_name=vector_default_field_name,
+                                       metric_type=self.params_obj.dataset_params[pn.metric_type])
+                self.prepare_bulk_insert(data_type=self.params_obj.dataset_params[pn.dataset_name],
+                                         dim=self.params_obj.dataset_params[pn.dim],
+                                         size=self.params_obj.dataset_params[pn.dataset_size], bulk_insert_tasks=tasks)
+                self.count_entities()
+                return self.case_report.to_dict(), True
+            except Exception as e:
+                log.error("[BulkInsert] Bulk insert raise error: {}".format(e))
+                return {}, False
+
+        params_list = []
+        for i in bulk_insert_tasks:
+            actual_params_used = update_dict_value({pn.bulk_insert_params: {pn.bulk_insert_tasks: i}}, params)
+            p = CaseIterParams(callable_object=run, object_args=[i],
+                               actual_params_used=actual_params_used, case_type=self.__class__.__name__)
+            params_list.append(p)
+        yield params_list
+
+        # clear env
+        self.clear_collections(clean_collection=clean_collection)
+        yield True
+
+
 class BuildIndex(CommonCases):
 
     def __str__(self):
@@ -1,13 +1,15 @@
 import copy
 import pandas as pd
 
-from client.common.common_type import Precision, CaseIterParams
+from client.common.common_type import Precision, CaseIterParams, ConcurrentBackend, concurrent_global_params
+from client.common.common_type import DefaultValue as dv
 from client.common.common_func import (
     gen_combinations, get_vector_type, get_default_field_name, GoSearchParams, parser_time, update_dict_value,
-    get_input_params)
+    get_input_params, parser_data_size, get_pareto_frontier)
 from client.util.params_check import check_params
 from client.util.api_request import info_logout
 from client.cases.common_cases import CommonCases
+from client.cases.case_report import CasesReport
 from client.parameters import params_name as pn
 from client.parameters.params import (
     ParamsFormat, ConcurrentObjParams, ConcurrentTasksParams, DataClassBase,
@@ -261,6 +263,26 @@ class ConcurrentClientBase(CommonCases):
             tasks_dict.update({task["type"]: ConcurrentObjParams(**task)})
         return ConcurrentTasksParams(**tasks_dict)
 
+    @staticmethod
+    def init_concurrent_backend(backend: str = dv.default_concurrent_backend):
+        """
+        :param backend: locust: gevent users of locust, the process is monkey patched;
+                        thread: asyncio users sending requests in a thread pool, without monkey patching
+        :return: runner class of the backend
+        """
+        if backend == ConcurrentBackend.THREAD:
+            from client.concurrent.thread_runner import ThreadRunner
+            return ThreadRunner
+        elif backend != ConcurrentBackend.LOCUST:
+            msg = "[ConcurrentClientBase] Concurrent backend:{0} not support, please check!!!".format(backend)
+            log.error(msg)
+            raise Exception(msg)
+
+        from client.concurrent.gevent_patch import patch_gevent
+        patch_gevent(param_info.locust_patch_switch)
+        from client.concurrent.locust_runner import LocustRunner
+        return LocustRunner
+
     @check_params(ParamsFormat.common_concurrent)
     def scene_concurrent_locust(self, **kwargs):
         """
@@ -272,20 +294,14 @@ class ConcurrentClientBase(CommonCases):
             clean_collection: bool
         :return:
         """
-        from gevent import monkey
-        _patch_params = {} if param_info.locust_patch_switch else {"ssl": False}
-        monkey.patch_all(**_patch_params)
-        # from requests.packages.urllib3.util.ssl_ import create_urllib3_context; create_urllib3_context()
-        import grpc.experimental.gevent as grpc_gevent
-        grpc_gevent.init_gevent()
-        from client.concurrent.locust_runner import LocustRunner
-
         # params prepare
         params, prepare, prepare_clean, rebuild_index, clean_collection = get_input_params(**kwargs)
         log.info("[ConcurrentClientBase] The detailed test steps are as follows: {}".format(self))
 
         # params parsing
         self.parsing_params(params)
+        concurrent_runner = self.init_concurrent_backend(
+            self.params_obj.concurrent_params.get(pn.concurrent_backend, dv.default_concurrent_backend))
         vector_type = get_vector_type(self.params_obj.dataset_params[pn.dataset_name])
         vector_default_field_name = get_default_field_name(
             vector_type, self.params_obj.dataset_params.get(pn.vector_field_name, ""))
@@ -328,6 +344,10 @@ class ConcurrentClientBase(CommonCases):
                                show_resource_groups=self.params_obj.dataset_params.get(pn.show_resource_groups, True),
                                show_db_user=self.params_obj.dataset_params.get(pn.show_db_user, False))
 
+        # ids of concurrent insert and upsert requests start after the inserted dataset
+        concurrent_global_params.id_allocator.reset(
+            start=parser_data_size(self.params_obj.dataset_params[pn.dataset_size]))
+
         # set output log
         info_logout.reset_output()
 
@@ -336,17 +356,30 @@ class ConcurrentClientBase(CommonCases):
         params_list = []
         for c_p in c_params:
             spawn_rate = c_p[pn.spawn_rate] if pn.spawn_rate in c_p else None
-            con_client = LocustRunner(obj=self, obj_params=obj_params,
-                                      interval=c_p[pn.interval], during_time=parser_time(c_p[pn.during_time]),
-                                      concurrent_number=c_p[pn.concurrent_number], spawn_rate=spawn_rate)
+            locust_workers = c_p.get(pn.locust_workers, dv.default_locust_workers)
+            arrival_rates = c_p.get(pn.arrival_rates, {})
+            arrival_distribution = c_p.get(pn.arrival_distribution, dv.default_arrival_distribution)
+            load_shape = c_p.get(pn.load_shape, {})
+            con_client = concurrent_runner(obj=self, obj_params=obj_params,
+                                           interval=c_p[pn.interval], during_time=parser_time(c_p[pn.during_time]),
+                                           concurrent_number=c_p[pn.concurrent_number], spawn_rate=spawn_rate,
+                                           workers=locust_workers, arrival_rates=arrival_rates,
+                                           arrival_distribution=arrival_distribution, load_shape=load_shape)
 
             actual_params_used = copy.deepcopy(params)
             actual_params_used[pn.concurrent_params] = {
                 pn.concurrent_number: c_p[pn.concurrent_number],
                 pn.during_time: c_p[pn.during_time],
                 pn.interval: c_p[pn.interval],
-                pn.spawn_rate: spawn_rate
+                pn.spawn_rate: spawn_rate,
+                pn.locust_workers: locust_workers,
+                pn.concurrent_backend: c_p.get(pn.concurrent_backend, dv.default_concurrent_backend)
             }
+            if arrival_rates:
+                actual_params_used[pn.concurrent_params].update({pn.arrival_rates: arrival_rates,
+                                                                 pn.arrival_distribution: arrival_distribution})
+            if load_shape:
+                actual_params_used[pn.concurrent_params].update({pn.load_shape: load_shape})
             p = CaseIterParams(callable_object=con_client.start_runner, object_args=[self.case_report],
                                actual_params_used=actual_params_used, case_type=self.__class__.__name__)
             params_list.append(p)
@@ -372,20 +405,14 @@ class ConcurrentClientBase(CommonCases):
             clean_collection: bool
         :return:
         """
-        from gevent import monkey
-        _patch_params = {} if param_info.locust_patch_switch else {"ssl": False}
-        monkey.patch_all(**_patch_params)
-        # from requests.packages.urllib3.util.ssl_ import create_urllib3_context; create_urllib3_context()
-        import grpc.experimental.gevent as grpc_gevent
-        grpc_gevent.init_gevent()
-        from client.concurrent.locust_runner import LocustRunner
-
         # params prepare
         params, prepare, prepare_clean, rebuild_index, clean_collection = get_input_params(**kwargs)
         log.info("[ConcurrentClientBase] The detailed test steps are as follows: {}".format(self))
 
         # params parsing
         self.parsing_params(params)
+        concurrent_runner = self.init_concurrent_backend(
+            self.params_obj.concurrent_params.get(pn.concurrent_backend, dv.default_concurrent_backend))
         vector_type = get_vector_type(self.params_obj.dataset_params[pn.dataset_name])
         vector_default_field_name = get_default_field_name(
             vector_type, self.params_obj.dataset_params.get(pn.vector_field_name, ""))
@@ -428,6 +455,10 @@ class ConcurrentClientBase(CommonCases):
                                show_resource_groups=self.params_obj.dataset_params.get(pn.show_resource_groups, True),
                                show_db_user=self.params_obj.dataset_params.get(pn.show_db_user, False))
 
+        # ids of concurrent insert and upsert requests start after the inserted dataset
+        concurrent_global_params.id_allocator.reset(
+            start=parser_data_size(self.params_obj.dataset_params[pn.dataset_size]))
+
         # set output log
         info_logout.reset_output()
 
@@ -436,17 +467,30 @@ class ConcurrentClientBase(CommonCases):
         params_list = []
         for c_p in c_params:
             spawn_rate = c_p[pn.spawn_rate] if pn.spawn_rate in c_p else None
-            con_client = LocustRunner(obj=self, obj_params=obj_params,
-                                      interval=c_p[pn.interval], during_time=parser_time(c_p[pn.during_time]),
-                                      concurrent_number=c_p[pn.concurrent_number], spawn_rate=spawn_rate)
+            locust_workers = c_p.get(pn.locust_workers, dv.default_locust_workers)
+            arrival_rates = c_p.get(pn.arrival_rates, {})
+            arrival_distribution = c_p.get(pn.arrival_distribution, dv.default_arrival_distribution)
+            load_shape = c_p.get(pn.load_shape, {})
+            con_client = concurrent_runner(obj=self, obj_params=obj_params,
+                                           interval=c_p[pn.interval], during_time=parser_time(c_p[pn.during_time]),
+                                           concurrent_number=c_p[pn.concurrent_number], spawn_rate=spawn_rate,
+                                           workers=locust_workers, arrival_rates=arrival_rates,
+                                           arrival_distribution=arrival_distribution, load_shape=load_shape)
 
             actual_params_used = copy.deepcopy(params)
             actual_params_used[pn.concurrent_params] = {
                 pn.concurrent_number: c_p[pn.concurrent_number],
                 pn.during_time: c_p[pn.during_time],
                 pn.interval: c_p[pn.interval],
-                pn.spawn_rate: spawn_rate
+                pn.spawn_rate: spawn_rate,
+                pn.locust_workers: locust_workers,
+                pn.concurrent_backend: c_p.get(pn.concurrent_backend, dv.default_concurrent_backend)
             }
+            if arrival_rates:
+                actual_params_used[pn.concurrent_params].update({pn.arrival_rates: arrival_rates,
+                                                                 pn.arrival_distribution: arrival_distribution})
+            if load_shape:
+                actual_params_used[pn.concurrent_params].update({pn.load_shape: load_shape})
             p = CaseIterParams(callable_object=con_client.start_runner, object_args=[self.case_report],
                                actual_params_used=actual_params_used, case_type=self.__class__.__name__)
             params_list.append(p)
@@ -459,3 +503,180 @@ class ConcurrentClientBase(CommonCases):
         # clear env
         self.clear_collections(clean_collection=clean_collection)
         yield True
+
+
+class SearchPareto(ConcurrentClientBase):
+
+    def __str__(self):
+        return """
+        1. create a collection or use an existing collection
+        2. build index on vector column
+        3. insert a certain number of vectors
+        4. flush collection
+        5. build index on vector column with the same parameters
+        6. build index on on scalars column or not
+        7. count the total number of rows
+        8. load collection
+        9. sweep search_param, calculate recall and concurrent search RPS of each search_param
+        10. get the pareto frontier of recall and RPS
+        11. clean all collections or not
+        """
+
+    def parser_pareto_params(self):
+        """ Search params except search_param are combined, and each combination sweeps all the search_param """
+        search_params = copy.deepcopy(self.params_obj.search_params)
+        search_param_list = gen_combinations(search_params.pop(pn.search_param, {}))
+        s_p = gen_combinations({pn.top_k: search_params.pop(pn.top_k, 0),
+                                pn.nq: search_params.pop(pn.nq, 0),
+                                pn.expr: search_params.pop(pn.expr, None)})
+        sweep_params_list = []
+        for s in s_p:
+            s.update(search_params)
+            sweep_params_list.append([update_dict_value({pn.search_param: p}, s) for p in search_param_list])
+        return sweep_params_list
+
+    def prepare_search_pareto(self, _nq, _top_k, sweep_params: list, concurrent_params: dict,
+                              concurrent_runner: type = None):
+        """
+        Each point of the sweep measures the recall of one search and the RPS of concurrent search,
+        the points which can not get higher recall without losing RPS make up the pareto frontier
+        :param concurrent_runner: runner class of the concurrent backend, initialized by concurrent_params if None
+        """
+        concurrent_runner = concurrent_runner or self.init_concurrent_backend(
+            concurrent_params.get(pn.concurrent_backend, dv.default_concurrent_backend))
+
+        points = []
+        check_result = True
+        for search_param, _params in sweep_params:
+            recall = self.get_search_recall(_nq, _top_k, **_params)["Recall"]
+
+            obj_params = ConcurrentTasksParams(search=ConcurrentObjParams(
+                type=pn.search, weight=1, params=ConcurrentTaskSearch(**_params)))
+            con_client = concurrent_runner(obj=self, obj_params=obj_params, interval=concurrent_params[pn.interval],
+                                           during_time=parser_time(concurrent_params[pn.during_time]),
+                                           concurrent_number=concurrent_params[pn.concurrent_number],
+                                           spawn_rate=concurrent_params[pn.spawn_rate],
+                                           workers=concurrent_params[pn.locust_workers])
+            res_locust, result = con_client.start_runner(CasesReport())
+            check_result = check_result and result
+
+            res_search = res_locust["Locust"][pn.search]
+            point = {"search_param": search_param, "Recall": recall, "RPS": res_search["RPS"],
+                     "TP99": res_search["TP99"], "RT_avg": res_search["RT_avg"], "fail_s": res_search["fail_s"]}
+            log.info("[SearchPareto] Result of search_param {0}: {1}".format(search_param, point))
+            points.append(point)
+
+        frontier = get_pareto_frontier(points, x="Recall", y="RPS")
+        for i, point in enumerate(points):
+            point["pareto"] = i in frontier
+        frontier_points = [points[i] for i in frontier]
+        log.info("[SearchPareto] Pareto frontier of recall and RPS:\n{}".format(pd.DataFrame(
+            [update_dict_value({"Recall": p["Recall"], "RPS": p["RPS"], "TP99": p["TP99"]}, p["search_param"])
+             for p in frontier_points]).to_string(index=False)))
+
+        self.case_report.add_attr(**{"pareto": {
+            "points": points,
+            "frontier": frontier_points,
+            # chart-ready array of the frontier in descending order of recall
+            "chart": {"columns": ["Recall", "RPS", "TP99"],
+                      "data": [[p["Recall"], p["RPS"], p["TP99"]] for p in frontier_points]}
+        }})
+        return self.case_report.to_dict(), check_result
+
+    @check_params(ParamsFormat.common_scene_search_pareto)
+    def scene_search_pareto(self, **kwargs):
+        """
+        :param kwargs:
+            params: dict
+            prepare: bool
+            prepare_clean: bool
+            rebuild_index: bool
+            clean_collection: bool
+        :return:
+        """
+        # params prepare
+        params, prepare, prepare_clean, rebuild_index, clean_collection = get_input_params(**kwargs)
+        log.info("[SearchPareto] The detailed test steps are as follows: {}".format(self))
+
+        # params parsing
+        self.parsing_params(params)
+        concurrent_backend = self.params_obj.concurrent_params.get(pn.concurrent_backend, dv.default_concurrent_backend)
+        concurrent_runner = self.init_concurrent_backend(concurrent_backend)
+        vector_type = get_vector_type(self.params_obj.dataset_params[pn.dataset_name])
+        vector_default_field_name = get_default_field_name(
+            vector_type, self.params_obj.dataset_params.get(pn.vector_field_name, ""))
+        metric_type = self.params_obj.dataset_params[pn.metric_type]
+
+        # prepare data
+        self.prepare_collection(vector_default_field_name, prepare, prepare_clean)
+        if prepare is True:
+            self.prepare_index(vector_field_name=vector_default_field_name, metric_type=metric_type,
+                               clean_index_before=True)
+            self.prepare_insert(data_type=self.params_obj.dataset_params[pn.dataset_name],
+                                dim=self.params_obj.dataset_params[pn.dim],
+                                size=self.params_obj.dataset_params[pn.dataset_size],
+                                ni=self.params_obj.dataset_params[pn.ni_per])
+            self.prepare_flush()
+            self.prepare_index(vector_field_name=vector_default_field_name, metric_type=metric_type)
+        else:
+            # if pass in rebuild_index, indexes of collection will be dropped before building index
+            if rebuild_index:
+                self.prepare_index(vector_field_name=vector_default_field_name, metric_type=metric_type,
+                                   clean_index_before=rebuild_index)
+
+        self.count_entities()
+        # load collection
+        self.prepare_load(**self.params_obj.load_params)
+
+        self.show_all_resource(shards_num=self.params_obj.collection_params.get(pn.shards_num, 2),
+                               show_resource_groups=self.params_obj.dataset_params.get(pn.show_resource_groups, True),
+                               show_db_user=self.params_obj.dataset_params.get(pn.show_db_user, False))
+
+        # set output log
+        info_logout.reset_output()
+
+        def run(_nq, _top_k, _sweep_params, _concurrent_params):
+            try:
+                return self.prepare_search_pareto(_nq, _top_k, _sweep_params, _concurrent_params, concurrent_runner)
+            except Exception as e:
+                log.error("[SearchPareto] Search pareto raise error: {}".format(e))
+                return {}, False
+
+        # sweep search_param
+        c_params = self.parser_concurrent_params()
+        params_list = []
+        for sweep_s_p in self.parser_pareto_params():
+            sweep_params = []
+            for s_p in sweep_s_p:
+                search_params, nq, top_k, expr, other_params = self.search_param_analysis(
+                    s_p, vector_default_field_name, metric_type)
+                sweep_params.append((s_p[pn.search_param], search_params))
+
+            for c_p in c_params:
+                concurrent_params = {
+                    pn.concurrent_number: c_p[pn.concurrent_number],
+                    pn.during_time: c_p[pn.during_time],
+                    pn.interval: c_p[pn.interval],
+                    pn.spawn_rate: c_p.get(pn.spawn_rate, None),
+                    pn.locust_workers: c_p.get(pn.locust_workers, dv.default_locust_workers),
+                    pn.concurrent_backend: concurrent_backend
+                }
+                actual_params_used = copy.deepcopy(params)
+                actual_params_used[pn.search_params] = update_dict_value({
+                    pn.nq: nq,
+                    "param": [p["param"] for _, p in sweep_params],
+                    pn.top_k: top_k,
+                    pn.expr: expr
+                }, other_params)
+                actual_params_used[pn.concurrent_params] = concurrent_params
+                p = CaseIterParams(callable_object=run, object_args=[nq, top_k, sweep_params, concurrent_params],
+                                   actual_params_used=actual_params_used, case_type=self.__class__.__name__)
+                params_list.append(p)
+        yield params_list
+
+        # recover output log
+        info_logout.recover_output()
+
+        # clear env
+        self.clear_collections(clean_collection=clean_collection)
+        yield True
@@ -0,0 +1,157 @@
+import os
+import json
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from pymilvus import DataType
+
+from client.common.common_func import (
+    gen_values, get_dataset_shards, get_shards_offset, split_insert_size, gen_random_seed)
+from client.common.common_reader import gen_scalar_values
+from client.common.common_type import DefaultValue as dv
+
+from utils.util_log import log
+
+try:
+    from minio import Minio
+
+    MINIO_FLAG = True
+except ImportError as e:
+    Minio = None
+    MINIO_FLAG = False
+
+
+class BulkInsertStorage:
+    """ Object storage of Milvus, files of bulk insert tasks must be uploaded to the bucket of Milvus """
+
+    def __init__(self, endpoint=dv.default_minio_endpoint, access_key=dv.default_minio_access_key,
+                 secret_key=dv.default_minio_secret_key, bucket_name=dv.default_minio_bucket_name, secure=False):
+        if not MINIO_FLAG:
+            msg = "[BulkInsertStorage] Package minio is not installed, please install it by requirements.txt."
+            log.error(msg)
+            raise Exception(msg)
+
+        self.bucket_name = bucket_name
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        if not self.client.bucket_exists(self.bucket_name):
+            self.client.make_bucket(self.bucket_name)
+
+    def upload(self, file_name, object_name):
+        self.client.fput_object(self.bucket_name, object_name, file_name)
+        log.debug("[BulkInsertStorage] Upload {0} to {1}/{2}".format(file_name, self.bucket_name, object_name))
+        return object_name
+
+    def remove(self, prefix):
+        for obj in self.client.list_objects(self.bucket_name, prefix=prefix, recursive=True):
+            self.client.remove_object(self.bucket_name, obj.object_name)
+        log.debug("[BulkInsertStorage] Remove objects {0}/{1}".format(self.bucket_name, prefix))
+
+
+def gen_column_array(data_type, values, dim=None):
+    """
+    Convert values of gen_values to the array of numpy file for bulk insert
+
+    :param dim: dimension of the vector field, binary vectors packed into bytes are reshaped to (rows, dim // 8)
+    """
+    if hasattr(DataType, "JSON") and data_type == DataType.JSON:
+        return np.array([json.dumps(v) for v in values])
+    elif data_type == DataType.FLOAT_VECTOR:
+        return np.asarray(values, dtype=np.float32)
+    elif data_type == DataType.BINARY_VECTOR:
+        if len(values) > 0 and isinstance(values[0], bytes):
+            return np.frombuffer(b"".join(values), dtype=np.uint8).reshape(
+                len(values), int(dim) // 8 if dim else -1)
+        return np.asarray(values, dtype=np.uint8)
+    return np.asarray(values)
+
+
+def is_whole_shard(task: dict, dtype):
+    """ Whether the task is a whole dataset file with the dtype required by bulk insert """
+    shard = task.get("shard")
+    return shard is not None and task["file_offset"] == 0 and task["rows"] == shard["rows"] and \
+        not shard["fortran_order"] and np.lib.format.descr_to_dtype(shard["dtype"]) == dtype
+
+
+def gen_bulk_insert_task_files(storage: BulkInsertStorage, remote_path: str, task: dict, collection_schema: dict,
+                               varchar_filled=False, scalars_params={}):
+    """
+    Write one numpy file per field in the layout of bulk insert, and upload to <remote_path>/<field name>.npy
+
+    :param task: {"start_id": int, "rows": int, "shard": shard info of the dataset manifest or None,
+                  "vectors": np.ndarray or None, "file_offset": int}
+    :return: list of object names
+    """
+    ids = np.arange(task["start_id"], task["start_id"] + task["rows"], dtype=np.int64)
+    insert_scalars_params = next(gen_scalar_values(scalars_params, task["rows"], start_row=task["start_id"]))
+
+    files = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for field in collection_schema["fields"]:
+            if field.get("auto_id", False):
+                continue
+            object_name = "{0}/{1}.npy".format(remote_path, field["name"])
+
+            if field["type"] in [DataType.FLOAT_VECTOR, DataType.BINARY_VECTOR] and \
+                    is_whole_shard(task, np.float32 if field["type"] == DataType.FLOAT_VECTOR else np.uint8):
+                # the dataset file is already a numpy file of the vector field, upload without copying
+                files.append(storage.upload(task["shard"]["file_name"], object_name))
+                continue
+
+            values = gen_values(field["type"], task["vectors"], ids, varchar_filled, field,
+                                **insert_scalars_params.get(field["name"], {}))
+            file_name = os.path.join(tmp_dir, "{0}.npy".format(field["name"]))
+            np.save(file_name, gen_column_array(field["type"], values, field.get("params", {}).get("dim")))
+            files.append(storage.upload(file_name, object_name))
+    return files
+
+
+def gen_bulk_insert_tasks(data_type, dim, data_size, rows_per_task=dv.default_dataset_shard_size, seed=None):
+    """
+    Split the dataset into bulk insert tasks, a task is a shard of the dataset files,
+    or rows_per_task random vectors if data_type is `local`
+    """
+    tasks = []
+    if data_type == "local":
+        seed = gen_random_seed() if seed is None else seed
+        for i, (start_id, rows) in enumerate(split_insert_size(
+                data_size, rows_per_task, max(int(data_size) // int(rows_per_task), 1))):
+            tasks.append({"start_id": start_id, "rows": rows, "shard": None, "file_offset": 0, "seed": [seed, i]})
+        return tasks
+
+    shards, file_offset = get_shards_offset(get_dataset_shards(dim, data_type, data_size))
+    start_id = 0
+    for shard in shards:
+        rows = min(shard["rows"] - file_offset, data_size - start_id)
+        if rows <= 0:
+            break
+        tasks.append({"start_id": start_id, "rows": rows, "shard": shard, "file_offset": file_offset, "seed": None})
+        start_id += rows
+        file_offset = 0
+
+    if start_id < data_size:
+        msg = "[gen_bulk_insert_tasks] The dataset {0} with dim {1} has less than {2} rows, please check.".format(
+            data_type, dim, data_size)
+        log.error(msg)
+        raise Exception(msg)
+    return tasks
+
+
+def upload_bulk_insert_tasks(storage: BulkInsertStorage, tasks: list, remote_path: str, collection_schema: dict,
+                             dim, varchar_filled=False, scalars_params={}, workers=1):
+    """
+    :return: list of the files of each task
+    """
+
+    def upload(i):
+        task = dict(tasks[i])
+        if task["shard"] is None:
+            task["vectors"] = np.random.default_rng(task["seed"]).random((task["rows"], int(dim)), dtype=np.float32)
+        else:
+            data = np.load(task["shard"]["file_name"], mmap_mode="r")
+            task["vectors"] = data[task["file_offset"]:task["file_offset"] + task["rows"]]
+        return gen_bulk_insert_task_files(storage, "{0}/{1:05d}".format(remote_path, i), task, collection_schema,
+                                          varchar_filled, scalars_params)
+
+    with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as executor:
+        return list(executor.map(upload, range(len(tasks))))
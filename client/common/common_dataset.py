@@ -0,0 +1,178 @@
+import os
+import argparse
+import multiprocessing
+import numpy as np
+import tqdm
+
+from client.common.common_func import (
+    gen_file_name, gen_scalar_file_name, parser_data_size, gen_random_seed, get_dataset_shards, get_query_file_name)
+from client.common.common_param import DatasetPath, ScalarDatasetPath
+from client.common.common_type import DefaultValue as dv
+from client.common.common_type import DatasetDistribution, ScalarDatasetType
+
+from utils.util_log import log
+
+
+def gen_cluster_centers(dim, seed, clusters=dv.default_dataset_clusters):
+    """ Centers of the gaussian mixture, shared by all shards and queries of the dataset """
+    return np.random.default_rng([seed, dv.Max_file_count + 1]).random((int(clusters), int(dim)), dtype=np.float32)
+
+
+def gen_dataset_vectors(rows, dim, rng: np.random.Generator, distribution=DatasetDistribution.UNIFORM,
+                        centers: np.ndarray = None, cluster_std=dv.default_dataset_cluster_std):
+    """
+    :param distribution: uniform or gaussian_mixture
+    :param centers: cluster centers of the gaussian mixture
+    :return: float32 np.ndarray with shape (rows, dim)
+    """
+    if distribution == DatasetDistribution.UNIFORM:
+        return rng.random((int(rows), int(dim)), dtype=np.float32)
+    elif distribution == DatasetDistribution.GAUSSIAN_MIXTURE:
+        vectors = rng.standard_normal((int(rows), int(dim)), dtype=np.float32)
+        vectors *= np.float32(cluster_std)
+        vectors += centers[rng.integers(0, len(centers), int(rows))]
+        return vectors
+    msg = "[gen_dataset_vectors] Distribution not supported: {}".format(distribution)
+    log.error(msg)
+    raise Exception(msg)
+
+
+def gen_dataset_scalars(rows, start_id, rng: np.random.Generator, scalar_type=ScalarDatasetType.INT64,
+                        max_value=None):
+    """
+    :param start_id: id of the first row, json values contain the id
+    :param max_value: values of int64 / double / varchar are in [0, max_value)
+    """
+    max_value = int(max_value or rows)
+    if scalar_type == ScalarDatasetType.INT64:
+        return rng.integers(0, max_value, int(rows), dtype=np.int64)
+    elif scalar_type == ScalarDatasetType.DOUBLE:
+        return rng.random(int(rows)) * max_value
+    elif scalar_type == ScalarDatasetType.VARCHAR:
+        return rng.integers(0, max_value, int(rows), dtype=np.int64).astype(str)
+    elif scalar_type == ScalarDatasetType.JSON:
+        values = np.empty(int(rows), dtype=object)
+        values[:] = [{"id": i, "value": v} for i, v in zip(
+            range(int(start_id), int(start_id) + int(rows)), rng.integers(0, max_value, int(rows)).tolist())]
+        return values
+    msg = "[gen_dataset_scalars] Scalar type not supported: {}".format(scalar_type)
+    log.error(msg)
+    raise Exception(msg)
+
+
+def save_npy_file(file_name, data: np.ndarray):
+    """ Write to a temporary file first, so that a half-written shard is never read """
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    tmp_file = "{0}.{1}.tmp".format(file_name, os.getpid())
+    with open(tmp_file, "wb") as f:
+        np.save(f, data, allow_pickle=data.dtype.hasobject)
+    os.replace(tmp_file, file_name)
+
+
+def build_shard(params: dict):
+    """ Build one vector shard and its scalar shards, the seed of each shard only depends on the shard id """
+    shard_id, rows, start_id = params["shard_id"], params["rows"], params["start_id"]
+    file_name = gen_file_name(shard_id, params["dim"], params["data_type"])
+    if params["overwrite"] or not os.path.isfile(file_name):
+        rng = np.random.default_rng([params["seed"], shard_id])
+        save_npy_file(file_name, gen_dataset_vectors(
+            rows, params["dim"], rng, params["distribution"], params["centers"], params["cluster_std"]))
+
+    for i, (dataset_name, scalar_type) in enumerate(sorted(params["scalars"].items())):
+        scalar_file = gen_scalar_file_name(shard_id, dataset_name)
+        if params["overwrite"] or not os.path.isfile(scalar_file):
+            rng = np.random.default_rng([params["seed"], shard_id, i + 1])
+            save_npy_file(scalar_file, gen_dataset_scalars(rows, start_id, rng, scalar_type, params["data_size"]))
+    return rows
+
+
+def build_dataset(data_type, dim, size, shard_size=dv.default_dataset_shard_size, nq=dv.default_dataset_nq,
+                  seed=None, distribution=DatasetDistribution.UNIFORM, clusters=dv.default_dataset_clusters,
+                  cluster_std=dv.default_dataset_cluster_std, scalars: dict = {}, processes=None, overwrite=False):
+    """
+    Build vector shards binary_{dim}d_{id:05d}.npy and the query file in DatasetPath[data_type],
+    and scalar shards scalar_{id:05d}.npy in ScalarDatasetPath[<scalar dataset name>],
+    the query file is named by get_query_file_name, e.g. query_{dim}.npy of random,
+    and is not built for the data types without query files
+
+    :param size: rows of the dataset, end with w/m/b or number
+    :param seed: seed of the dataset, the same seed always builds the same dataset
+    :param distribution: uniform or gaussian_mixture
+    :param scalars: scalar datasets to be built with the same rows as vectors, {<scalar dataset name>: <type>}
+        type: int64 / double / varchar / json
+    :param processes: number of processes to build shards, os.cpu_count() if None
+    :return: dict of the dataset info
+    """
+    if data_type not in DatasetPath.keys():
+        msg = "[build_dataset] Data type not supported: {}".format(data_type)
+        log.error(msg)
+        raise Exception(msg)
+    for dataset_name in scalars.keys():
+        if dataset_name not in ScalarDatasetPath.keys():
+            msg = "[build_dataset] Scalar dataset not supported: {}".format(dataset_name)
+            log.error(msg)
+            raise Exception(msg)
+
+    data_size, shard_size = parser_data_size(size), parser_data_size(shard_size)
+    seed = gen_random_seed() if seed is None else int(seed)
+    centers = gen_cluster_centers(dim, seed, clusters) if distribution == DatasetDistribution.GAUSSIAN_MIXTURE \
+        else None
+
+    shards_params = [{
+        "shard_id": shard_id, "rows": min(shard_size, data_size - start_id), "start_id": start_id,
+        "data_type": data_type, "dim": int(dim), "data_size": data_size, "seed": seed, "distribution": distribution,
+        "centers": centers, "cluster_std": cluster_std, "scalars": scalars, "overwrite": overwrite
+    } for shard_id, start_id in enumerate(range(0, data_size, shard_size))]
+    log.info("[build_dataset] Start building {0} shards of dataset {1} with dim {2}, seed: {3}, distribution: {4}"
+             .format(len(shards_params), data_type, dim, seed, distribution))
+
+    with multiprocessing.Pool(processes=processes or os.cpu_count()) as pool:
+        with tqdm.tqdm(total=data_size) as bar:
+            bar.set_description("Build Dataset Processing")
+            for rows in pool.imap_unordered(build_shard, shards_params):
+                bar.update(rows)
+
+    # queries follow the same distribution as the dataset, named in the same way as the loaders read them
+    try:
+        query_file = get_query_file_name(int(dim), data_type)
+    except Exception as e:
+        log.warning("[build_dataset] Query file is not built: {}".format(e))
+        query_file = None
+    if query_file is not None and (overwrite or not os.path.isfile(query_file)):
+        rng = np.random.default_rng([seed, dv.Max_file_count])
+        save_npy_file(query_file, gen_dataset_vectors(nq, dim, rng, distribution, centers, cluster_std))
+
+    shards = get_dataset_shards(dim, data_type, data_size)
+    dataset_info = {"data_type": data_type, "dim": int(dim), "rows": sum(s["rows"] for s in shards),
+                    "shards": len(shards), "query_file": query_file, "seed": seed, "distribution": distribution}
+    log.info("[build_dataset] Build dataset done: {}".format(dataset_info))
+    return dataset_info
+
+
+def parser_scalars(scalars: list):
+    """ ["laion2b_int64:int64", ...] -> {"laion2b_int64": "int64", ...} """
+    return dict(s.split(":", 1) if ":" in s else (s, ScalarDatasetType.INT64) for s in scalars)
+
+
+if __name__ == "__main__":
+    # e.g.: python -m client.common.common_dataset --data_type random --dim 128 --size 10m --seed 1
+    parser = argparse.ArgumentParser(description="Build vector datasets in the layout of DatasetPath")
+    parser.add_argument("--data_type", default="random", help="key of DatasetPath")
+    parser.add_argument("--dim", type=int, default=dv.default_dim)
+    parser.add_argument("--size", default="1m", help="rows of the dataset, end with w/m/b or number")
+    parser.add_argument("--shard_size", default=str(dv.default_dataset_shard_size), help="rows of each shard")
+    parser.add_argument("--nq", type=int, default=dv.default_dataset_nq, help="rows of the query file")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--distribution", default=DatasetDistribution.UNIFORM,
+                        choices=[DatasetDistribution.UNIFORM, DatasetDistribution.GAUSSIAN_MIXTURE])
+    parser.add_argument("--clusters", type=int, default=dv.default_dataset_clusters)
+    parser.add_argument("--cluster_std", type=float, default=dv.default_dataset_cluster_std)
+    parser.add_argument("--scalars", nargs="*", default=[], help="<scalar dataset name>:<int64/double/varchar/json>")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--overwrite", action="store_true", default=False)
+    args = parser.parse_args()
+
+    build_dataset(data_type=args.data_type, dim=args.dim, size=args.size, shard_size=args.shard_size, nq=args.nq,
+                  seed=args.seed, distribution=args.distribution, clusters=args.clusters,
+                  cluster_std=args.cluster_std, scalars=parser_scalars(args.scalars), processes=args.processes,
+                  overwrite=args.overwrite)
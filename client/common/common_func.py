@@ -1,4 +1,5 @@
 import os
+import re
 import random
 import json
 import math
@@ -6,18 +7,21 @@ import copy
 import string
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import h5py
 import tqdm
 import subprocess
-from sklearn import preprocessing
+import tempfile
+import zlib
 from itertools import product
+from typing import Union
 
 from pymilvus import DataType
 
 from client.client_base.schema_wrapper import ApiCollectionSchemaWrapper, ApiFieldSchemaWrapper
 from client.parameters import params_name as pn
 from client.common.common_type import DefaultValue as dv
-from client.common.common_type import NAS, SimilarityMetrics, AccMetrics, Precision
+from client.common.common_type import NAS, SimilarityMetrics, AccMetrics, Precision, DatasetFormat, LoadShapeType
 from client.common.common_param import DatasetPath, ScalarDatasetPath, GoBenchIndex, SegmentsAnalysis
 
 from utils.util_log import log
@@ -76,7 +80,7 @@ def gen_collection_schema(vector_field_name="", description=dv.default_desc, def
                                         "params": {},  # for creating collection, e.g.: max_length
                                         "other_params": {
                                                 "dataset": <dataset name>
-                                                ...  # extra params, e.g.: varchar_filled
+                                                ...  # extra params, e.g.: varchar_filled, varchar_variable
                                         }  # for inserting values
                         }, ...}
     """
@@ -101,46 +105,60 @@ def gen_collection_schema(vector_field_name="", description=dv.default_desc, def
 """ param handling """
 
 
-def get_recall_value(true_ids, result_ids):
+def get_rows_unique(ids: np.ndarray, fill_start: int):
     """
-    Use the intersection length
+    Sort each row and replace the duplicate and negative (padding) ids by distinct values less than fill_start,
+    so that the rows can be intersected by sorting
     """
-    sum_radio = 0.0
-    topk_check = True
-    for index, item in enumerate(result_ids):
-        log.debug("[get_recall_value] true_ids: {}".format(true_ids[index]))
-        log.debug("[get_recall_value] result_ids: {}".format(item))
-        tmp = set(true_ids[index]).intersection(set(item))
-        if len(item) != 0:
-            # tmp = set(list(true_ids[index])[:len(item)]).intersection(set(item))
-            sum_radio += len(tmp) / len(item)
-        else:
-            topk_check = False
-            log.error("[get_recall_value] Length of returned topk is 0, please check.")
-    if topk_check is False:
-        raise ValueError("[get_recall_value] The result of topk is wrong, please check: {}".format(result_ids))
-    return round(sum_radio / len(result_ids), 3)
+    ids = np.sort(ids, axis=1)
+    valid = ids >= 0
+    valid[:, 1:] &= ids[:, 1:] != ids[:, :-1]
+    fill = fill_start - np.arange(ids.shape[1], dtype=np.int64)
+    return np.where(valid, ids, fill)
 
 
-def get_search_ids(result):
-    ids = []
-    for res in result:
-        ids.append(res.ids)
+def get_recall_value(true_ids, result_ids, top_k: Union[int, list] = None):
+    """
+    Use the intersection length of each row, rows are intersected by sorting instead of python sets
+    :param true_ids: ground truth ids with shape (nq, >= k)
+    :param result_ids: search result ids with shape (nq, k), -1 for padding
+    :param top_k: recall of the top k ids, or recall@k for each k of the list, all the result ids if None
+    :return: recall value, or {k: recall value} if top_k is a list
+    """
+    true_ids = np.asarray(true_ids, dtype=np.int64).reshape(len(result_ids), -1)
+    result_ids = np.asarray(result_ids, dtype=np.int64).reshape(len(result_ids), -1)
+    top_ks = top_k if isinstance(top_k, list) else [top_k or result_ids.shape[1]]
+
+    recalls = {}
+    for k in top_ks:
+        _true = get_rows_unique(true_ids[:, :k], fill_start=-2)
+        _result = get_rows_unique(result_ids[:, :k], fill_start=-2 - true_ids.shape[1])
+        result_length = (result_ids[:, :k] >= 0).sum(axis=1)
+        if (result_length == 0).any():
+            log.error("[get_recall_value] Length of returned top{0} is 0, rows: {1}".format(
+                k, np.flatnonzero(result_length == 0)[:10].tolist()))
+            raise ValueError("[get_recall_value] The result of topk is wrong, please check.")
+
+        # ids in both rows are adjacent after sorting, and ids of each row are unique
+        merged = np.sort(np.concatenate([_true, _result], axis=1), axis=1)
+        intersection = (merged[:, 1:] == merged[:, :-1]).sum(axis=1)
+        recalls[k] = round(float(np.mean(intersection / result_length)), 3)
+    log.debug("[get_recall_value] Recall of {0} queries: {1}".format(len(result_ids), recalls))
+    return recalls if isinstance(top_k, list) else recalls[top_ks[0]]
+
+
+def get_search_ids(result, limit: int = None):
+    """
+    :return: np.ndarray of ids with shape (nq, limit), rows with less ids are padded with -1
+    """
+    limit = limit or max([len(res.ids) for res in result] + [0])
+    ids = np.full((len(result), limit), -1, dtype=np.int64)
+    for i, res in enumerate(result):
+        _ids = res.ids[:limit]
+        ids[i, :len(_ids)] = _ids
     return ids
 
 
-def get_ground_truth_ids(data_size, data_type: str):
-    size = str(int(parser_data_size(data_size) / 1000000)) + "M"
-    gnd_file_name = DatasetPath.get(data_type + "_ground_truth", "") + f"/idx_{size}.ivecs"
-
-    if check_file_exist(gnd_file_name):
-        a = np.fromfile(gnd_file_name, dtype='int64')
-        d = a[0]
-        true_ids = a.reshape(-1, d + 1)[:, 1:].copy()
-        return true_ids
-    return []
-
-
 def get_default_field_name(data_type=DataType.FLOAT_VECTOR, default_field_name: str = ""):
     if default_field_name:
         return default_field_name
@@ -218,24 +236,8 @@ def get_file_list(data_size, dim, data_type):
     :param data_type: random/deep/jaccard/hamming/sift/binary/structure
     :return: list of file name
     """
-    data_size = parser_data_size(data_size)
-    file_names = []
-    _data_size = data_size
-    with tqdm.tqdm(range(_data_size)) as bar:
-        bar.set_description("Get File List Processing")
-        for i in range(dv.Max_file_count):
-            file_name = gen_file_name(i, dim, data_type)
-            file_names.append(file_name)
-
-            file_size = len(read_npy_file(file_name))
-            data_size -= file_size
-            bar.update(file_size)
-            if data_size <= 0:
-                break
-    if data_size > 0:
-        log.error("[get_file_list] The current dataset size is less than {}".format(data_size))
-        return []
-    return file_names
+    return get_dataset_file_list(data_size, dim, data_type, file_format=DatasetFormat.NPY)
+
 
 def get_cohere_file_list(data_size, dim ,data_type):
     """
@@ -244,67 +246,274 @@ def get_cohere_file_list(data_size, dim ,data_type):
     :param data_type: random/deep/jaccard/hamming/sift/binary/structure
     :return: list of file name
     """
+    return get_dataset_file_list(data_size, dim, data_type, file_format=DatasetFormat.PARQUET)
+
+
+def get_dataset_file_list(data_size, dim, data_type, file_format=DatasetFormat.NPY):
     data_size = parser_data_size(data_size)
     file_names = []
     _data_size = data_size
     with tqdm.tqdm(range(_data_size)) as bar:
         bar.set_description("Get File List Processing")
-        for i in range(dv.Max_file_count):
-            file_name = gen_parquet_file_name(i, dim, data_type)
-            file_names.append(file_name)
-            file_size = len(read_parquet_file(file_name))
-            data_size -= file_size
-            bar.update(file_size)
-            if data_size <= 0:
-                break
+        # rows are counted by the dataset manifest without reading files
+        for shard in get_dataset_shards(dim, data_type, data_size, file_format=file_format):
+            file_names.append(shard["file_name"])
+            data_size -= shard["rows"]
+            bar.update(shard["rows"])
     if data_size > 0:
         log.error("[get_file_list] The current dataset size is less than {}".format(data_size))
         return []
     return file_names
 
 
+""" dataset manifest """
+
+
+def gen_manifest_file_name(dim, data_type, file_format=DatasetFormat.NPY):
+    file_name = "%s_%sd_%s_manifest.json" % (dv.FILE_PREFIX, str(dim), file_format)
+    if data_type in DatasetPath.keys():
+        return DatasetPath[data_type] + file_name
+    else:
+        log.error("[gen_manifest_file_name] data type not supported: {}".format(data_type))
+        return ""
+
+
+def get_shard_checksum(file_name, offset=0, sample_size=dv.manifest_checksum_bytes):
+    """
+    crc32 of the header and the first and last sample_size bytes of data,
+    file size and mtime are also recorded in the manifest to detect changes of the shard
+    """
+    file_size = os.path.getsize(file_name)
+    with open(file_name, "rb") as f:
+        checksum = zlib.crc32(f.read(offset + sample_size))
+        if file_size > offset + sample_size:
+            f.seek(max(file_size - sample_size, offset + sample_size))
+            checksum = zlib.crc32(f.read(), checksum)
+    return "%08x" % checksum
+
+
+def read_npy_header(file_name):
+    """ Parse the header of npy file without reading the array """
+    with open(file_name, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        return {
+            "rows": int(shape[0]) if len(shape) > 0 else 0,
+            "dim": int(shape[1]) if len(shape) > 1 else 1,
+            "shape": [int(i) for i in shape],
+            "dtype": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": bool(fortran_order),
+            "offset": f.tell()
+        }
+
+
+def read_parquet_header(file_name, column="emb"):
+    """ Get rows of parquet file from the footer metadata """
+    parquet_file = pq.ParquetFile(file_name)
+    metadata = parquet_file.metadata
+    field_type = parquet_file.schema_arrow.field(column).type
+
+    # dim = number of values / number of rows in the first row group
+    dim = -1
+    if metadata.num_row_groups > 0 and metadata.row_group(0).num_rows > 0:
+        row_group = metadata.row_group(0)
+        for i in range(row_group.num_columns):
+            if row_group.column(i).path_in_schema.split(".")[0] == column:
+                dim = row_group.column(i).num_values // row_group.num_rows
+                break
+    return {
+        "rows": int(metadata.num_rows),
+        "dim": int(dim),
+        "dtype": str(getattr(field_type, "value_type", field_type)),
+        "offset": 0
+    }
+
+
+def gen_shard_info(file_name, file_format=DatasetFormat.NPY):
+    stat = os.stat(file_name)
+    shard = read_npy_header(file_name) if file_format == DatasetFormat.NPY else read_parquet_header(file_name)
+    shard.update({
+        "file": os.path.basename(file_name),
+        "size": int(stat.st_size),
+        "mtime": int(stat.st_mtime_ns),
+        "checksum": get_shard_checksum(file_name, shard["offset"])
+    })
+    return shard
+
+
+def load_dataset_manifest(manifest_file):
+    if os.path.isfile(manifest_file):
+        try:
+            with open(manifest_file, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == dv.manifest_version:
+                return manifest
+            log.debug("[load_dataset_manifest] Manifest version changed, rebuild manifest: {}".format(manifest_file))
+        except (OSError, ValueError) as e:
+            log.warning("[load_dataset_manifest] Can not load manifest {0}: {1}".format(manifest_file, e))
+    return {"version": dv.manifest_version, "shards": {}}
+
+
+def dump_dataset_manifest(manifest_file, manifest):
+    """ Write the manifest atomically, skip if the dataset directory is read-only """
+    try:
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(manifest_file), suffix=".tmp",
+                                         delete=False) as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f.name, manifest_file)
+        log.debug("[dump_dataset_manifest] Update manifest: {}".format(manifest_file))
+    except OSError as e:
+        log.warning("[dump_dataset_manifest] Can not write manifest {0}: {1}".format(manifest_file, e))
+
+
+def get_dataset_shards(dim, data_type, data_size=None, file_format=DatasetFormat.NPY):
+    """
+    Get shards info from the manifest next to the dataset files, shards not in the manifest or changed
+    are parsed from headers and added to the manifest lazily
+    :param data_size: stop once the shards contain enough rows, all shards if None
+    :return: list of shard info, e.g.
+        {"file_name": "/path/binary_128d_00000.npy", "file": "binary_128d_00000.npy", "rows": 1000000, "dim": 128,
+         "shape": [1000000, 128], "dtype": "<f4", "fortran_order": False, "offset": 128, "size": 512000128,
+         "mtime": 1700000000000000000, "checksum": "1a2b3c4d"}
+    """
+    gen_func = gen_file_name if file_format == DatasetFormat.NPY else gen_parquet_file_name
+    manifest_file = gen_manifest_file_name(dim, data_type, file_format)
+    manifest = load_dataset_manifest(manifest_file)
+    updated = False
+
+    shards, rows = [], 0
+    for i in range(dv.Max_file_count):
+        if data_size is not None and rows >= int(data_size):
+            break
+        file_name = gen_func(i, dim, data_type)
+        if not os.path.isfile(file_name):
+            break
+
+        stat = os.stat(file_name)
+        shard = manifest["shards"].get(os.path.basename(file_name), {})
+        if shard.get("size") != stat.st_size or shard.get("mtime") != stat.st_mtime_ns:
+            shard = gen_shard_info(file_name, file_format)
+            manifest["shards"][shard["file"]] = shard
+            updated = True
+
+        shards.append(dict(shard, file_name=file_name))
+        rows += shard["rows"]
+
+    if updated and manifest_file:
+        dump_dataset_manifest(manifest_file, manifest)
+    return shards
+
+
+def get_shards_offset(shards: list, start_row=0):
+    """
+    :return: (shards from the one containing the start row, row offset in the first shard)
+    """
+    start_row = int(start_row)
+    for i, shard in enumerate(shards):
+        if start_row < shard["rows"]:
+            return shards[i:], start_row
+        start_row -= shard["rows"]
+    return [], start_row
+
+
 def gen_vectors(nb, dim):
     return [[random.random() for _ in range(int(dim))] for _ in range(int(nb))]
 
 
+def gen_random_seed():
+    return random.randint(0, 2 ** 32 - 1)
+
+
+def gen_np_vectors(nb, dim, rng: np.random.Generator = None):
+    """ float32 vectors in a contiguous ndarray, use the same rng to keep the generated data reproducible """
+    rng = rng or np.random.default_rng()
+    return rng.random((int(nb), int(dim)), dtype=np.float32)
+
+
 def gen_ids(start_id, end_id):
     log.debug("[gen_ids] Start id: %s, end id: %s" % (start_id, end_id))
     return [k for k in range(start_id, end_id)]
 
 
+_varchar_pool = {}
+
+
+def gen_varchar_pool(size=dv.varchar_pool_size):
+    """ Preallocated pool of random ascii letters and digits, varchar values are cut from the pool """
+    if size not in _varchar_pool:
+        _chars = np.frombuffer((string.ascii_letters + string.digits).encode(), dtype=np.uint8)
+        _varchar_pool[size] = _chars[np.random.default_rng().integers(0, len(_chars), int(size))]
+    return _varchar_pool[size]
+
+
+def gen_varchar_values(length: int, max_length: int, variable_length=False):
+    """
+    :param max_length: max length of values, values are filled to max_length if variable_length is False
+    :return: np.ndarray of str
+    """
+    max_length = max(int(max_length), 1)
+    pool = gen_varchar_pool(max(dv.varchar_pool_size, max_length * 2))
+    rng = np.random.default_rng()
+
+    offsets = rng.integers(0, len(pool) - max_length, int(length))
+    chars = pool[offsets[:, None] + np.arange(max_length)]
+    if variable_length:
+        # the tail bytes are set to NUL, which are stripped by the bytes dtype
+        chars[np.arange(max_length) >= rng.integers(1, max_length + 1, int(length))[:, None]] = 0
+    return chars.view("S%s" % max_length).ravel().astype("U%s" % max_length)
+
+
+def gen_bool_values(ids: np.ndarray):
+    """
+    Parity of the sum of the ascii codes of str(id), the same as the values generated row by row:
+    the codes of digits have the same parity as the digits, and the odd code of '-' flips the parity of negative ids
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    _ids = np.abs(ids)
+    digit_sum = (ids < 0).astype(np.int64)
+    while _ids.any():
+        digit_sum += _ids % 10
+        _ids = _ids // 10
+    return (digit_sum & 1).astype(bool)
+
+
 def gen_values(data_type, vectors, ids, varchar_filled=False, field={}, default_value=None, other_params={}):
+    """
+    Numeric columns are np.ndarray, bool, varchar and json columns are converted to list
+    """
     values = None
-    if default_value is not None and isinstance(default_value, list) and len(default_value) != 0:
-        values = default_value
+    if default_value is not None and isinstance(default_value, (list, np.ndarray)) and len(default_value) != 0:
+        values = default_value[:len(ids)]
+    elif data_type in [DataType.FLOAT_VECTOR, DataType.BINARY_VECTOR]:
+        values = vectors
     elif data_type in [DataType.INT8, DataType.INT16, DataType.INT32, DataType.INT64]:
-        values = ids
+        values = np.asarray(ids, dtype=np.int64)
     elif data_type in [DataType.DOUBLE]:
-        values = [(i + 0.0) for i in ids]
+        values = np.asarray(ids, dtype=np.float64)
     elif data_type == DataType.FLOAT:
-        values = pd.Series(data=[(i + 0.0) for i in ids], dtype="float32")
-    elif data_type in [DataType.FLOAT_VECTOR, DataType.BINARY_VECTOR]:
-        values = vectors
+        values = np.asarray(ids, dtype=np.float32)
     elif data_type in [DataType.VARCHAR]:
         varchar_filled = other_params.get("varchar_filled", varchar_filled)
         if varchar_filled is False:
-            values = [str(i) for i in ids]
+            values = np.asarray(ids, dtype=np.int64).astype(str).tolist()
         else:
-            _len = int(field["params"]["max_length"])
-            _str = string.ascii_letters + string.digits
-            _s = _str
-            for i in range(int(_len / len(_str))):
-                _s += _str
-            values = [''.join(random.sample(_s, _len - 1)) for i in ids]
+            values = gen_varchar_values(len(ids), int(field["params"]["max_length"]) - 1,
+                                        other_params.get("varchar_variable", False)).tolist()
     elif data_type in [DataType.BOOL]:
-        values = [bool(sum(np.fromstring(str(_id), dtype=np.uint8)) & 1) for _id in ids]
+        values = gen_bool_values(np.asarray(ids, dtype=np.int64)).tolist()
     elif hasattr(DataType, "JSON") and data_type in [DataType.JSON]:
-        values = [{"id": i} for i in ids]
+        values = [{"id": i} for i in np.asarray(ids, dtype=np.int64).tolist()]
     return values
 
 
 def gen_entities(info, vectors=None, ids=None, varchar_filled=False, insert_scalars_params={}):
     """
     insert_scalars_params = {<field name>: {"default_value": [], other_params: {}}...}
+
+    :return: pd.DataFrame, or column-based list ordered by schema fields if vectors is a np.ndarray
     """
     if not isinstance(info, dict):
         log.error("[gen_entities] info is not a dict, please check: {}".format(type(info)))
@@ -318,14 +527,24 @@ def gen_entities(info, vectors=None, ids=None, varchar_filled=False, insert_scal
         _type = field["type"]
         entities.update({field["name"]: gen_values(_type, vectors, ids, varchar_filled, field,
                                                    **insert_scalars_params.get(field["name"], {}))})
+    if isinstance(vectors, np.ndarray):
+        # a 2-D array can not be a DataFrame column, pass the array through without converting to list
+        return list(entities.values())
     return pd.DataFrame(entities)
 
 
+def normalize_vectors(X: np.ndarray):
+    """ L2-normalize the rows of a float32 array in place, rows of zeros are kept """
+    norms = np.sqrt(np.einsum("ij,ij->i", X, X))
+    norms[norms == 0] = 1
+    X /= norms[:, np.newaxis]
+    return X
+
+
 def normalize_data(metric_type, X):
     if metric_type == SimilarityMetrics.IP:
         log.info("[normalize_data] Set normalize for metric_type: %s" % metric_type)
-        X = preprocessing.normalize(X, axis=1, norm='l2')
-        X = X.astype(np.float32)
+        X = normalize_vectors(np.array(X, dtype=np.float32))
 
     elif metric_type in [SimilarityMetrics.L2, SimilarityMetrics.COSINE]:
         X = X.astype(np.float32)
@@ -387,6 +606,21 @@ def gen_combinations(args):
         raise TypeError("[gen_combinations] No args handling exists for %s" % type(args).__name__)
 
 
+def get_pareto_frontier(points: list, x: str, y: str):
+    """
+    Get the points which are not dominated by any other point, the larger x and y the better
+    :param points: list of dict containing the keys x and y
+    :return: indexes of the frontier points in descending order of x
+    """
+    order = sorted(range(len(points)), key=lambda i: (-points[i][x], -points[i][y]))
+    frontier, max_y = [], None
+    for i in order:
+        if max_y is None or points[i][y] > max_y:
+            frontier.append(i)
+            max_y = points[i][y]
+    return frontier
+
+
 def compare_expr(left, comp, right):
     if comp == "LT":
         return "{0} < {1}".format(left, right)
@@ -435,23 +669,142 @@ def parser_search_params_expr(expr):
     return expression
 
 
-def get_vectors_from_binary(nq, dimension, dataset_name):
-    if dataset_name in ["sift", "deep", "binary", "gist", "text2img", "laion", "glove"]:
-        # dataset_name: local, sift, deep, binary
-        file_name = DatasetPath[dataset_name] + "query.npy"
+EXPR_TOKEN_PATTERN = re.compile(
+    r"""\s*(?:(?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)|(?P<string>"[^"]*"|'[^']*')|"""
+    r"""(?P<op>&&|\|\||<=|>=|==|!=|<|>|!|\(|\)|\[|\]|,|-)|(?P<name>[A-Za-z_][A-Za-z0-9_]*))""")
+EXPR_COMPARE_OPS = {"<": np.less, "<=": np.less_equal, "==": np.equal, "!=": np.not_equal, ">=": np.greater_equal,
+                    ">": np.greater}
+
+
+def parser_expr_tokens(expr: str):
+    tokens, position = [], 0
+    expr = expr.strip()
+    while position < len(expr):
+        match = EXPR_TOKEN_PATTERN.match(expr, position)
+        if match is None or match.end() == position:
+            raise Exception("[parser_expr_tokens] Can't parser search expression at {0}: {1}".format(position, expr))
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        elif kind == "string":
+            value = value[1:-1]
+        elif kind == "name" and value in ["and", "or", "not", "in"]:
+            kind, value = "op", {"and": "&&", "or": "||", "not": "!", "in": "in"}[value]
+        elif kind == "name" and value in ["true", "false", "True", "False"]:
+            kind, value = "bool", value.lower() == "true"
+        tokens.append((kind, value))
+    return tokens
+
+
+def eval_expr_mask(expr: str, get_column: callable):
+    """
+    Evaluate the boolean expression of search with numpy, supports comparison (including range like 1 < id < 10),
+    in / not in, &&, ||, !, and / or / not and parentheses
+    :param get_column: function to get the values of a field as np.ndarray
+    :return: np.ndarray of bool
+    """
+    tokens = parser_expr_tokens(expr)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def take(value=None):
+        nonlocal position
+        token = peek()
+        if value is not None and token[1] != value:
+            raise Exception("[eval_expr_mask] Expect {0} but got {1} in expression: {2}".format(value, token[1], expr))
+        position += 1
+        return token
+
+    def parse_operand():
+        kind, value = take()
+        if kind == "op" and value == "-":
+            kind, value = take()
+            return -value
+        if kind == "name":
+            return get_column(value)
+        if kind in ["number", "string", "bool"]:
+            return value
+        if kind == "op" and value == "[":
+            values = []
+            while peek()[1] != "]":
+                values.append(parse_operand())
+                if peek()[1] == ",":
+                    take(",")
+            take("]")
+            return values
+        raise Exception("[eval_expr_mask] Unexpected token {0} in expression: {1}".format(value, expr))
+
+    def parse_comparison():
+        left = parse_operand()
+        if peek()[1] in ["in", "!"]:
+            negative = take()[1] == "!"
+            if negative:
+                take("in")
+            mask = np.isin(left, parse_operand())
+            return ~mask if negative else mask
+
+        mask = None
+        while peek()[1] in EXPR_COMPARE_OPS:
+            op = take()[1]
+            right = parse_operand()
+            _mask = EXPR_COMPARE_OPS[op](left, right)
+            mask = _mask if mask is None else mask & _mask
+            left = right
+        if mask is None:
+            raise Exception("[eval_expr_mask] Expect a comparison in expression: {}".format(expr))
+        return mask
+
+    def parse_not():
+        if peek()[1] == "!":
+            take("!")
+            return ~parse_not()
+        if peek()[1] == "(":
+            take("(")
+            mask = parse_or()
+            take(")")
+            return mask
+        return parse_comparison()
+
+    def parse_and():
+        mask = parse_not()
+        while peek()[1] == "&&":
+            take("&&")
+            mask = mask & parse_not()
+        return mask
+
+    def parse_or():
+        mask = parse_and()
+        while peek()[1] == "||":
+            take("||")
+            mask = mask | parse_and()
+        return mask
+
+    result = parse_or()
+    if position != len(tokens):
+        raise Exception("[eval_expr_mask] Can't parser search expression: {}".format(expr))
+    return np.asarray(result, dtype=bool)
+
+
+def get_query_file_name(dimension, dataset_name):
+    if dataset_name in ["sift", "deep", "binary", "gist", "text2img", "laion", "glove", "cohere"]:
+        return DatasetPath[dataset_name] + "query.npy"
 
     elif dataset_name in ["random"]:
-        file_name = DatasetPath[dataset_name] + "query_%d.npy" % dimension
+        return DatasetPath[dataset_name] + "query_%d.npy" % dimension
 
-    elif dataset_name == "local":
+    raise Exception("[get_query_file_name] Not support dataset: {0}, please check".format(dataset_name))
+
+
+def get_vectors_from_binary(nq, dimension, dataset_name):
+    # dataset_name: local, sift, deep, binary
+    if dataset_name == "local":
         return gen_vectors(nq, dimension)
-    
-    elif dataset_name == "cohere":
-        file_name = DatasetPath[dataset_name] + "query.npy"
+    file_name = get_query_file_name(dimension, dataset_name)
 
-    else:
-        raise Exception("[get_vectors_from_binary] Not support dataset: {0}, please check".format(dataset_name))
-   
     if dataset_name =="cohere":
         data = np.load(file_name, allow_pickle=True)
     else:
@@ -473,26 +826,6 @@ def gen_insert_scalars_params(scalars_params: dict):
     return insert_scalars_params
 
 
-def gen_scalar_values(scalars_params: dict, insert_length: int):
-    _loop_files = {k: loop_gen_scalar_files(scalars_params[k]["other_params"].get("dataset")) for k in
-                   scalars_params.keys() if scalars_params[k].get("other_params", {}).get("dataset", False)}
-    _insert_scalars_params = gen_insert_scalars_params(scalars_params)
-    _loop_dict = copy.deepcopy(_insert_scalars_params)
-
-    for k in _loop_dict.keys():
-        _loop_dict[k]["default_value"] = []
-
-    while True:
-        for k, v in _loop_files.items():
-            while len(_loop_dict[k]["default_value"]) < insert_length:
-                _loop_dict[k]["default_value"].extend(read_npy_file(next(v), allow_pickle=True))
-
-        for k, v in _loop_dict.items():
-            _insert_scalars_params[k]["default_value"] = _loop_dict[k]["default_value"][:insert_length]
-            _loop_dict[k]["default_value"] = _loop_dict[k]["default_value"][insert_length:]
-        yield _insert_scalars_params
-
-
 """ common func """
 
 
@@ -581,8 +914,13 @@ def read_json_file(file_name):
     return {}
 
 
-def read_npy_file(file_name, allow_pickle=False):
+def read_npy_file(file_name, allow_pickle=False, mmap_mode=None):
+    """
+    :param mmap_mode: return a memory-mapped np.ndarray instead of list if specified, e.g. "r"
+    """
     if check_file_exist(file_name):
+        if mmap_mode is not None:
+            return np.load(file_name, mmap_mode=mmap_mode, allow_pickle=allow_pickle)
         file_list = np.load(file_name, allow_pickle=allow_pickle).tolist()
         return file_list
     msg = "[read_npy_file] Can not read npy file, please check."
@@ -599,6 +937,22 @@ def read_parquet_file(file_name):
     return []
 
 
+def read_parquet_file_batches(file_name, column="emb", batch_size=dv.default_parquet_batch_size):
+    """
+    Stream the list column of the parquet file by record batches,
+    each batch is a 2-D float32 array viewed from the flattened child buffer without building python lists
+    """
+    if check_file_exist(file_name):
+        for record_batch in pq.ParquetFile(file_name).iter_batches(batch_size=int(batch_size), columns=[column]):
+            _column = record_batch.column(0)
+            if len(_column) == 0:
+                continue
+            values = _column.flatten().to_numpy(zero_copy_only=False)
+            yield values.astype(np.float32, copy=False).reshape(len(_column), -1)
+    else:
+        log.error("[read_parquet_file_batches] Can not read parquet file, please check.")
+
+
 def read_hdf5_file(file_name):
     if check_file_exist(file_name):
         return h5py.File(file_name)
@@ -623,6 +977,135 @@ def read_ann_hdf5_file(file_name):
     return file_list
 
 
+def read_ann_train_chunks(data_set, metric_type, chunk_rows=dv.default_ann_chunk_rows):
+    """
+    Read the train vectors of the hdf5 file chunk by chunk, each chunk is normalized in place in the same way as
+    normalize_data, binary vectors are packed into uint8 arrays
+    """
+    train = data_set[pn.train]
+    for start in range(0, train.shape[0], int(chunk_rows)):
+        chunk = train[start:start + int(chunk_rows)]
+        if metric_type in [SimilarityMetrics.Jaccard, SimilarityMetrics.Hamming, SimilarityMetrics.Substructure,
+                           SimilarityMetrics.Superstructure]:
+            yield np.packbits(chunk, axis=-1)
+            continue
+        chunk = chunk.astype(np.float32, copy=False)
+        if metric_type == SimilarityMetrics.IP:
+            normalize_vectors(chunk)
+        yield chunk
+
+
+def get_ann_cache_dir(file_name: str, metric_type: str):
+    """
+    The cache of the hdf5 file is keyed by file name, metric type and dtype,
+    e.g. <cache dir>/glove-100-angular_IP_float32/, the cache dir is ann_cache next to the hdf5 file if not set
+    """
+    binary = metric_type in [SimilarityMetrics.Jaccard, SimilarityMetrics.Hamming, SimilarityMetrics.Substructure,
+                             SimilarityMetrics.Superstructure]
+    dtype = "uint8" if binary else "float32"
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    cache_dir = dv.default_ann_cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_name)), "ann_cache")
+    return os.path.join(cache_dir, "{0}_{1}_{2}".format(name, metric_type.upper(), dtype)), dtype
+
+
+def load_ann_cache(cache_dir: str, src_file: str):
+    """ Memory-map the cached arrays, return None if the cache is missing or the source file has changed """
+    meta_file = os.path.join(cache_dir, "meta.json")
+    if not os.path.isfile(meta_file):
+        return None
+    try:
+        with open(meta_file, "r") as f:
+            meta = json.load(f)
+        stat = os.stat(src_file)
+        if meta.get("version") != dv.ann_cache_version or meta.get("size") != stat.st_size or \
+                meta.get("mtime") != stat.st_mtime_ns:
+            log.info("[load_ann_cache] Source file changed, rebuild cache: {}".format(cache_dir))
+            return None
+        return {f: np.load(os.path.join(cache_dir, f + ".npy"), mmap_mode="r")
+                for f in [pn.train, pn.test, pn.neighbors]}
+    except (OSError, ValueError) as e:
+        log.warning("[load_ann_cache] Can not load cache {0}: {1}".format(cache_dir, e))
+        return None
+
+
+def dump_ann_cache(cache_dir: str, src_file: str, data_set, metric_type: str, dtype: str,
+                   chunk_rows=dv.default_ann_chunk_rows):
+    """
+    Write normalized train and test, and neighbors of the hdf5 file into npy files,
+    meta.json is written at last so that a partly written cache is never loaded
+    """
+    stat = os.stat(src_file)
+    meta_file = os.path.join(cache_dir, "meta.json")
+
+    def replace_file(arr_func, field):
+        # np.save appends .npy to the file name without the suffix
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp.npy", delete=False) as f:
+            tmp_file = f.name
+        try:
+            arr_func(tmp_file)
+            os.replace(tmp_file, os.path.join(cache_dir, field + ".npy"))
+        finally:
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
+
+    def dump_train(tmp_file):
+        train = data_set[pn.train]
+        dim = (train.shape[1] + 7) // 8 if dtype == "uint8" else train.shape[1]
+        arr = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=dtype, shape=(train.shape[0], dim))
+        start = 0
+        for chunk in read_ann_train_chunks(data_set, metric_type, chunk_rows):
+            arr[start:start + len(chunk)] = chunk
+            start += len(chunk)
+        arr.flush()
+        del arr
+
+    def dump_test(tmp_file):
+        test = np.array(data_set[pn.test])
+        np.save(tmp_file, np.packbits(test, axis=-1) if dtype == "uint8" else normalize_data(metric_type, test))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.isfile(meta_file):
+            os.remove(meta_file)
+        log.info("[dump_ann_cache] Start building cache of {0}: {1}".format(src_file, cache_dir))
+        replace_file(dump_train, pn.train)
+        replace_file(dump_test, pn.test)
+        replace_file(lambda tmp_file: np.save(tmp_file, np.array(data_set[pn.neighbors])), pn.neighbors)
+
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, suffix=".tmp", delete=False) as f:
+            json.dump({"version": dv.ann_cache_version, "file": src_file, "size": stat.st_size,
+                       "mtime": stat.st_mtime_ns, "metric_type": metric_type, "dtype": dtype}, f, indent=2)
+        os.replace(f.name, meta_file)
+        cache_size = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir))
+        log.info("[dump_ann_cache] Cache of {0} is written to {1}, size: {2}MB".format(
+            src_file, cache_dir, round(cache_size / 1024 / 1024, Precision.COMMON_PRECISION)))
+    except OSError as e:
+        log.warning("[dump_ann_cache] Can not write cache {0}: {1}".format(cache_dir, e))
+        return None
+    return load_ann_cache(cache_dir, src_file)
+
+
+def read_ann_cached_file(file_name: str, metric_type: str, chunk_rows=dv.default_ann_chunk_rows):
+    """
+    Get normalized train and test, and neighbors of the hdf5 file from the cache,
+    the cache is built on the first call and rebuilt if the size or mtime of the source file changes
+    :return: dict of memory-mapped arrays, binary vectors are packed into uint8; None if the cache can not be used
+    """
+    cache_dir, dtype = get_ann_cache_dir(file_name, metric_type)
+    cache = load_ann_cache(cache_dir, file_name)
+    if cache is not None:
+        log.info("[read_ann_cached_file] Load cache of {0}: {1}".format(file_name, cache_dir))
+        return cache
+
+    data_set = read_ann_hdf5_file(file_name)
+    if len(data_set) == 0:
+        return None
+    try:
+        return dump_ann_cache(cache_dir, file_name, data_set, metric_type, dtype, chunk_rows)
+    finally:
+        data_set.close()
+
+
 def read_file(file_path, block_size=1024):
     with open(file_path, 'rb') as f:
         while True:
@@ -653,6 +1136,12 @@ def loop_gen_parquet_files(dim, data_type):
         yield gen_parquet_file_name(i, dim, data_type)
 
 
+def loop_gen_parquet_arrays(files, column="emb", batch_size=dv.default_parquet_batch_size):
+    for file_name in files:
+        for array in read_parquet_file_batches(file_name, column=column, batch_size=batch_size):
+            yield array
+
+
 def loop_ids(step=50000, start_id=0):
     while True:
         ids = [k for k in range(start_id, start_id + int(step))]
@@ -662,6 +1151,103 @@ def loop_ids(step=50000, start_id=0):
         yield ids
 
 
+def split_insert_size(data_size: int, ni: int, workers: int):
+    """
+    Split the rows into contiguous ranges for workers, each range is a multiple of ni except the last one
+    :return: list of (start_row, size)
+    """
+    data_size, ni, workers = int(data_size), int(ni), max(int(workers), 1)
+    batches, rest = divmod(data_size, ni) if ni > 0 else (0, data_size)
+    sizes = [(batches // workers + (1 if i < batches % workers else 0)) * ni for i in range(workers)]
+    sizes[-1] += rest
+
+    ranges, start = [], 0
+    for size in sizes:
+        if size > 0:
+            ranges.append((start, size))
+        start += size
+    return ranges
+
+
+def get_latency_percentiles(rts: list, percentiles=(50, 90, 99), precision=Precision.INSERT_PRECISION):
+    """
+    :return: e.g. {"TP50": 0.1, "TP90": 0.2, "TP99": 0.3, "max": 0.4}
+    """
+    if len(rts) == 0:
+        return {}
+    values = np.percentile(np.asarray(rts, dtype=np.float64), percentiles)
+    result = {"TP%s" % p: round(float(v), precision) for p, v in zip(percentiles, values)}
+    result["max"] = round(float(np.max(rts)), precision)
+    return result
+
+
+def get_schema_row_bytes(collection_schema: dict, json_row_bytes=dv.default_json_row_bytes):
+    """
+    Estimate the bytes of one row in the insert request,
+    varchar fields are counted by max_length and int8 / int16 are sent as int32
+    """
+    scalar_bytes = {DataType.BOOL: 1, DataType.INT8: 4, DataType.INT16: 4, DataType.INT32: 4, DataType.INT64: 8,
+                    DataType.FLOAT: 4, DataType.DOUBLE: 8}
+    row_bytes = 0
+    for field in collection_schema["fields"]:
+        if field.get("auto_id", False):
+            continue
+        _type, _params = field["type"], field.get("params", {})
+        if _type == DataType.FLOAT_VECTOR:
+            row_bytes += int(_params["dim"]) * 4
+        elif _type == DataType.BINARY_VECTOR:
+            row_bytes += int(_params["dim"]) // 8
+        elif _type == DataType.VARCHAR:
+            row_bytes += int(_params.get("max_length", dv.default_max_length))
+        elif hasattr(DataType, "JSON") and _type == DataType.JSON:
+            row_bytes += json_row_bytes
+        else:
+            row_bytes += scalar_bytes.get(_type, 8)
+    return row_bytes
+
+
+def golden_section_search(func: callable, low: float, high: float, tolerance: float, max_iterations: int):
+    """
+    Search the maximum of a unimodal function in [low, high], func is called once per iteration
+    :return: middle of the final interval
+    """
+    ratio = (math.sqrt(5) - 1) / 2
+    x1, x2 = high - ratio * (high - low), low + ratio * (high - low)
+    f1, f2 = func(x1), func(x2)
+    for _ in range(max(int(max_iterations) - 2, 0)):
+        if high - low <= tolerance:
+            break
+        if f1 >= f2:
+            high, x2, f2 = x2, x1, f1
+            x1 = high - ratio * (high - low)
+            f1 = func(x1)
+        else:
+            low, x1, f1 = x1, x2, f2
+            x2 = low + ratio * (high - low)
+            f2 = func(x2)
+    return (low + high) / 2
+
+
+def get_insert_timeline(batches: dict, start_time: float, interval=dv.default_timeline_interval,
+                        precision=Precision.INSERT_PRECISION):
+    """
+    :param batches: {"rt": [response time of each batch], "end_time": [...], "rows": [...]}
+    :return: rows per second and the max response time of the batches finished in each interval after start_time
+    """
+    if len(batches["end_time"]) == 0:
+        return {"timeline_interval": interval, "throughput_timeline": [], "latency_timeline": []}
+    slots = ((np.asarray(batches["end_time"], dtype=np.float64) - start_time) // interval).astype(np.int64)
+    slots = slots.clip(min=0)
+    length = int(slots.max()) + 1
+
+    throughput = np.bincount(slots, weights=np.asarray(batches["rows"], dtype=np.float64), minlength=length)
+    latency = np.zeros(length, dtype=np.float64)
+    np.maximum.at(latency, slots, np.asarray(batches["rt"], dtype=np.float64))
+    return {"timeline_interval": interval,
+            "throughput_timeline": np.round(throughput / interval, precision).tolist(),
+            "latency_timeline": np.round(latency, precision).tolist()}
+
+
 def dict_update(source, target):
     for key, value in source.items():
         if isinstance(value, dict) and key in target:
@@ -930,6 +1516,61 @@ def get_spawn_rate(total_num: int, default_max_step: int = 5, default_max_spawn_
     return _spawn_rate if _spawn_rate <= default_max_spawn_rate else default_max_spawn_rate
 
 
+def get_load_shape_stages(load_shape: dict):
+    """
+    Compile the declarative load shape into stages with a fixed number of users, durations are parsed by parser_time
+        stages: {"type": "stages", "stages": [{"users": 10, "duration": "1m", "spawn_rate": 5}, ...]}
+        ramp: {"type": "ramp", "start_users": 10, "end_users": 100, "duration": "10m", "step_duration": "1m"}
+        step: {"type": "step", "start_users": 10, "step_users": 10, "steps": 5, "step_duration": "2m"}
+        spike: {"type": "spike", "users": 10, "spike_users": 100, "duration": "2m", "spike_duration": "30s"},
+               users of the duration before and after the spike
+        sine: {"type": "sine", "users": 50, "amplitude": 40, "period": "10m", "duration": "20m", "step_duration": "30s"}
+    spawn_rate of the shape is used by all the stages if set
+    :return: list of stages, e.g. [{"name": "ramp_0", "users": 10, "duration": 60, "spawn_rate": 2}, ...]
+    """
+    _type = load_shape.get(pn.shape_type, LoadShapeType.STAGES)
+    step_duration = parser_time(load_shape.get(pn.step_duration, dv.default_load_shape_step_duration))
+    users_list = []
+
+    if _type == LoadShapeType.STAGES:
+        for stage in load_shape.get(pn.stages, []):
+            users_list.append((stage[pn.users], parser_time(stage[pn.duration]), stage.get(pn.spawn_rate, None)))
+    elif _type == LoadShapeType.RAMP:
+        steps = max(math.ceil(parser_time(load_shape[pn.duration]) / step_duration), 1)
+        start, end = load_shape[pn.start_users], load_shape[pn.end_users]
+        users_list = [(round(start + (end - start) * i / max(steps - 1, 1)), step_duration, None) for i in range(steps)]
+    elif _type == LoadShapeType.STEP:
+        users_list = [(load_shape[pn.start_users] + load_shape[pn.step_users] * i, step_duration, None)
+                      for i in range(load_shape[pn.steps])]
+    elif _type == LoadShapeType.SPIKE:
+        duration = parser_time(load_shape[pn.duration])
+        users_list = [(load_shape[pn.users], duration, None),
+                      (load_shape[pn.spike_users], parser_time(load_shape[pn.spike_duration]), None),
+                      (load_shape[pn.users], duration, None)]
+    elif _type == LoadShapeType.SINE:
+        period = parser_time(load_shape[pn.period])
+        steps = max(math.ceil(parser_time(load_shape[pn.duration]) / step_duration), 1)
+        users_list = [(round(load_shape[pn.users] + load_shape[pn.amplitude] * math.sin(
+            2 * math.pi * (i + 0.5) * step_duration / period)), step_duration, None) for i in range(steps)]
+    else:
+        msg = "[get_load_shape_stages] Load shape type:{0} not support, please check!!!".format(_type)
+        log.error(msg)
+        raise Exception(msg)
+
+    stages = []
+    for i, (users, duration, spawn_rate) in enumerate(users_list):
+        users = max(int(users), 0)
+        spawn_rate = spawn_rate or load_shape.get(pn.spawn_rate, None) or max(get_spawn_rate(users), 1)
+        stages.append({"name": "{0}_{1}".format(_type, i), pn.users: users, pn.duration: duration,
+                       pn.spawn_rate: spawn_rate})
+    if not stages or any(stage[pn.duration] <= 0 for stage in stages):
+        msg = "[get_load_shape_stages] Stages of load shape are empty or not lasting, please check: {}".format(
+            load_shape)
+        log.error(msg)
+        raise Exception(msg)
+    return stages
+
+
 def remove_list_values(_list: list, _value):
     _list = copy.deepcopy(_list)
     while True:
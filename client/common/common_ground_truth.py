@@ -0,0 +1,320 @@
+import os
+import json
+import zlib
+import multiprocessing
+import numpy as np
+import tqdm
+
+from pymilvus import DataType
+
+from client.common.common_func import (
+    parser_data_size, get_dataset_shards, get_query_file_name, check_file_exist, gen_values,
+    eval_expr_mask)
+from client.common.common_param import DatasetPath
+from client.common.common_reader import read_shard_mmap, gen_scalar_values
+from client.common.common_type import SimilarityMetrics
+from client.common.common_type import DefaultValue as dv
+
+from utils.util_log import log
+
+# queries of the ground truth workers, set once by the initializer of the process pool
+_worker_queries = None
+
+# metric types supported by computing the ground truth locally
+GROUND_TRUTH_METRICS = [SimilarityMetrics.L2, SimilarityMetrics.IP, SimilarityMetrics.COSINE]
+
+
+def get_ground_truth_path(data_type: str):
+    return DatasetPath.get(data_type + "_ground_truth", DatasetPath.get(data_type, "") + "gnd")
+
+
+def gen_ground_truth_file_name(data_size, data_type: str, metric_type: str = None, filter_key: str = None,
+                               dim: int = None):
+    """
+    Precomputed files are named by millions of rows, e.g. idx_10M.ivecs,
+    files computed locally are named by rows, dim, metric type and the key of the filter,
+    e.g. idx_1500000_128d_L2.ivecs, idx_1500000_128d_L2_1a2b3c4d.ivecs,
+    datasets like random keep the files of all the dims in the same path
+    """
+    if metric_type is None:
+        size = str(int(parser_data_size(data_size) / 1000000)) + "M"
+        return get_ground_truth_path(data_type) + f"/idx_{size}.ivecs"
+    _dim = f"_{int(dim)}d" if dim is not None else ""
+    suffix = f"_{filter_key}" if filter_key else ""
+    return get_ground_truth_path(data_type) + \
+        f"/idx_{parser_data_size(data_size)}{_dim}_{metric_type.upper()}{suffix}.ivecs"
+
+
+def read_ground_truth_file(file_name):
+    """ Each row is [k, id_1, ..., id_k] in int64 """
+    a = np.fromfile(file_name, dtype='int64')
+    d = a[0]
+    return a.reshape(-1, d + 1)[:, 1:].copy()
+
+
+def write_ground_truth_file(file_name, ids: np.ndarray):
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    data = np.hstack([np.full((len(ids), 1), ids.shape[1], dtype=np.int64), ids.astype(np.int64)])
+    tmp_file = "{0}.{1}.tmp".format(file_name, os.getpid())
+    data.tofile(tmp_file)
+    os.replace(tmp_file, file_name)
+
+
+def read_query_vectors(dim, data_type: str, nq: int = None):
+    """
+    The first nq vectors of the query file, all the vectors if nq is None,
+    files of object arrays are loaded with allow_pickle like get_vectors_from_binary
+    """
+    file_name = get_query_file_name(dim, data_type)
+    if not check_file_exist(file_name):
+        msg = "[read_query_vectors] Can not read the query file of dataset {0}, please check.".format(data_type)
+        log.error(msg)
+        raise Exception(msg)
+    data = np.load(file_name, allow_pickle=True)
+    if nq is not None:
+        if int(nq) > len(data):
+            msg = "[read_query_vectors] nq large than file support({0})".format(len(data))
+            log.error(msg)
+            raise Exception(msg)
+        data = data[:int(nq)]
+    return np.stack(data) if data.dtype == object else data
+
+
+def get_block_distances(queries: np.ndarray, vectors: np.ndarray, metric_type: str):
+    """
+    Distances of queries to a block of vectors by float32 matmul, the smaller the closer,
+    the norms of queries are left out since they do not change the order of each row
+    :param queries: normalized if metric_type is COSINE
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dot = queries @ vectors.T
+    if metric_type == SimilarityMetrics.L2:
+        dot *= -2
+        dot += np.einsum("ij,ij->i", vectors, vectors)[np.newaxis, :]
+        return dot
+    elif metric_type == SimilarityMetrics.IP:
+        return np.negative(dot, out=dot)
+    elif metric_type == SimilarityMetrics.COSINE:
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1
+        dot /= -norms[np.newaxis, :]
+        return dot
+    msg = "[get_block_distances] Metric type not supported: {}".format(metric_type)
+    log.error(msg)
+    raise Exception(msg)
+
+
+def merge_top_k(ids: np.ndarray, distances: np.ndarray, top_k: int):
+    """ Keep the top_k smallest distances of each row, not sorted """
+    if distances.shape[1] <= top_k:
+        return ids, distances
+    index = np.argpartition(distances, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(ids, index, axis=1), np.take_along_axis(distances, index, axis=1)
+
+
+def sort_top_k(ids: np.ndarray, distances: np.ndarray):
+    index = np.argsort(distances, axis=1, kind="stable")
+    return np.take_along_axis(ids, index, axis=1), np.take_along_axis(distances, index, axis=1)
+
+
+def _init_ground_truth_worker(queries: np.ndarray):
+    global _worker_queries
+    _worker_queries = queries
+
+
+def search_shard_top_k(task: dict):
+    """
+    Exact top_k of the queries in rows [0, rows) of one shard, the shard is read block by block,
+    only the rows passing the filter are searched if the mask of the shard is given
+    """
+    data = read_shard_mmap(task["shard"])
+    top_k, block_rows = task["top_k"], task["block_rows"]
+    nq = len(_worker_queries)
+    ids = np.empty((nq, 0), dtype=np.int64)
+    distances = np.empty((nq, 0), dtype=np.float32)
+
+    for start in range(0, task["rows"], block_rows):
+        end = min(start + block_rows, task["rows"])
+        vectors = data[start:end]
+        _ids = np.arange(task["start_id"] + start, task["start_id"] + end, dtype=np.int64)
+        if task.get("mask") is not None:
+            _mask = task["mask"][start:end]
+            if not _mask.any():
+                continue
+            vectors, _ids = vectors[_mask], _ids[_mask]
+        _distances = get_block_distances(_worker_queries, vectors, task["metric_type"])
+        _ids = np.broadcast_to(_ids, _distances.shape)
+        ids, distances = merge_top_k(np.hstack([ids, _ids]), np.hstack([distances, _distances]), top_k)
+    return ids, distances, task["rows"]
+
+
+def compute_ground_truth(data_type, dim, data_size, metric_type, top_k=dv.default_ground_truth_top_k,
+                         queries: np.ndarray = None, block_rows=dv.default_ground_truth_block_rows, processes=None,
+                         mask: np.ndarray = None, nq: int = None):
+    """
+    Brute-force exact top_k neighbors of the queries in the first data_size rows of the dataset,
+    ids are the row numbers, the same as the ids inserted by Base.insert
+
+    :param queries: the first nq vectors in the query file of the dataset if None
+    :param mask: only search the rows passing the filter, rows of each query are padded with id -1
+                 if less than top_k rows pass the filter
+    :param block_rows: rows of each distances matmul, memory of each process is about nq * block_rows * 16 bytes
+    :param processes: number of processes to search shards, os.cpu_count() if None
+    :param nq: only the first nq queries are searched, all the queries if None
+    :return: np.ndarray of ids with shape (nq, top_k), sorted by distances; [] if the metric type is not supported
+    """
+    data_size, metric_type = parser_data_size(data_size), metric_type.upper()
+    if metric_type not in GROUND_TRUTH_METRICS:
+        log.warning("[compute_ground_truth] Metric type {0} is not supported, only {1}".format(
+            metric_type, GROUND_TRUTH_METRICS))
+        return []
+    if queries is None:
+        queries = read_query_vectors(dim, data_type, nq)
+    elif nq is not None:
+        queries = queries[:int(nq)]
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if metric_type == SimilarityMetrics.COSINE:
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        queries = queries / norms
+
+    tasks, start_id = [], 0
+    for shard in get_dataset_shards(dim, data_type, data_size):
+        rows = min(shard["rows"], data_size - start_id)
+        tasks.append({"shard": shard, "rows": rows, "start_id": start_id, "top_k": int(top_k),
+                      "block_rows": int(block_rows), "metric_type": metric_type,
+                      "mask": mask[start_id:start_id + rows] if mask is not None else None})
+        start_id += rows
+    if start_id < data_size:
+        msg = "[compute_ground_truth] The dataset {0} with dim {1} has less than {2} rows, please check.".format(
+            data_type, dim, data_size)
+        log.error(msg)
+        raise Exception(msg)
+    log.info("[compute_ground_truth] Start computing top{0} {1} ground truth of {2} queries in {3} rows of {4}".format(
+        top_k, metric_type, len(queries), data_size, data_type))
+
+    ids = np.empty((len(queries), 0), dtype=np.int64)
+    distances = np.empty((len(queries), 0), dtype=np.float32)
+    with multiprocessing.Pool(processes=processes or os.cpu_count(), initializer=_init_ground_truth_worker,
+                              initargs=(queries,)) as pool:
+        with tqdm.tqdm(total=data_size) as bar:
+            bar.set_description("Ground Truth Processing")
+            for _ids, _distances, rows in pool.imap_unordered(search_shard_top_k, tasks):
+                ids, distances = merge_top_k(np.hstack([ids, _ids]), np.hstack([distances, _distances]), top_k)
+                bar.update(rows)
+
+    if ids.shape[1] < top_k:
+        ids = np.hstack([ids, np.full((len(ids), top_k - ids.shape[1]), -1, dtype=np.int64)])
+        distances = np.hstack([distances, np.full((len(ids), top_k - distances.shape[1]), np.inf, dtype=np.float32)])
+    return sort_top_k(ids, distances)[0]
+
+
+def is_cached_ground_truth(true_ids: np.ndarray, top_k: int, nq: int = None):
+    """ Whether the cached ground truth has enough queries and neighbors """
+    return true_ids.shape[1] >= int(top_k) and (nq is None or len(true_ids) >= int(nq))
+
+
+def get_ground_truth_ids(data_size, data_type: str, dim: int = None, metric_type: str = None,
+                         top_k: int = dv.default_ground_truth_top_k, nq: int = None):
+    """
+    Read the precomputed ground truth file, or compute the exact ground truth of the first nq queries
+    if dim and metric_type are given, the computed ground truth is cached in the ground truth path of the dataset
+    """
+    gnd_file_name = gen_ground_truth_file_name(data_size, data_type)
+    if parser_data_size(data_size) % 1000000 == 0 and os.path.isfile(gnd_file_name):
+        return read_ground_truth_file(gnd_file_name)
+
+    if dim is None or metric_type is None or data_type == "local" or metric_type.upper() not in GROUND_TRUTH_METRICS:
+        check_file_exist(gnd_file_name)
+        return []
+
+    gnd_file_name = gen_ground_truth_file_name(data_size, data_type, metric_type, dim=dim)
+    if os.path.isfile(gnd_file_name):
+        true_ids = read_ground_truth_file(gnd_file_name)
+        if is_cached_ground_truth(true_ids, top_k, nq):
+            return true_ids
+        log.info("[get_ground_truth_ids] The cached ground truth {0} of {1} queries and top{2} is less than {3} "
+                 "queries and top{4}".format(gnd_file_name, len(true_ids), true_ids.shape[1], nq, top_k))
+
+    true_ids = compute_ground_truth(data_type, dim, data_size, metric_type,
+                                    top_k=max(int(top_k), dv.default_ground_truth_top_k), nq=nq)
+    write_ground_truth_file(gnd_file_name, true_ids)
+    log.info("[get_ground_truth_ids] Save the ground truth to {}".format(gnd_file_name))
+    return true_ids
+
+
+def gen_expr_mask(expr: str, collection_schema: dict, data_size, scalars_params: dict = {}, varchar_filled=False,
+                  block_rows=dv.default_dataset_shard_size):
+    """
+    Evaluate the expression of search on the scalar columns of the first data_size rows,
+    the columns are generated or read from the scalar datasets in the same way as Base.insert
+    :return: np.ndarray of bool with shape (data_size,)
+    """
+    data_size, block_rows = parser_data_size(data_size), int(block_rows)
+    fields = {f["name"]: f for f in collection_schema["fields"]}
+    insert_scalars_params = gen_scalar_values(scalars_params, block_rows)
+    mask = np.empty(data_size, dtype=bool)
+
+    for start in range(0, data_size, block_rows):
+        ids = np.arange(start, min(start + block_rows, data_size), dtype=np.int64)
+        _scalars_params = next(insert_scalars_params)
+        columns = {}
+
+        def get_column(name):
+            if name not in fields:
+                msg = "[gen_expr_mask] Field {0} of expression is not in the collection schema: {1}".format(name, expr)
+                log.error(msg)
+                raise Exception(msg)
+            if name not in columns:
+                field, _params = fields[name], _scalars_params.get(name, {})
+                from_dataset = _params.get("default_value") is not None
+                if field["type"] == DataType.VARCHAR and not from_dataset and \
+                        _params.get("other_params", {}).get("varchar_filled", varchar_filled):
+                    msg = "[gen_expr_mask] Values of varchar field {0} are random, can not be filtered".format(name)
+                    log.error(msg)
+                    raise Exception(msg)
+                if hasattr(DataType, "JSON") and field["type"] == DataType.JSON:
+                    msg = "[gen_expr_mask] Json field {0} is not supported to be filtered".format(name)
+                    log.error(msg)
+                    raise Exception(msg)
+                columns[name] = np.asarray(gen_values(field["type"], None, ids, varchar_filled, field, **_params))
+            return columns[name]
+
+        mask[start:start + len(ids)] = eval_expr_mask(expr, get_column)
+    return mask
+
+
+def get_filter_key(expr: str, scalars_params: dict = {}, varchar_filled=False):
+    """ Key of the cached ground truth, changes with the expression and the source of scalar columns """
+    return "%08x" % zlib.crc32(json.dumps({"expr": expr, "scalars_params": scalars_params,
+                                           "varchar_filled": varchar_filled}, sort_keys=True).encode())
+
+
+def get_filter_ground_truth_ids(data_size, data_type: str, dim: int, metric_type: str, expr: str,
+                                collection_schema: dict, scalars_params: dict = {}, varchar_filled=False,
+                                top_k: int = dv.default_ground_truth_top_k, nq: int = None):
+    """
+    Exact ground truth of the first nq queries over the rows passing the expression of search,
+    cached by the dim and the key of the filter
+    :return: (np.ndarray of ids, selectivity of the expression); ([], None) if the metric type is not supported
+    """
+    if metric_type.upper() not in GROUND_TRUTH_METRICS:
+        log.warning("[get_filter_ground_truth_ids] Metric type {0} is not supported, only {1}".format(
+            metric_type, GROUND_TRUTH_METRICS))
+        return [], None
+    mask = gen_expr_mask(expr, collection_schema, data_size, scalars_params, varchar_filled)
+    selectivity = float(mask.mean()) if len(mask) else 0.0
+    log.info("[get_filter_ground_truth_ids] Selectivity of expression {0}: {1}".format(expr, selectivity))
+
+    gnd_file_name = gen_ground_truth_file_name(data_size, data_type, metric_type, dim=dim,
+                                               filter_key=get_filter_key(expr, scalars_params, varchar_filled))
+    if os.path.isfile(gnd_file_name):
+        true_ids = read_ground_truth_file(gnd_file_name)
+        if is_cached_ground_truth(true_ids, top_k, nq):
+            return true_ids, selectivity
+
+    true_ids = compute_ground_truth(data_type, dim, data_size, metric_type,
+                                    top_k=max(int(top_k), dv.default_ground_truth_top_k), mask=mask, nq=nq)
+    write_ground_truth_file(gnd_file_name, true_ids)
+    log.info("[get_filter_ground_truth_ids] Save the ground truth of {0} to {1}".format(expr, gnd_file_name))
+    return true_ids, selectivity
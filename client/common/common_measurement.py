@@ -0,0 +1,133 @@
+import time
+import numpy as np
+from statistics import NormalDist
+
+from client.common.common_type import MeasureStatistic, Precision
+from client.common.common_type import DefaultValue as dv
+
+from utils.util_log import log
+
+
+def get_ci_width(samples, statistic=MeasureStatistic.MEAN, confidence=dv.default_measure_confidence):
+    """
+    Width of the confidence interval of the statistic relative to the statistic
+        mean: normal approximation, 2 * z * std / sqrt(n)
+        p99: distribution-free interval between the order statistics around rank n * 0.99
+    :return: relative width, inf if there are too few samples to bound the interval
+    """
+    n = len(samples)
+    if n < 2:
+        return float("inf")
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    x = np.asarray(samples, dtype=np.float64)
+
+    if statistic == MeasureStatistic.MEAN:
+        value = x.mean()
+        width = 2 * z * x.std(ddof=1) / np.sqrt(n)
+    elif statistic == MeasureStatistic.P99:
+        q = 0.99
+        half = z * np.sqrt(n * q * (1 - q))
+        low, high = int(np.floor(n * q - half)), int(np.ceil(n * q + half))
+        if low < 0 or high > n - 1:
+            return float("inf")
+        x = np.sort(x)
+        value = np.percentile(x, 99)
+        width = x[high] - x[low]
+    else:
+        msg = "[get_ci_width] Not supported statistic: {}".format(statistic)
+        log.error(msg)
+        raise Exception(msg)
+    return float(width / value) if value > 0 else float("inf")
+
+
+def is_steady(samples, window=dv.default_measure_steady_window, tolerance=dv.default_measure_steady_tolerance):
+    """ The mean of the last window is within the tolerance of the mean of the window before it """
+    if len(samples) < 2 * window:
+        return False
+    last, prev = np.mean(samples[-window:]), np.mean(samples[-2 * window:-window])
+    return bool(abs(last - prev) <= tolerance * prev)
+
+
+class MeasurementRunner:
+    """
+    Call func repeatedly to measure its response time
+        1. warm up until the response time is steady or the warmup time runs out
+        2. sample until the confidence interval of the statistic is narrow enough,
+           max_counts are reached or the time budget runs out
+    """
+
+    def __init__(self, func: callable, warmup_time=dv.default_measure_warmup_time,
+                 steady_window=dv.default_measure_steady_window, steady_tolerance=dv.default_measure_steady_tolerance,
+                 ci_target=dv.default_measure_ci_target, ci_statistic=MeasureStatistic.MEAN,
+                 confidence=dv.default_measure_confidence, min_counts=dv.default_measure_min_counts,
+                 max_counts: int = None, time_budget=dv.default_measure_time_budget):
+        """
+        :param func: callable object returning the response time of one request
+        :param warmup_time: max warmup time / second, no warmup if 0
+        :param ci_target: stop sampling once the relative width of the confidence interval is within it
+        :param ci_statistic: mean or p99
+        :param max_counts: max number of samples, not limited if None
+        :param time_budget: max sampling time / second, excluding the warmup
+        """
+        self.func = func
+        self.warmup_time = warmup_time
+        self.steady_window = max(int(steady_window), 1)
+        self.steady_tolerance = steady_tolerance
+        self.ci_target = ci_target
+        self.ci_statistic = ci_statistic
+        self.confidence = confidence
+        self.min_counts = max(int(min_counts), 2)
+        self.max_counts = max_counts
+        self.time_budget = time_budget
+
+    def warmup(self):
+        warmup_rt = []
+        steady = self.warmup_time <= 0
+        start = time.perf_counter()
+        while not steady and time.perf_counter() - start < self.warmup_time:
+            warmup_rt.append(self.func())
+            steady = is_steady(warmup_rt, self.steady_window, self.steady_tolerance)
+        if not steady:
+            log.warning("[MeasurementRunner] RT is not steady after warming up for {}s".format(self.warmup_time))
+        return warmup_rt, steady, time.perf_counter() - start
+
+    def run(self):
+        """
+        :return: response time of the samples, report of the measurement
+        """
+        warmup_rt, steady, warmup_duration = self.warmup()
+
+        samples = []
+        ci_width = float("inf")
+        next_check = self.min_counts
+        start = time.perf_counter()
+        while True:
+            samples.append(self.func())
+            n = len(samples)
+            if n >= next_check:
+                # check the interval about every 10% of samples, so that the cost is linear in total
+                ci_width = get_ci_width(samples, self.ci_statistic, self.confidence)
+                next_check = n + max(1, n // 10)
+                if ci_width <= self.ci_target:
+                    stop_reason = "ci_target"
+                    break
+            if self.max_counts is not None and n >= self.max_counts:
+                stop_reason = "max_counts"
+                break
+            if time.perf_counter() - start >= self.time_budget and n >= 2:
+                stop_reason = "time_budget"
+                break
+
+        ci_width = get_ci_width(samples, self.ci_statistic, self.confidence)
+        report = {
+            "Samples": len(samples),
+            "CIWidth": round(ci_width, Precision.COMMON_PRECISION) if np.isfinite(ci_width) else None,
+            "CIStatistic": self.ci_statistic,
+            "Confidence": self.confidence,
+            "StopReason": stop_reason,
+            "WarmupTime": round(warmup_duration, Precision.COMMON_PRECISION),
+            "WarmupSamples": len(warmup_rt),
+            "Steady": steady
+        }
+        log.info("[MeasurementRunner] Measurement result: {}".format(report))
+        return samples, report
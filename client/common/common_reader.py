@@ -0,0 +1,244 @@
+import os
+import time
+import mmap
+import queue
+import threading
+import numpy as np
+from typing import Iterator
+
+from client.common.common_func import (
+    read_npy_file, read_npy_header, loop_gen_scalar_files, gen_insert_scalars_params, get_shards_offset)
+
+from utils.util_log import log
+
+
+class PrefetchFilesReader:
+    """
+    Read and decode the next `prefetch` files in a background thread,
+    so that the files are ready while the current batch is being inserted
+    """
+
+    _finished = object()
+
+    def __init__(self, files: Iterator, read_func: callable = read_npy_file, prefetch: int = 2, **read_kwargs):
+        """
+        :param files: iterator of file names, or iterator of data that is already decoded lazily
+        :param read_func: function to read one file, the items of `files` are returned as-is if None
+        :param prefetch: maximum number of decoded files waiting in the queue, read synchronously if <= 0
+        """
+        self.files = files
+        self.read_func = read_func
+        self.read_kwargs = read_kwargs
+        self.prefetch = int(prefetch)
+
+        # total time of waiting for files that are not ready
+        self.stall_time = 0.0
+        self.read_counts = 0
+
+        self.stop_flag = False
+        self.queue = queue.Queue(maxsize=max(self.prefetch, 1))
+        self.t = None
+        if self.prefetch > 0:
+            self.t = threading.Thread(target=self._read_files, daemon=True)
+            self.t.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        data = self.queue.get() if self.t is not None else self._read_file()
+        self.stall_time += time.perf_counter() - start
+
+        if data is self._finished:
+            raise StopIteration
+        if isinstance(data, Exception):
+            raise data
+        self.read_counts += 1
+        return data
+
+    def _read_file(self):
+        try:
+            if self.read_func is None:
+                return next(self.files)
+            return self.read_func(next(self.files), **self.read_kwargs)
+        except StopIteration:
+            return self._finished
+        except Exception as e:
+            log.error("[PrefetchFilesReader] Read file raise error: {}".format(e))
+            return e
+
+    def _put(self, data):
+        while not self.stop_flag:
+            try:
+                self.queue.put(data, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_files(self):
+        while not self.stop_flag:
+            data = self._read_file()
+            if not self._put(data) or data is self._finished or isinstance(data, Exception):
+                break
+
+    def stop(self):
+        self.stop_flag = True
+        # release the reading thread if it is blocked on a full queue
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self.t is not None:
+            self.t.join(timeout=5)
+        log.debug("[PrefetchFilesReader] Read %s files, stall time: %ss" % (self.read_counts, self.stall_time))
+
+
+def read_npy_file_mmap(file_name, allow_pickle=False):
+    """
+    Memory-map the npy file and ask the kernel to read it ahead,
+    the pages are loaded in the background instead of being faulted in while inserting
+    """
+    data = read_npy_file(file_name, allow_pickle=allow_pickle, mmap_mode="r")
+    _mmap = getattr(data, "_mmap", None)
+    if isinstance(_mmap, mmap.mmap) and hasattr(_mmap, "madvise"):
+        _mmap.madvise(mmap.MADV_WILLNEED)
+    return data
+
+
+def read_shard_mmap(shard: dict):
+    """
+    Memory-map the npy shard by the dtype, shape and data offset recorded in the dataset manifest
+    """
+    data = np.memmap(shard["file_name"], dtype=np.lib.format.descr_to_dtype(shard["dtype"]), mode="r",
+                     offset=shard["offset"], shape=tuple(shard["shape"]), order="F" if shard["fortran_order"] else "C")
+    _mmap = getattr(data, "_mmap", None)
+    if isinstance(_mmap, mmap.mmap) and hasattr(_mmap, "madvise"):
+        _mmap.madvise(mmap.MADV_WILLNEED)
+    return data
+
+
+def read_shards_batches(shards: list, batch_rows: int, offset: int = 0, rows: int = None):
+    """
+    Copy the rows of the memory-mapped shards into memory batch by batch, used as the lazy files of
+    PrefetchFilesReader, so that the pages are read from disk by the prefetch thread instead of the timed insert
+    :param offset: rows skipped in the first shard without reading them
+    :param rows: stop after reading the rows, all the rows of the shards if None
+    """
+    batch_rows = max(int(batch_rows), 1)
+    for shard in shards:
+        data = read_shard_mmap(shard)
+        start, offset = int(offset), 0
+        while start < len(data):
+            if rows is not None and rows <= 0:
+                return
+            end = min(start + batch_rows, len(data)) if rows is None else min(start + batch_rows, len(data),
+                                                                             start + rows)
+            yield np.array(data[start:end])
+            rows = rows - (end - start) if rows is not None else None
+            start = end
+
+
+class ArraysBatchCursor:
+    """
+    Cut batches of rows from a stream of arrays (e.g. memory-mapped dataset files) by a cursor,
+    a batch is a view of one array, and only the batch that spans multiple arrays is concatenated
+    """
+
+    def __init__(self, arrays: Iterator, offset: int = 0):
+        """
+        :param offset: rows skipped in the first array without reading them, e.g. the offset of the start row in its file
+        """
+        self.arrays = arrays
+        self.current = []
+        self.offset = 0
+        self.skip = int(offset)
+
+    def next_batch(self, length: int):
+        parts = []
+        length = int(length)
+        while length > 0:
+            if self.offset >= len(self.current):
+                # raise StopIteration if there are not enough rows
+                self.current = next(self.arrays)
+                self.offset, self.skip = self.skip, 0
+                continue
+            end = min(self.offset + length, len(self.current))
+            parts.append(self.current[self.offset:end])
+            length -= end - self.offset
+            self.offset = end
+
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+
+def read_scalar_file(file_name):
+    """ Memory-map the scalar npy file, files of python objects (e.g. str, dict) can only be loaded by pickle """
+    if np.lib.format.descr_to_dtype(read_npy_header(file_name)["dtype"]).hasobject:
+        return np.load(file_name, allow_pickle=True)
+    return read_npy_file(file_name, mmap_mode="r")
+
+
+def get_scalar_shards(dataset_name):
+    """ Rows of the scalar files are parsed from the npy headers, without reading the arrays """
+    shards = []
+    for file_name in loop_gen_scalar_files(dataset_name):
+        if not os.path.isfile(file_name):
+            break
+        shards.append(dict(read_npy_header(file_name), file_name=file_name))
+    return shards
+
+
+def loop_scalar_arrays(dataset_name, start_file: int = 0):
+    """
+    Loop the scalar files of the dataset as a ring, go back to the first file after the last one
+    :param start_file: index of the file to start the first loop, files before it are not read
+    """
+    while True:
+        file_counts = 0
+        for i, file_name in enumerate(loop_gen_scalar_files(dataset_name)):
+            if not os.path.isfile(file_name):
+                break
+            file_counts += 1
+            if i < start_file:
+                continue
+            yield read_scalar_file(file_name)
+        start_file = 0
+
+        if file_counts == 0:
+            msg = "[loop_scalar_arrays] Can not get files of scalar dataset: {}, please check.".format(dataset_name)
+            log.error(msg)
+            raise Exception(msg)
+
+
+def seek_scalar_arrays(dataset_name, start_row: int = 0) -> ArraysBatchCursor:
+    """
+    Open the cursor of the scalar files at the start row, the file containing it is located by the rows of files,
+    so the skipped rows are not read, rows after the last file start from the first file again
+    """
+    shards = get_scalar_shards(dataset_name)
+    total_rows = sum(shard["rows"] for shard in shards)
+    if total_rows == 0:
+        # raised by loop_scalar_arrays once the cursor reads
+        return ArraysBatchCursor(loop_scalar_arrays(dataset_name))
+
+    _shards, offset = get_shards_offset(shards, int(start_row) % total_rows)
+    return ArraysBatchCursor(loop_scalar_arrays(dataset_name, start_file=len(shards) - len(_shards)), offset=offset)
+
+
+def gen_scalar_values(scalars_params: dict, insert_length: int, start_row: int = 0):
+    """
+    Values of the scalar fields that have a dataset are slices of the scalar files
+    :param start_row: skip the first rows of the scalar dataset files
+    """
+    _readers = {k: seek_scalar_arrays(scalars_params[k]["other_params"].get("dataset"), start_row) for k in
+                scalars_params.keys() if scalars_params[k].get("other_params", {}).get("dataset", False)}
+    _insert_scalars_params = gen_insert_scalars_params(scalars_params)
+
+    while True:
+        for k, reader in _readers.items():
+            _insert_scalars_params[k]["default_value"] = reader.next_batch(insert_length)
+        yield _insert_scalars_params
@@ -1,4 +1,8 @@
-import queue
+import time
+import threading
+import multiprocessing
+import numpy as np
+from collections import deque
 from typing import Optional, Union, Callable, List, Dict, AnyStr
 
 from commons.common_params import EnvVariable
@@ -38,6 +42,7 @@ class DefaultValue:
     default_dim = 128
     default_shards_num = 2
     default_max_length = 256  # 65535
+    varchar_pool_size = 1 << 20
     default_desc = ""
 
     default_int64_field_name = "int64"
@@ -58,6 +63,61 @@ class DefaultValue:
     Max_file_count = 10000
 
     SCALAR_FILE_PREFIX = "scalar"
+    manifest_version = 1
+    manifest_checksum_bytes = 65536
+    default_dataset_shard_size = 1000000
+    default_dataset_nq = 10000
+    default_dataset_clusters = 1000
+    default_dataset_cluster_std = 0.05
+    default_read_prefetch = 2
+    default_parquet_batch_size = 65536
+    default_insert_workers = 1
+    default_insert_worker_type = "thread"
+    default_insert_worker_alias = "insert_worker"
+    default_timeline_interval = 1
+    default_recall_top_ks = [1, 10, 100]
+    default_ground_truth_top_k = 100
+    default_ground_truth_block_rows = 4096
+    default_ann_chunk_rows = 100000
+    default_ann_cache = False  # the cache writes full copies of the train vectors
+    default_ann_cache_dir = EnvVariable.FOURAM_ANN_CACHE_DIR
+    ann_cache_version = 1
+
+    default_minio_endpoint = "127.0.0.1:9000"
+    default_minio_access_key = "minioadmin"
+    default_minio_secret_key = "minioadmin"
+    default_minio_bucket_name = "a-bucket"
+    default_bulk_insert_path = "fouram_bulk_insert"
+    default_bulk_insert_tasks = 4
+    default_bulk_insert_timeout = 36000
+    bulk_insert_poll_interval = 1
+    bulk_insert_max_poll_interval = 30
+    default_tuner_ni_range = [100, 100000]
+    default_tuner_probe_batches = 10
+    default_tuner_tolerance = 0.25  # width of the search interval of log2(ni)
+    default_tuner_max_probes = 12
+    default_grpc_max_message_size = 64 * 1024 * 1024  # proxy.grpc.serverMaxRecvSize of milvus
+    grpc_message_size_ratio = 0.8  # room for the encoding overhead of the insert request
+    default_json_row_bytes = 64
+    default_measure_warmup_time = 10
+    default_measure_steady_window = 10
+    default_measure_steady_tolerance = 0.1  # relative change of the mean RT between two windows
+    default_measure_ci_target = 0.05  # width of the confidence interval relative to the statistic
+    default_measure_confidence = 0.95
+    default_measure_min_counts = 10
+    default_measure_time_budget = 300
+    default_acc_search_counts = 100
+    default_acc_search_time_budget = 500
+    default_locust_workers = 0  # local runner if 0, one worker per cpu core if less than 0
+    default_locust_master_host = "127.0.0.1"
+    default_locust_worker_timeout = 120
+    default_histogram_sub_bucket_bits = 11  # relative error of percentiles is within 1 / 1024
+    default_histogram_max_bits = 42  # about 50 days in microseconds
+    default_latency_percentiles = [50, 90, 95, 99, 99.9]
+    default_arrival_distribution = "poisson"
+    default_concurrent_backend = "locust"
+    default_thread_runner_max_threads = 512  # each thread has its own stack, more users share the threads
+    default_load_shape_step_duration = 30  # seconds of each stage of the continuous load shapes
 
     default_timeout = 600
     default_resource_group = "__default_resource_group"
@@ -68,6 +128,51 @@ class DefaultValue:
     default_backup_alias = "backup_alias"
 
 
+class DatasetFormat:
+    NPY = "npy"
+    PARQUET = "parquet"
+
+
+class DatasetDistribution:
+    UNIFORM = "uniform"
+    GAUSSIAN_MIXTURE = "gaussian_mixture"
+
+
+class ScalarDatasetType:
+    INT64 = "int64"
+    DOUBLE = "double"
+    VARCHAR = "varchar"
+    JSON = "json"
+
+
+class InsertWorkerType:
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class MeasureStatistic:
+    MEAN = "mean"
+    P99 = "p99"
+
+
+class ConcurrentBackend:
+    LOCUST = "locust"
+    THREAD = "thread"
+
+
+class LoadShapeType:
+    STAGES = "stages"
+    RAMP = "ramp"
+    STEP = "step"
+    SPIKE = "spike"
+    SINE = "sine"
+
+
+class ArrivalDistribution:
+    POISSON = "poisson"
+    UNIFORM = "uniform"
+
+
 class SimilarityMetrics:
     L2 = "L2"
     IP = "IP"
@@ -116,36 +221,508 @@ class CaseIterParams:
         self.ObjectKwargs = object_kwargs
 
 
+class IdAllocator:
+    """
+    Hand out contiguous blocks of ids, the counter is in shared memory and guarded by a process lock,
+    so ids are unique across greenlets, threads and forked processes
+    """
+
+    def __init__(self, start=0, ctx=None):
+        """ :param ctx: multiprocessing context of the processes sharing the counter, the default context if None """
+        self._next_id = (ctx or multiprocessing).Value("q", int(start))
+
+    @property
+    def next_id(self) -> int:
+        with self._next_id.get_lock():
+            return self._next_id.value
+
+    def reset(self, start=0):
+        with self._next_id.get_lock():
+            self._next_id.value = int(start)
+
+    def allocate(self, length: int) -> range:
+        with self._next_id.get_lock():
+            start = self._next_id.value
+            self._next_id.value += int(length)
+        return range(start, start + int(length))
+
+    def allocate_array(self, length: int) -> np.ndarray:
+        _range = self.allocate(length)
+        return np.arange(_range.start, _range.stop, dtype=np.int64)
+
+
+class TokenBucket:
+    """
+    Limit the rate of rows to `rate` per second with bursts of at most `burst` rows,
+    a request larger than the saved tokens reserves them and waits until they are refilled
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        if self.rate <= 0 or self.burst <= 0:
+            raise Exception("[TokenBucket] Rate and burst should be greater than 0, rate: {0}, burst: {1}".format(
+                rate, burst))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tokens = self.burst
+            self.start_time = None
+            self.last_time = None
+            self.acquired = 0
+            self.wait_time = 0.0
+            self.lags = []
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until the tokens are available
+        :return: seconds of sending these rows behind the schedule of the target rate
+        """
+        with self._lock:
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = self.last_time = now
+            self.tokens = min(self.tokens + (now - self.last_time) * self.rate, self.burst) - int(tokens)
+            self.last_time = now
+
+            wait = max(-self.tokens / self.rate, 0.0)
+            lag = max(now + wait - (self.start_time + self.acquired / self.rate), 0.0)
+            self.acquired += int(tokens)
+            self.wait_time += wait
+            self.lags.append(lag)
+        if wait > 0:
+            time.sleep(wait)
+        return lag
+
+    def __getstate__(self):
+        # the lock can not be pickled, a copy sent to another process limits the rate by itself
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0
+        return {
+            "target_rows_per_sec": self.rate,
+            "burst": self.burst,
+            "achieved_rows_per_sec": round(self.acquired / elapsed, Precision.INSERT_PRECISION) if elapsed else 0,
+            "wait_time": round(self.wait_time, Precision.COMMON_PRECISION),
+            "lag": {"avg": round(float(np.mean(self.lags)), Precision.COMMON_PRECISION) if self.lags else 0,
+                    "max": round(max(self.lags), Precision.COMMON_PRECISION) if self.lags else 0,
+                    "final": round(self.lags[-1], Precision.COMMON_PRECISION) if self.lags else 0}
+        }
+
+
+class ArrivalSchedule:
+    """ Intended send times of one type of requests with a fixed arrival rate, generated lazily from the start time """
+
+    def __init__(self, rate, distribution=DefaultValue.default_arrival_distribution):
+        self.rate = float(rate)
+        self.distribution = distribution
+        if self.rate <= 0:
+            raise Exception("[ArrivalSchedule] Arrival rate should be greater than 0, rate: {}".format(rate))
+        if distribution not in (ArrivalDistribution.POISSON, ArrivalDistribution.UNIFORM):
+            raise Exception("[ArrivalSchedule] Not supported arrival distribution: {}".format(distribution))
+        self.rng = np.random.default_rng()
+        self.reset()
+
+    def reset(self, start_time=None):
+        self.next_time = start_time
+        self.pending = deque()
+        # arrivals taken before their intended time, which are not due yet
+        self.ahead = deque()
+        self.arrivals = 0
+        self.issued = 0
+
+    def _advance(self):
+        t = self.next_time
+        gap = self.rng.exponential(1 / self.rate) if self.distribution == ArrivalDistribution.POISSON else 1 / self.rate
+        self.next_time += gap
+        self.arrivals += 1
+        return t
+
+    def generate_until(self, now):
+        """ Arrivals due by now are pending until they are issued """
+        while self.ahead and self.ahead[0] <= now:
+            self.ahead.popleft()
+        while self.next_time <= now:
+            self.pending.append(self._advance())
+
+    @property
+    def head(self):
+        return self.pending[0] if self.pending else self.next_time
+
+    def pop(self, now):
+        self.issued += 1
+        if self.pending:
+            return self.pending.popleft()
+        intended_time = self._advance()
+        if intended_time > now:
+            self.ahead.append(intended_time)
+        return intended_time
+
+    @property
+    def due_arrivals(self):
+        return self.arrivals - len(self.ahead)
+
+    @property
+    def due_issued(self):
+        return self.issued - len(self.ahead)
+
+    @property
+    def backlog(self):
+        return len(self.pending)
+
+
+class OpenLoopScheduler:
+    """
+    Schedule requests of each type at a fixed arrival rate regardless of the responses,
+    users take the next arrival and send it at its intended time, so the arrivals queue up as the backlog
+    once all users are busy, instead of lowering the offered load like closed-loop users do
+    """
+
+    def __init__(self, arrival_rates: dict, distribution=DefaultValue.default_arrival_distribution):
+        """
+        :param arrival_rates: target requests per second of each request type, e.g. {"search": 100, "query": 10}
+        :param distribution: poisson or uniform inter-arrival times
+        """
+        self.distribution = distribution
+        self.schedules = {name: ArrivalSchedule(rate, distribution) for name, rate in arrival_rates.items()}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start_time = None
+            self.backlog_max = 0
+            self.backlog_sum = 0
+            self.backlog_samples = 0
+            self.send_delay_max = 0.0
+            for schedule in self.schedules.values():
+                schedule.reset()
+
+    def _sample_backlog(self, now):
+        for schedule in self.schedules.values():
+            schedule.generate_until(now)
+        backlog = sum(s.backlog for s in self.schedules.values())
+        self.backlog_max = max(self.backlog_max, backlog)
+        self.backlog_sum += backlog
+        self.backlog_samples += 1
+
+    def next_arrival(self):
+        """
+        Take the earliest arrival of all request types, the schedule starts with the first call
+        :return: request type, intended send time based on time.perf_counter
+        """
+        with self._lock:
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = now
+                for schedule in self.schedules.values():
+                    schedule.reset(start_time=now)
+            self._sample_backlog(now)
+
+            name, schedule = min(self.schedules.items(), key=lambda x: x[1].head)
+            intended_time = schedule.pop(now)
+            self.send_delay_max = max(self.send_delay_max, now - intended_time)
+        return name, intended_time
+
+    def report(self):
+        with self._lock:
+            now = time.perf_counter()
+            elapsed = now - self.start_time if self.start_time is not None else 0
+            if self.start_time is not None:
+                self._sample_backlog(now)
+            return {
+                "distribution": self.distribution,
+                "duration": round(elapsed, Precision.CONCURRENT_PRECISION),
+                "tasks": {name: {
+                    "target_rps": s.rate,
+                    "arrivals": s.due_arrivals,
+                    "issued": s.due_issued,
+                    "issued_rps": round(s.due_issued / elapsed, Precision.CONCURRENT_PRECISION) if elapsed else 0,
+                    "backlog": s.backlog} for name, s in self.schedules.items()},
+                "backlog": {
+                    "avg": round(self.backlog_sum / self.backlog_samples, Precision.CONCURRENT_PRECISION)
+                    if self.backlog_samples else 0,
+                    "max": self.backlog_max,
+                    "final": sum(s.backlog for s in self.schedules.values())},
+                # the longest time an arrival waited for a free user / ms
+                "send_delay_max": round(max(self.send_delay_max, 0.0) * 1000, Precision.CONCURRENT_PRECISION)
+            }
+
+    @staticmethod
+    def merge_reports(reports: list):
+        """
+        Merge the reports of schedulers running in parallel, e.g. in locust workers,
+        the max backlog is the sum of the max of each scheduler, which is an upper bound
+        """
+        if not reports:
+            return {}
+        result = {"distribution": reports[0]["distribution"],
+                  "duration": max(r["duration"] for r in reports),
+                  "tasks": {},
+                  "backlog": {k: round(sum(r["backlog"][k] for r in reports), Precision.CONCURRENT_PRECISION)
+                              for k in ["avg", "max", "final"]},
+                  "send_delay_max": max(r["send_delay_max"] for r in reports)}
+        for r in reports:
+            for name, task in r["tasks"].items():
+                if name not in result["tasks"]:
+                    result["tasks"][name] = dict(task)
+                else:
+                    for k, v in task.items():
+                        result["tasks"][name][k] = round(result["tasks"][name][k] + v, Precision.CONCURRENT_PRECISION)
+        return result
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of latency in the style of HdrHistogram: values are counted as integer ticks, ticks below
+    2 ** sub_bucket_bits have their own buckets, and above that each power of 2 is split into 2 ** (sub_bucket_bits - 1)
+    buckets, so the relative error of percentiles is at most 1 / 2 ** (sub_bucket_bits - 1) with fixed memory,
+    histograms of the same layout can be merged
+    """
+
+    def __init__(self, scale=1e6, sub_bucket_bits=None, max_bits=None):
+        """
+        :param scale: ticks per unit of the recorded values, e.g. 1e6 for seconds counted in microseconds
+        :param max_bits: ticks larger than 2 ** max_bits are counted in the last bucket
+        """
+        self.scale = float(scale)
+        self.sub_bucket_bits = int(sub_bucket_bits or DefaultValue.default_histogram_sub_bucket_bits)
+        self.max_bits = max(int(max_bits or DefaultValue.default_histogram_max_bits), self.sub_bucket_bits)
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.max_ticks = (1 << self.max_bits) - 1
+        self.counts = np.zeros(self.sub_bucket_count + (self.max_bits - self.sub_bucket_bits) * self.sub_bucket_half,
+                               dtype=np.int64)
+        self.reset()
+
+    @property
+    def layout(self):
+        return [self.scale, self.sub_bucket_bits, self.max_bits]
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total = 0
+        self.sum = 0.0
+        self.min_ticks = self.max_ticks
+        self.max_ticks_recorded = 0
+
+    def _index(self, ticks: int) -> int:
+        shift = max(ticks.bit_length() - self.sub_bucket_bits, 0)
+        if shift == 0:
+            return ticks
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (ticks >> shift) - self.sub_bucket_half
+
+    def _indexes(self, ticks: np.ndarray) -> np.ndarray:
+        # exponent of frexp is the bit length of positive integers below 2 ** 53
+        shift = np.maximum(np.frexp(ticks)[1] - self.sub_bucket_bits, 0)
+        return np.where(shift == 0, ticks, self.sub_bucket_count + (shift - 1) * self.sub_bucket_half +
+                        (ticks >> shift) - self.sub_bucket_half)
+
+    def _highest_ticks(self, indexes: np.ndarray) -> np.ndarray:
+        """ The largest ticks counted in the buckets """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        over = np.maximum(indexes - self.sub_bucket_count, 0)
+        shift = np.where(indexes < self.sub_bucket_count, 0, over // self.sub_bucket_half + 1)
+        sub = np.where(indexes < self.sub_bucket_count, indexes, over % self.sub_bucket_half + self.sub_bucket_half)
+        return ((sub + 1) << shift) - 1
+
+    def record_value(self, value: float):
+        """ Record one value, faster than record for a single value """
+        ticks = min(max(int(round(value * self.scale)), 0), self.max_ticks)
+        self.counts[self._index(ticks)] += 1
+        self.total += 1
+        self.sum += value
+        self.min_ticks = min(self.min_ticks, ticks)
+        self.max_ticks_recorded = max(self.max_ticks_recorded, ticks)
+
+    def record(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(values) == 0:
+            return
+        ticks = np.clip(np.round(values * self.scale), 0, self.max_ticks).astype(np.int64)
+        np.add.at(self.counts, self._indexes(ticks), 1)
+        self.total += len(values)
+        self.sum += float(values.sum())
+        self.min_ticks = min(self.min_ticks, int(ticks.min()))
+        self.max_ticks_recorded = max(self.max_ticks_recorded, int(ticks.max()))
+
+    def merge(self, other):
+        if other.layout != self.layout:
+            raise Exception("[LatencyHistogram] Can not merge histograms of different layouts: {0}, {1}".format(
+                self.layout, other.layout))
+        self.counts += other.counts
+        self.total += other.total
+        self.sum += other.sum
+        self.min_ticks = min(self.min_ticks, other.min_ticks)
+        self.max_ticks_recorded = max(self.max_ticks_recorded, other.max_ticks_recorded)
+        return self
+
+    def subtract(self, previous):
+        """
+        Values recorded since the previous snapshot of this histogram, e.g. a deep copy taken earlier,
+        min and max are limited to the precision of buckets
+        """
+        if previous.layout != self.layout:
+            raise Exception("[LatencyHistogram] Can not subtract histograms of different layouts: {0}, {1}".format(
+                self.layout, previous.layout))
+        histogram = LatencyHistogram(*self.layout)
+        histogram.counts = self.counts - previous.counts
+        histogram.total = self.total - previous.total
+        histogram.sum = self.sum - previous.sum
+        indexes = np.flatnonzero(histogram.counts)
+        if len(indexes) > 0:
+            lowest = int(self._highest_ticks([indexes[0] - 1])[0]) + 1 if indexes[0] > 0 else 0
+            histogram.min_ticks = max(lowest, self.min_ticks)
+            histogram.max_ticks_recorded = min(int(self._highest_ticks([indexes[-1]])[0]), self.max_ticks_recorded)
+        return histogram
+
+    def to_dict(self):
+        """ Sparse counts which can be sent between processes """
+        indexes = np.flatnonzero(self.counts)
+        return {"layout": self.layout, "indexes": indexes.tolist(), "counts": self.counts[indexes].tolist(),
+                "total": self.total, "sum": self.sum, "min_ticks": self.min_ticks,
+                "max_ticks": self.max_ticks_recorded}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        histogram = cls(*data["layout"])
+        histogram.counts[np.asarray(data["indexes"], dtype=np.int64)] = data["counts"]
+        histogram.total = data["total"]
+        histogram.sum = data["sum"]
+        histogram.min_ticks = data["min_ticks"]
+        histogram.max_ticks_recorded = data["max_ticks"]
+        return histogram
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    @property
+    def min(self):
+        return self.min_ticks / self.scale if self.total else 0
+
+    @property
+    def max(self):
+        return self.max_ticks_recorded / self.scale
+
+    def get_percentiles(self, percentiles: list) -> list:
+        """ The largest value of the bucket where each percentile falls in, limited by the recorded min and max """
+        if self.total == 0:
+            return [0 for _ in percentiles]
+        ranks = np.clip(np.ceil(np.asarray(percentiles, dtype=np.float64) / 100 * self.total), 1, self.total)
+        indexes = np.searchsorted(np.cumsum(self.counts), ranks)
+        ticks = np.clip(self._highest_ticks(indexes), self.min_ticks, self.max_ticks_recorded)
+        return (ticks / self.scale).tolist()
+
+    def percentiles_report(self, percentiles: list = None, precision=None):
+        """ :return: e.g. {"TP50": 1.2, "TP99": 2.3, "TP99_9": 3.4} """
+        percentiles = percentiles or DefaultValue.default_latency_percentiles
+        values = self.get_percentiles(percentiles)
+        return {"TP" + "{:g}".format(p).replace(".", "_"): round(v, precision) if precision is not None else v
+                for p, v in zip(percentiles, values)}
+
+
+class IdsRingBuffer:
+    """ Array-backed FIFO of ids with bulk push and pop, new ids are dropped if the buffer is full """
+
+    def __init__(self, capacity=500000):
+        self.capacity = int(capacity)
+        self._buffer = np.empty(self.capacity, dtype=np.int64)
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def qsize(self):
+        return self._size
+
+    def full(self):
+        return self._size >= self.capacity
+
+    def push(self, ids) -> int:
+        """ :return: number of ids pushed """
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            length = min(len(ids), self.capacity - self._size)
+            if length > 0:
+                positions = (self._head + self._size + np.arange(length)) % self.capacity
+                self._buffer[positions] = ids[:length]
+                self._size += length
+        return length
+
+    def pop(self, length: int) -> np.ndarray:
+        """ :return: at most length ids in the order of pushing """
+        with self._lock:
+            length = min(int(length), self._size)
+            ids = self._buffer.take(np.arange(self._head, self._head + length), mode="wrap")
+            self._head = (self._head + length) % self.capacity if self.capacity else 0
+            self._size -= length
+        return ids
+
+
 class ConcurrentGlobalParams:
     def __init__(self, request_type="grpc", queue_length=500000):
         self.request_type = request_type
 
+        # ids of the concurrent insert and upsert requests
+        self.id_allocator = IdAllocator()
+
         # statistics inserted ids
         self.queue_length = queue_length
-        self.concurrent_insert_ids = queue.Queue(self.queue_length)
-        self.concurrent_insert_delete_flush = queue.Queue(self.queue_length)
+        self.concurrent_insert_ids = IdsRingBuffer(self.queue_length)
+        self.concurrent_insert_delete_flush = IdsRingBuffer(self.queue_length)
+
+        # latency histograms of the concurrent requests in ms, keyed by the request name
+        self.latency_histograms = {}
+
+        # arrivals of the open-loop mode, and reports of the schedulers in workers keyed by the worker id
+        self.open_loop_scheduler = None
+        self.open_loop_reports = {}
+
+    def record_latency(self, name: str, response_time: float):
+        if name not in self.latency_histograms:
+            self.latency_histograms[name] = LatencyHistogram(scale=1e3)
+        self.latency_histograms[name].record_value(response_time)
+
+    def reset_latency(self):
+        self.latency_histograms = {}
+
+    def dump_latency(self, reset=True) -> dict:
+        """ Histograms recorded since the last dump, sent from workers to the master """
+        histograms = {name: h.to_dict() for name, h in self.latency_histograms.items() if h.total > 0}
+        if reset:
+            for h in self.latency_histograms.values():
+                h.reset()
+        return histograms
+
+    def merge_latency(self, histograms: dict):
+        for name, data in histograms.items():
+            histogram = LatencyHistogram.from_dict(data)
+            if name not in self.latency_histograms:
+                self.latency_histograms[name] = histogram
+            else:
+                self.latency_histograms[name].merge(histogram)
 
-    def put_data_to_insert_queue(self, queue_obj: queue.Queue, _list: list, queue_length=None):
-        queue_length = queue_length or self.queue_length
+    @staticmethod
+    def put_data_to_insert_queue(queue_obj: IdsRingBuffer, _list):
         if queue_obj.full() or len(_list) == 0:
             return True
-
-        empty_size = queue_length - queue_obj.qsize()
-        _size = empty_size if empty_size <= len(_list) else len(_list)
-        for i in _list[:_size]:
-            queue_obj.put(i)
+        queue_obj.push(_list)
 
     @staticmethod
-    def get_data_from_insert_queue(queue_obj: queue.Queue, length: int):
-        id_list = []
-        q_size = queue_obj.qsize()
-
-        q_ids = length if q_size >= length else q_size
-        for i in range(q_ids):
-            id_list.append(queue_obj.get())
+    def get_data_from_insert_queue(queue_obj: IdsRingBuffer, length: int):
+        id_list = queue_obj.pop(length).tolist()
 
-        for i in range(length - q_ids):
-            id_list.append(i)
+        # not enough inserted ids, use ids from 0
+        id_list.extend(range(length - len(id_list)))
         return id_list
 
 
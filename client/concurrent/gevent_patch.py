@@ -0,0 +1,11 @@
+def patch_gevent(locust_patch_switch=False):
+    """
+    Monkey patch the process for the gevent users of locust, called before importing locust and creating grpc channels
+    :param locust_patch_switch: also patch ssl if True, which is skipped by default
+    """
+    from gevent import monkey
+    _patch_params = {} if locust_patch_switch else {"ssl": False}
+    monkey.patch_all(**_patch_params)
+    # from requests.packages.urllib3.util.ssl_ import create_urllib3_context; create_urllib3_context()
+    import grpc.experimental.gevent as grpc_gevent
+    grpc_gevent.init_gevent()
@@ -1,3 +1,4 @@
+import time
 from locust import User, TaskSet, events
 
 from client.common.common_type import concurrent_global_params
@@ -9,6 +10,7 @@ def event_catch():
             result = func(*args, **kwargs)
             exception = None if result.check_result else "False"
             rt = result.rt * 1000
+            concurrent_global_params.record_latency(func.__name__, rt)
             events.request.fire(request_type=concurrent_global_params.request_type, name=func.__name__,
                                 response_time=rt, response_length=0, exception=exception, context=User.context)
         return inner_wrapper
@@ -25,16 +27,33 @@ class ClientTask:
 
         def wrapper(*args, **kwargs):
             result = func(*args, **kwargs)
-            exception = None if result.check_result else "False"
-            rt = result.rt * 1000
-            events.request.fire(request_type=concurrent_global_params.request_type, name=name,
-                                response_time=rt, response_length=0, exception=exception, context=User.context)
+            self.fire_request(name, result, result.rt * 1000)
 
         return wrapper
 
+    def send_at(self, name, intended_time, *args, **kwargs):
+        """ Send the request of the open-loop mode, the response time is counted from the intended send time """
+        result = getattr(self.obj, "concurrent_{0}".format(name))(*args, **kwargs)
+        self.fire_request(name, result, (time.perf_counter() - intended_time) * 1000)
+
+    @staticmethod
+    def fire_request(name, result, rt):
+        exception = None if result.check_result else "False"
+        concurrent_global_params.record_latency(name, rt)
+        events.request.fire(request_type=concurrent_global_params.request_type, name=name,
+                            response_time=rt, response_length=0, exception=exception, context=User.context)
+
 
 class MyTaskSet(TaskSet):
 
+    def open_loop(self):
+        """ Take the next arrival of the open-loop schedule, and send it at the intended time """
+        name, intended_time = concurrent_global_params.open_loop_scheduler.next_arrival()
+        delay = intended_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.client.send_at(name, intended_time, getattr(self.tasks_params, name).params)
+
     def debug(self):
         self.client.debug(self.tasks_params.debug.params)
     
@@ -1,16 +1,21 @@
 import time
+import copy
 import gevent
 import threading
-from locust import User, events
+from locust import User, LoadTestShape, events
 from locust.stats import print_stats, print_percentile_stats, StatsEntry
 from locust.env import Environment
 
 from client.cases.case_report import CasesReport
-from client.common.common_func import get_spawn_rate
-from client.common.common_type import Precision
+from client.common.common_func import get_spawn_rate, get_load_shape_stages
+from client.common.common_type import Precision, LatencyHistogram, OpenLoopScheduler, concurrent_global_params
+from client.common.common_type import DefaultValue as dv
+from client.parameters import params_name as pn
 from client.parameters.params import ConcurrentTasksParams, ConcurrentObjParams, DataClassBase
 from client.concurrent.locust_client import ClientTask, MyTaskSet
+from client.concurrent.multi_process import LocustWorkers
 from utils.util_log import log
+from parameters.input_params import param_info
 
 
 class TickStatsPrinter:
@@ -57,32 +62,159 @@ class TickStatsPrinter:
         print_stats(self.env_stats, current=False)
 
     def final_result_status(self):
-        api_result = {self.env_stats.total.name: self.get_result_values(self.env_stats.total)}
+        histograms = concurrent_global_params.latency_histograms
+        total_histogram = None
+        for h in histograms.values():
+            total_histogram = copy.deepcopy(h) if total_histogram is None else total_histogram.merge(h)
+
+        api_result = {self.env_stats.total.name: self.get_result_values(self.env_stats.total, total_histogram)}
         for key in sorted(self.env_stats.entries.keys()):
             r = self.env_stats.entries[key]
-            api_result[r.name] = self.get_result_values(r)
+            api_result[r.name] = self.get_result_values(r, histograms.get(r.name, None))
         return api_result
 
     @staticmethod
-    def get_result_values(obj: StatsEntry):
-        return {"Requests": round(obj.num_requests, Precision.CONCURRENT_PRECISION),
-                "Fails": round(obj.num_failures, Precision.CONCURRENT_PRECISION),
-                "RPS": round(obj.total_rps, Precision.CONCURRENT_PRECISION),
-                "fail_s": round(obj.fail_ratio, Precision.CONCURRENT_PRECISION),
-                "RT_max": round(obj.max_response_time, Precision.CONCURRENT_PRECISION),
-                "RT_avg": round(obj.avg_response_time, Precision.CONCURRENT_PRECISION),
-                "TP50": round(obj.get_response_time_percentile(0.5), Precision.CONCURRENT_PRECISION),
-                "TP99": round(obj.get_response_time_percentile(0.99), Precision.CONCURRENT_PRECISION),
-                }
+    def get_result_values(obj: StatsEntry, histogram: LatencyHistogram = None):
+        """ Percentiles are taken from the latency histogram if recorded, which are more accurate than locust's """
+        result = {"Requests": round(obj.num_requests, Precision.CONCURRENT_PRECISION),
+                  "Fails": round(obj.num_failures, Precision.CONCURRENT_PRECISION),
+                  "RPS": round(obj.total_rps, Precision.CONCURRENT_PRECISION),
+                  "fail_s": round(obj.fail_ratio, Precision.CONCURRENT_PRECISION),
+                  "RT_max": round(obj.max_response_time, Precision.CONCURRENT_PRECISION),
+                  "RT_avg": round(obj.avg_response_time, Precision.CONCURRENT_PRECISION),
+                  "TP50": round(obj.get_response_time_percentile(0.5), Precision.CONCURRENT_PRECISION),
+                  "TP99": round(obj.get_response_time_percentile(0.99), Precision.CONCURRENT_PRECISION),
+                  }
+        if histogram is not None and histogram.total > 0:
+            result.update(histogram.percentiles_report(precision=Precision.CONCURRENT_PRECISION))
+        return result
+
+
+class LoadStageStats:
+    """
+    Stats of each stage of the load shape, taken as the difference of the cumulative stats at the stage transitions
+    """
+
+    def __init__(self, env_stats, stages: list):
+        self.env_stats = env_stats
+        self.stages = stages
+        self.start_time = None
+        self.current = None
+        self.results = []
+
+    def snapshot(self):
+        entries = [self.env_stats.total] + list(self.env_stats.entries.values())
+        return {"time": time.time(),
+                "entries": {e.name: (e.num_requests, e.num_failures) for e in entries},
+                "histograms": copy.deepcopy(concurrent_global_params.latency_histograms)}
+
+    def transition(self, index: int):
+        """ Called by the load shape once the stage changes """
+        if self.current is not None:
+            self.finish_stage()
+        stage = self.stages[index]
+        # transition markers are parsed from the log and reported to influxdb as the tag of following stats
+        log.info("[LoadShape] Stage transition: stage={0} index={1} users={2} spawn_rate={3}".format(
+            stage["name"], index, stage[pn.users], stage[pn.spawn_rate]))
+        self.current = (index, self.snapshot())
+        if self.start_time is None:
+            self.start_time = self.current[1]["time"]
+
+    def finish_stage(self):
+        index, start = self.current
+        end = self.snapshot()
+        duration = end["time"] - start["time"]
+
+        stats = {}
+        total_histogram = None
+        for name, (requests, failures) in end["entries"].items():
+            _requests, _failures = start["entries"].get(name, (0, 0))
+            histogram = None
+            if name in end["histograms"]:
+                histogram = end["histograms"][name]
+                if name in start["histograms"]:
+                    histogram = histogram.subtract(start["histograms"][name])
+                total_histogram = copy.deepcopy(histogram) if total_histogram is None else \
+                    total_histogram.merge(histogram)
+            stats[name] = self.get_stage_values(requests - _requests, failures - _failures, duration, histogram)
+        stats[self.env_stats.total.name].update(self.get_stage_values(
+            0, 0, duration, total_histogram, counts=False))
+
+        stage = self.stages[index]
+        self.results.append({"stage": stage["name"], "index": index, pn.users: stage[pn.users],
+                             pn.spawn_rate: stage[pn.spawn_rate],
+                             "start": round(start["time"] - self.start_time, Precision.CONCURRENT_PRECISION),
+                             pn.duration: round(duration, Precision.CONCURRENT_PRECISION), "stats": stats})
+        self.current = None
+
+    def finish(self):
+        if self.current is not None:
+            self.finish_stage()
+        return self.results
+
+    @staticmethod
+    def get_stage_values(requests, failures, duration, histogram: LatencyHistogram = None, counts=True):
+        result = {"Requests": requests, "Fails": failures,
+                  "RPS": round(requests / duration, Precision.CONCURRENT_PRECISION) if duration else 0,
+                  "fail_s": round(failures / requests, Precision.CONCURRENT_PRECISION) if requests else 0} \
+            if counts else {}
+        if histogram is not None and histogram.total > 0:
+            result["RT_avg"] = round(histogram.mean, Precision.CONCURRENT_PRECISION)
+            result.update(histogram.percentiles_report(precision=Precision.CONCURRENT_PRECISION))
+        return result
+
+
+class StagesShape(LoadTestShape):
+    """ Run the stages of the load shape in order, the last stage lasts until the runner quits """
+
+    def __init__(self, stages: list, stage_stats: LoadStageStats = None):
+        super().__init__()
+        self.stages = stages
+        self.stage_stats = stage_stats
+        self.stage_index = None
+        self.ends = []
+        for stage in stages:
+            self.ends.append((self.ends[-1] if self.ends else 0) + stage[pn.duration])
+
+    def get_stage_index(self, run_time):
+        for i, end in enumerate(self.ends):
+            if run_time < end:
+                return i
+        return len(self.stages) - 1
+
+    def tick(self):
+        index = self.get_stage_index(self.get_run_time())
+        if index != self.stage_index:
+            self.stage_index = index
+            if self.stage_stats is not None:
+                self.stage_stats.transition(index)
+        stage = self.stages[index]
+        return stage[pn.users], stage[pn.spawn_rate]
 
 
 class MyUser(User):
     pass
 
 
+def on_worker_report(client_id, data):
+    """ Merge the latency histograms reported by workers on the master """
+    concurrent_global_params.merge_latency(data.get("latency_histograms", {}))
+    if "open_loop" in data:
+        concurrent_global_params.open_loop_reports[client_id] = data["open_loop"]
+
+
+def on_report_to_master(client_id, data):
+    """ Send the latency histograms recorded since the last report from workers """
+    data["latency_histograms"] = concurrent_global_params.dump_latency(reset=True)
+    if concurrent_global_params.open_loop_scheduler is not None:
+        data["open_loop"] = concurrent_global_params.open_loop_scheduler.report()
+
+
 class LocustRunner:
     def __init__(self, obj: callable, obj_params: ConcurrentTasksParams, interval: int = 20, during_time: int = 60,
-                 concurrent_number: int = 5, spawn_rate: int = None, request_type="grpc"):
+                 concurrent_number: int = 5, spawn_rate: int = None, request_type="grpc",
+                 workers: int = dv.default_locust_workers, arrival_rates: dict = None,
+                 arrival_distribution=dv.default_arrival_distribution, load_shape: dict = None):
         """
         :param obj: callable object of test
         :param obj_params: parameters of callable object
@@ -91,6 +223,13 @@ class LocustRunner:
         :param concurrent_number: int
         :param spawn_rate: int
         :param request_type: type of test request
+        :param workers: number of locust worker processes, run users in the current process if 0,
+                        one worker per cpu core if less than 0
+        :param arrival_rates: open-loop mode if set, target requests per second of each task type,
+                              concurrent_number is the max number of requests in flight
+        :param arrival_distribution: poisson or uniform inter-arrival times of the open-loop mode
+        :param load_shape: declarative load shape, the number of users changes by stages instead of concurrent_number,
+                           and the concurrency lasts the total time of stages instead of during_time
         """
         self.obj = obj
         self.obj_params = obj_params
@@ -99,8 +238,27 @@ class LocustRunner:
         self.concurrent_number = concurrent_number
         self.spawn_rate = spawn_rate if spawn_rate is not None else get_spawn_rate(self.concurrent_number)
         self.request_type = request_type
+        self.workers = workers
+        self.arrival_rates = arrival_rates or {}
+        self.arrival_distribution = arrival_distribution
+        self.load_stages = get_load_shape_stages(load_shape) if load_shape else []
+        if self.load_stages:
+            self.during_time = sum(stage[pn.duration] for stage in self.load_stages)
+            log.info("[LocustRunner] Load shape stages: {0}, total time: {1}s".format(
+                self.load_stages, self.during_time))
 
     def get_client_tasks(self):
+        if self.arrival_rates:
+            for name in self.arrival_rates.keys():
+                if name not in self.obj_params.all_obj:
+                    msg = "[LocustRunner] Task type:{0} of arrival rates not support, please check!!!".format(name)
+                    log.error(msg)
+                    raise Exception(msg)
+            # each user sends the arrivals of all the task types in the open-loop mode
+            MyUser.tasks.append(MyTaskSet.open_loop)
+            log.debug("[LocustRunner] Open-loop arrival rates: {}".format(self.arrival_rates))
+            return
+
         # MyUser.tasks = [MyTaskSet.search, MyTaskSet.query]
         for o in self.obj_params.all_obj:
             for w in range(eval("self.obj_params.{0}.weight".format(o))):
@@ -120,14 +278,49 @@ class LocustRunner:
         log.debug(
             f"[LocustRunner] Reset tasks:{MyUser.tasks}, client:{MyUser.client}, tasks_params:{MyUser.tasks_params}")
 
+    def get_open_loop_report(self):
+        if not self.arrival_rates:
+            return {}
+        if self.workers:
+            return OpenLoopScheduler.merge_reports(list(concurrent_global_params.open_loop_reports.values()))
+        return concurrent_global_params.open_loop_scheduler.report()
+
     def start_runner(self, report_obj: CasesReport = CasesReport()):
         self.reset_my_user_params()
         MyUser.client = ClientTask(self.obj, request_type=self.request_type)
         MyUser.tasks_params = self.obj_params
         self.get_client_tasks()
 
-        env = Environment(events=events, user_classes=[MyUser])
-        runner = env.create_local_runner()
+        # the write rate of insert requests is controlled by the rate limiter of the task
+        rate_limiter = getattr(self.obj_params.insert.params, "rate_limiter", None)
+        if rate_limiter is not None:
+            rate_limiter.reset()
+
+        # latency of each request is recorded by the client task, and reported by workers in the multi-process mode
+        concurrent_global_params.reset_latency()
+        # arrivals are scheduled in the process running users
+        concurrent_global_params.open_loop_reports = {}
+        concurrent_global_params.open_loop_scheduler = OpenLoopScheduler(
+            self.arrival_rates, self.arrival_distribution) if self.arrival_rates and not self.workers else None
+
+        shape, stage_stats = None, None
+        if self.load_stages:
+            shape = StagesShape(self.load_stages)
+        env = Environment(events=events, user_classes=[MyUser], shape_class=shape)
+        locust_workers = None
+        if self.workers:
+            events.worker_report.add_listener(on_worker_report)
+            # users run in worker processes, stats reported by workers are merged into env.stats of the master
+            locust_workers = LocustWorkers(obj=self.obj, obj_params=self.obj_params, workers=self.workers,
+                                           request_type=self.request_type, arrival_rates=self.arrival_rates,
+                                           arrival_distribution=self.arrival_distribution,
+                                           locust_patch_switch=param_info.locust_patch_switch)
+            runner = env.create_master_runner(master_bind_host=locust_workers.master_host,
+                                              master_bind_port=locust_workers.master_port)
+            locust_workers.start()
+            locust_workers.wait_ready(runner)
+        else:
+            runner = env.create_local_runner()
 
         # start to print statistical results regularly
         tick_stats = TickStatsPrinter(env_stats=env.stats, interval=self.interval)
@@ -135,18 +328,46 @@ class LocustRunner:
         # tick_stats._start_print_stats()
 
         # start the concurrency test
-        runner.start(self.concurrent_number, spawn_rate=self.spawn_rate)
-        gevent.spawn_later(self.during_time, lambda: runner.quit())
+        if shape is not None:
+            stage_stats = LoadStageStats(env_stats=env.stats, stages=self.load_stages)
+            shape.stage_stats = stage_stats
+            runner.start_shape()
+        else:
+            runner.start(self.concurrent_number, spawn_rate=self.spawn_rate)
+
+        def quit_runner():
+            if locust_workers is not None:
+                # workers send their final stats while stopping
+                runner.stop()
+            runner.quit()
+
+        gevent.spawn_later(self.during_time, quit_runner)
         # self._quit(self.during_time, runner.quit)
         runner.greenlet.join()
         # runner.stop()
 
         # Statistics for all interfaces
         api_result = tick_stats.final_result_status()
+        # each worker process limits the rate of its own share, which is not reported to the master
+        rate_report = rate_limiter.report() if rate_limiter is not None and locust_workers is None else None
+        open_loop_report = self.get_open_loop_report()
+        stages_report = stage_stats.finish() if stage_stats is not None else []
 
         # Stop printing interface results and runner
         runner.stop()
         tick_stats.stop_print_stats()
+        if locust_workers is not None:
+            locust_workers.stop()
+            events.worker_report.remove_listener(on_worker_report)
 
         result = True if api_result[env.stats.total.name]["Fails"] == float(0) else False
+        if rate_report is not None:
+            log.info("[LocustRunner] Rate-limited insert report: {}".format(rate_report))
+            report_obj.add_attr(**{"insert_rate": rate_report})
+        if stages_report:
+            log.info("[LocustRunner] Load shape stages report: {}".format(stages_report))
+            report_obj.add_attr(**{"load_stages": stages_report})
+        if open_loop_report:
+            log.info("[LocustRunner] Open-loop arrivals report: {}".format(open_loop_report))
+            report_obj.add_attr(**{"open_loop": open_loop_report})
         return report_obj.add_attr(**{"Locust": api_result}).to_dict(), result
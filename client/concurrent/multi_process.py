@@ -0,0 +1,150 @@
+import copy
+import socket
+import time
+import multiprocessing
+import gevent
+
+from client.cases.base import get_connect_params
+from client.common.common_type import IdAllocator, TokenBucket, OpenLoopScheduler, concurrent_global_params
+from client.common.common_type import DefaultValue as dv
+from client.parameters.params import ConcurrentTasksParams, ConcurrentObjParams
+from client.concurrent.gevent_patch import patch_gevent
+
+from commons.common_type import LogLevel
+from utils.util_log import log
+
+
+def get_free_port(host=dv.default_locust_master_host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def get_worker_tasks_params(obj_params: ConcurrentTasksParams, workers: int) -> ConcurrentTasksParams:
+    """ The rate limiters of tasks are split equally by the workers, each worker limits its own share """
+    _params = copy.copy(obj_params)
+    for o in _params.all_obj:
+        task = getattr(_params, o)
+        rate_limiter = getattr(task.params, "rate_limiter", None)
+        if isinstance(rate_limiter, TokenBucket):
+            task_params = copy.copy(task.params)
+            task_params.rate_limiter = TokenBucket(rate_limiter.rate / workers, rate_limiter.burst / workers)
+            setattr(_params, o, ConcurrentObjParams(type=task.type, weight=task.weight, params=task_params))
+    return _params
+
+
+def get_worker_arrival_rates(arrival_rates: dict, workers: int) -> dict:
+    """ Each worker schedules its share of the open-loop arrivals """
+    return {name: rate / workers for name, rate in (arrival_rates or {}).items()}
+
+
+def _locust_worker(worker_id: int, obj_class: type, connect_params: dict, collection_name: str,
+                   obj_params: ConcurrentTasksParams, master_host: str, master_port: int, id_allocator: IdAllocator,
+                   request_type: str, arrival_rates: dict, arrival_distribution: str, locust_patch_switch: bool):
+    """ Run in a spawned process, connect to the server and the master, and run users dispatched by the master """
+    # the spawned process is patched in the same way as the master, locust is imported after patching
+    patch_gevent(locust_patch_switch)
+    from locust import events
+    from locust.env import Environment
+    from client.concurrent.locust_client import ClientTask
+    from client.concurrent.locust_runner import LocustRunner, MyUser, on_report_to_master
+
+    # ids of concurrent insert and upsert requests are allocated from the counter shared by all the workers
+    concurrent_global_params.id_allocator = id_allocator
+
+    obj = obj_class()
+    obj.connect(log_level=LogLevel.DEBUG, **connect_params)
+    try:
+        obj.connect_collection(collection_name)
+        obj.get_collection_schema()
+
+        LocustRunner.reset_my_user_params()
+        MyUser.client = ClientTask(obj, request_type=request_type)
+        MyUser.tasks_params = obj_params
+        LocustRunner(obj=obj, obj_params=obj_params, arrival_rates=arrival_rates,
+                     arrival_distribution=arrival_distribution).get_client_tasks()
+
+        concurrent_global_params.reset_latency()
+        concurrent_global_params.open_loop_scheduler = OpenLoopScheduler(
+            arrival_rates, arrival_distribution) if arrival_rates else None
+        events.report_to_master.add_listener(on_report_to_master)
+
+        env = Environment(events=events, user_classes=[MyUser])
+        runner = env.create_worker_runner(master_host, master_port)
+        log.debug("[LocustWorkers] Worker {0} connected to master {1}:{2}".format(worker_id, master_host, master_port))
+        runner.greenlet.join()
+    finally:
+        obj.remove_connect(log_level=LogLevel.DEBUG)
+
+
+class LocustWorkers:
+    """
+    Spawn locust workers in local processes, so that the client side of requests is not limited to one cpu core,
+    each worker has its own connection and runs the same tasks, users are dispatched and stats are merged by the master
+    """
+
+    def __init__(self, obj, obj_params: ConcurrentTasksParams, workers: int = None,
+                 master_host=dv.default_locust_master_host, master_port: int = None, request_type="grpc",
+                 arrival_rates: dict = None, arrival_distribution=dv.default_arrival_distribution,
+                 locust_patch_switch=False):
+        """
+        :param obj: object of the test, its class is instantiated in each worker
+        :param workers: number of worker processes, one worker per cpu core if None or less than 1
+        :param locust_patch_switch: workers patch ssl for gevent if True, the same as the master process
+        """
+        self.obj = obj
+        self.obj_params = obj_params
+        self.workers = workers if workers and workers > 0 else multiprocessing.cpu_count()
+        self.master_host = master_host
+        self.master_port = master_port or get_free_port(master_host)
+        self.request_type = request_type
+        self.arrival_rates = arrival_rates
+        self.arrival_distribution = arrival_distribution
+        self.locust_patch_switch = locust_patch_switch
+        self.processes = []
+        self.id_allocator = None
+
+    def start(self):
+        # do not fork the grpc channels and gevent hub of the current process
+        ctx = multiprocessing.get_context("spawn")
+        self.id_allocator = IdAllocator(start=concurrent_global_params.id_allocator.next_id, ctx=ctx)
+        obj_params = get_worker_tasks_params(self.obj_params, self.workers)
+        arrival_rates = get_worker_arrival_rates(self.arrival_rates, self.workers)
+
+        for i in range(self.workers):
+            p = ctx.Process(target=_locust_worker, daemon=True, args=(
+                i, self.obj.__class__, get_connect_params(), self.obj.collection_wrap.name, obj_params,
+                self.master_host, self.master_port, self.id_allocator, self.request_type, arrival_rates,
+                self.arrival_distribution, self.locust_patch_switch))
+            p.start()
+            self.processes.append(p)
+        log.info("[LocustWorkers] Started {0} locust workers, master: {1}:{2}".format(
+            self.workers, self.master_host, self.master_port))
+
+    def wait_ready(self, runner, timeout=dv.default_locust_worker_timeout):
+        """ Wait until all the workers are connected to the master runner """
+        start = time.time()
+        while len(runner.clients.ready) < self.workers:
+            if not all(p.is_alive() for p in self.processes):
+                msg = "[LocustWorkers] Locust worker exited before connecting to the master, please check."
+                log.error(msg)
+                raise Exception(msg)
+            if time.time() - start > timeout:
+                msg = "[LocustWorkers] Only {0}/{1} locust workers are ready after {2}s".format(
+                    len(runner.clients.ready), self.workers, timeout)
+                log.error(msg)
+                raise Exception(msg)
+            gevent.sleep(0.5)
+        log.info("[LocustWorkers] All {} locust workers are ready".format(self.workers))
+
+    def stop(self, timeout=dv.default_locust_worker_timeout):
+        for p in self.processes:
+            p.join(timeout)
+            if p.is_alive():
+                log.warning("[LocustWorkers] Terminate locust worker process {}".format(p.pid))
+                p.terminate()
+        self.processes.clear()
+
+        # the following requests of the current process continue with ids after the workers
+        if self.id_allocator is not None:
+            concurrent_global_params.id_allocator.reset(start=self.id_allocator.next_id)
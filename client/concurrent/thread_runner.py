@@ -0,0 +1,228 @@
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from client.cases.case_report import CasesReport
+from client.common.common_func import get_spawn_rate
+from client.common.common_type import Precision, LatencyHistogram, OpenLoopScheduler, concurrent_global_params
+from client.common.common_type import DefaultValue as dv
+from client.parameters.params import ConcurrentTasksParams
+from utils.util_log import log
+
+
+class RequestStats:
+    """
+    Thread-safe statistics of the concurrent requests, the results have the same structure as the locust runner
+    """
+    total_name = "Aggregated"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.failures = {}
+        self.start_time = None
+        self.stop_time = None
+
+    def start(self):
+        with self._lock:
+            self.histograms, self.failures = {}, {}
+            self.start_time, self.stop_time = time.perf_counter(), None
+
+    def stop(self):
+        with self._lock:
+            self.stop_time = time.perf_counter()
+
+    def record(self, name: str, response_time: float, success: bool):
+        """ :param response_time: ms, requests finished after stopping are not counted like the locust runner """
+        with self._lock:
+            if self.stop_time is not None:
+                return
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram(scale=1e3)
+                self.failures[name] = 0
+            self.histograms[name].record_value(response_time)
+            if not success:
+                self.failures[name] += 1
+
+    def result_status(self):
+        with self._lock:
+            duration = (self.stop_time or time.perf_counter()) - self.start_time if self.start_time else 0
+            total = LatencyHistogram(scale=1e3)
+            for h in self.histograms.values():
+                total.merge(h)
+            api_result = {self.total_name: self.get_result_values(total, sum(self.failures.values()), duration)}
+            for name in sorted(self.histograms.keys()):
+                api_result[name] = self.get_result_values(self.histograms[name], self.failures[name], duration)
+        return api_result
+
+    @staticmethod
+    def get_result_values(histogram: LatencyHistogram, failures: int, duration: float):
+        requests = histogram.total
+        return {"Requests": requests,
+                "Fails": failures,
+                "RPS": round(requests / duration, Precision.CONCURRENT_PRECISION) if duration else 0,
+                "fail_s": round(failures / requests, Precision.CONCURRENT_PRECISION) if requests else 0,
+                "RT_max": round(histogram.max, Precision.CONCURRENT_PRECISION),
+                "RT_avg": round(histogram.mean, Precision.CONCURRENT_PRECISION),
+                **histogram.percentiles_report(precision=Precision.CONCURRENT_PRECISION)}
+
+    def print_stats(self):
+        for name, values in self.result_status().items():
+            log.info("[RequestStats] {0}: {1}".format(name, values))
+
+
+class ThreadRunner:
+    """
+    Run the concurrent tasks of LocustRunner without gevent monkey patching: users are coroutines of an asyncio
+    event loop, and each request is sent in a thread pool with one thread per user, grpc calls release the GIL,
+    the threads are bounded by max_threads, so the requests in flight are at most max_threads
+    """
+
+    def __init__(self, obj: callable, obj_params: ConcurrentTasksParams, interval: int = 20, during_time: int = 60,
+                 concurrent_number: int = 5, spawn_rate: int = None, request_type="grpc",
+                 workers: int = dv.default_locust_workers, arrival_rates: dict = None,
+                 arrival_distribution=dv.default_arrival_distribution, load_shape: dict = None,
+                 max_threads: int = dv.default_thread_runner_max_threads):
+        """
+        :param obj: callable object of test
+        :param obj_params: parameters of callable object
+        :param interval: interval for printing statistics / second
+        :param during_time: concurrency lasts time / second
+        :param concurrent_number: number of users, which is the max number of requests in flight
+        :param spawn_rate: users started per second
+        :param request_type: type of test request
+        :param workers: not supported, all the users run in the current process
+        :param arrival_rates: open-loop mode if set, target requests per second of each task type
+        :param arrival_distribution: poisson or uniform inter-arrival times of the open-loop mode
+        :param load_shape: not supported, the number of users is fixed
+        :param max_threads: upper limit of the threads sending requests, users beyond it wait for a free thread
+        """
+        self.obj = obj
+        self.obj_params = obj_params
+        self.interval = interval
+        self.during_time = during_time
+        self.concurrent_number = concurrent_number
+        self.spawn_rate = spawn_rate if spawn_rate is not None else get_spawn_rate(self.concurrent_number)
+        if int(self.spawn_rate) < 1:
+            msg = "[ThreadRunner] Spawn rate:{0} of {1} users should be at least 1, please check.".format(
+                self.spawn_rate, self.concurrent_number)
+            log.error(msg)
+            raise Exception(msg)
+        self.spawn_rate = int(self.spawn_rate)
+        self.request_type = request_type
+        self.arrival_rates = arrival_rates or {}
+        self.arrival_distribution = arrival_distribution
+        if load_shape:
+            msg = "[ThreadRunner] Load shape is not supported by the thread backend, please use the locust backend."
+            log.error(msg)
+            raise Exception(msg)
+        if workers:
+            log.warning("[ThreadRunner] Locust workers are not supported, all users run in the current process.")
+        self.max_threads = max(min(self.concurrent_number, int(max_threads)), 1)
+        if self.concurrent_number > self.max_threads:
+            log.warning("[ThreadRunner] {0} users are more than the max threads, at most {1} requests are in flight, "
+                        "please use the locust backend for more.".format(self.concurrent_number, self.max_threads))
+
+        self.tasks = []
+        self.scheduler = None
+        self.stats = RequestStats()
+
+    def get_client_tasks(self):
+        """ Task types repeated by their weights, which is the same as the tasks of MyUser """
+        self.tasks = []
+        for o in self.obj_params.all_obj:
+            self.tasks.extend([o] * getattr(self.obj_params, o).weight)
+        for name in self.arrival_rates.keys():
+            if name not in self.obj_params.all_obj:
+                msg = "[ThreadRunner] Task type:{0} of arrival rates not support, please check!!!".format(name)
+                log.error(msg)
+                raise Exception(msg)
+        if not self.tasks and not self.arrival_rates:
+            msg = "[ThreadRunner] No concurrent tasks to run, please check the weight of tasks."
+            log.error(msg)
+            raise Exception(msg)
+        log.debug("[ThreadRunner] All concurrent tasks: {}".format(self.tasks))
+
+    def send_request(self, name: str, intended_time: float = None):
+        """ Run in the thread pool, the response time of open-loop requests is counted from the intended send time """
+        func = getattr(self.obj, "concurrent_{0}".format(name))
+        start = time.perf_counter() if intended_time is None else intended_time
+        try:
+            result = func(getattr(self.obj_params, name).params)
+        except Exception as e:
+            # counted as a failed request with the elapsed time, like the request fired by the locust client
+            log.error("[ThreadRunner] Task {0} raised an exception: {1}".format(name, e))
+            self.stats.record(name, (time.perf_counter() - start) * 1000, False)
+            return
+        rt = (time.perf_counter() - intended_time) * 1000 if intended_time is not None else result.rt * 1000
+        self.stats.record(name, rt, result.check_result)
+
+    async def user(self, loop, executor):
+        while True:
+            if self.scheduler is not None:
+                name, intended_time = self.scheduler.next_arrival()
+                delay = intended_time - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                name, intended_time = random.choice(self.tasks), None
+            await loop.run_in_executor(executor, self.send_request, name, intended_time)
+
+    async def print_stats(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.stats.print_stats()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        users = []
+        with ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="ThreadRunner") as executor:
+            self.stats.start()
+            printer = asyncio.ensure_future(self.print_stats())
+            deadline = loop.time() + self.during_time
+            for i in range(self.concurrent_number):
+                if loop.time() >= deadline:
+                    break
+                users.append(asyncio.ensure_future(self.user(loop, executor)))
+                if (i + 1) % self.spawn_rate == 0:
+                    await asyncio.sleep(1)
+            log.info("[ThreadRunner] {} users are started".format(len(users)))
+
+            await asyncio.sleep(max(deadline - loop.time(), 0))
+            self.stats.stop()
+            for t in users + [printer]:
+                t.cancel()
+            await asyncio.gather(*users, printer, return_exceptions=True)
+            # leaving the executor waits for the requests in flight, which are not counted
+        log.info("[ThreadRunner] All {} users are stopped".format(len(users)))
+
+    def start_runner(self, report_obj: CasesReport = CasesReport()):
+        self.get_client_tasks()
+
+        # the write rate of insert requests is controlled by the rate limiter of the task
+        rate_limiter = getattr(self.obj_params.insert.params, "rate_limiter", None)
+        if rate_limiter is not None:
+            rate_limiter.reset()
+        self.scheduler = OpenLoopScheduler(self.arrival_rates, self.arrival_distribution) \
+            if self.arrival_rates else None
+        concurrent_global_params.request_type = self.request_type
+
+        asyncio.run(self.run())
+
+        log.info("Print thread runner final stats.")
+        self.stats.print_stats()
+        api_result = self.stats.result_status()
+
+        result = True if api_result[RequestStats.total_name]["Fails"] == 0 else False
+        if rate_limiter is not None:
+            rate_report = rate_limiter.report()
+            log.info("[ThreadRunner] Rate-limited insert report: {}".format(rate_report))
+            report_obj.add_attr(**{"insert_rate": rate_report})
+        if self.scheduler is not None:
+            open_loop_report = self.scheduler.report()
+            log.info("[ThreadRunner] Open-loop arrivals report: {}".format(open_loop_report))
+            report_obj.add_attr(**{"open_loop": open_loop_report})
+        # the same structure as the locust runner, so that the results are shown in the same way
+        return report_obj.add_attr(**{"Locust": api_result}).to_dict(), result
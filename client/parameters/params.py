@@ -4,8 +4,8 @@ from dataclasses import dataclass, field
 from typing import Optional, Union, List
 
 from client.common.common_func import (
-    gen_combinations, update_dict_value, loop_ids, gen_vectors, get_default_field_name, gen_unique_str)
-from client.common.common_type import concurrent_global_params, DefaultValue
+    gen_combinations, update_dict_value, gen_vectors, get_default_field_name, gen_unique_str)
+from client.common.common_type import concurrent_global_params, DefaultValue, TokenBucket
 from client.parameters.params_name import *
 
 
@@ -24,6 +24,9 @@ class ParamsBase:
     concurrent_tasks: Optional[list] = field(default_factory=lambda: [])
     resource_groups_params: Optional[dict] = field(default_factory=lambda: {})
     database_user_params: Optional[dict] = field(default_factory=lambda: {})
+    bulk_insert_params: Optional[dict] = field(default_factory=lambda: {})
+    insert_tuner_params: Optional[dict] = field(default_factory=lambda: {})
+    measurement_params: Optional[dict] = field(default_factory=lambda: {})
 
     @staticmethod
     def search_params_parser(_params):
@@ -46,7 +49,14 @@ class ParamsFormat:
             scalars_index: ([type(list())], OPTION),
             scalars_params: ([type(dict())], OPTION),
             show_resource_groups: ([type(bool())], OPTION),
-            show_db_user: ([type(bool())], OPTION)
+            show_db_user: ([type(bool())], OPTION),
+            random_seed: ([type(int())], OPTION),
+            read_prefetch: ([type(int())], OPTION),
+            insert_workers: ([type(int())], OPTION),
+            insert_worker_type: ([type(str())], OPTION),
+            target_rows_per_sec: ([type(int()), type(float())], OPTION),
+            burst: ([type(int())], OPTION),
+            ann_cache: ([type(bool())], OPTION)
         },
         collection_params: {other_fields: ([type(list())], OPTION),
                             shards_num: ([type(int())], OPTION),
@@ -69,7 +79,32 @@ class ParamsFormat:
         resource_groups_params: {groups: ([type(list()), type(dict()), type(None)], OPTION),
                                  reset: ([type(bool())], OPTION)},
         database_user_params: {reset_rbac: ([type(bool())], OPTION),
-                               reset_db: ([type(bool())], OPTION)}
+                               reset_db: ([type(bool())], OPTION)},
+        bulk_insert_params: {prepare_bulk_insert: ([type(bool())], OPTION),
+                             bulk_insert_tasks: ([type(int())], OPTION),
+                             rows_per_task: ([type(int())], OPTION),
+                             minio_endpoint: ([type(str())], OPTION),
+                             minio_access_key: ([type(str())], OPTION),
+                             minio_secret_key: ([type(str())], OPTION),
+                             minio_bucket_name: ([type(str())], OPTION),
+                             minio_secure: ([type(bool())], OPTION),
+                             remote_path: ([type(str())], OPTION),
+                             timeout: ([type(int())], OPTION)},
+        insert_tuner_params: {ni_range: ([type(list())], OPTION),
+                              probe_batches: ([type(int())], OPTION),
+                              latency_bound: ([type(int()), type(float())], OPTION),
+                              max_message_size: ([type(int())], OPTION),
+                              tolerance: ([type(float())], OPTION),
+                              max_probes: ([type(int())], OPTION)},
+        measurement_params: {warmup_time: ([type(int()), type(float())], OPTION),
+                             steady_window: ([type(int())], OPTION),
+                             steady_tolerance: ([type(float())], OPTION),
+                             ci_target: ([type(float())], OPTION),
+                             ci_statistic: ([type(str())], OPTION),
+                             confidence: ([type(float())], OPTION),
+                             min_counts: ([type(int())], OPTION),
+                             max_counts: ([type(int()), type(None)], OPTION),
+                             time_budget: ([type(int()), type(float())], OPTION)}
     }
 
     acc_scene_recall = update_dict_value({
@@ -90,6 +125,18 @@ class ParamsFormat:
                          ni_per: ([type(list())], MUST)},
     }, base)
 
+    common_scene_insert_batch_tuner = update_dict_value({
+        dataset_params: {dataset_name: ([type(str())], MUST),
+                         dim: ([type(int())], MUST)},
+    }, base)
+
+    common_scene_bulk_insert = update_dict_value({
+        dataset_params: {dataset_name: ([type(str())], MUST),
+                         dim: ([type(int())], MUST),
+                         dataset_size: ([type(str()), type(int())], MUST)},
+        bulk_insert_params: {bulk_insert_tasks: ([type(int()), type(list())], OPTION)},
+    }, base)
+
     common_scene_build_index = update_dict_value({
         dataset_params: {dataset_name: ([type(str())], MUST),
                          dim: ([type(int())], MUST),
@@ -149,12 +196,27 @@ class ParamsFormat:
                            interval: ([type((int()))], MUST)}
     }, common_scene_build_index)
 
+    common_scene_search_pareto = update_dict_value({
+        concurrent_params: {concurrent_number: ([type((int())), type(list())], MUST),
+                            during_time: ([type((int())), type((str()))], MUST),
+                            interval: ([type((int()))], MUST),
+                            spawn_rate: ([type((int())), type(None)], OPTION),
+                            locust_workers: ([type((int()))], OPTION),
+                            concurrent_backend: ([type(str())], OPTION)
+                            },
+    }, common_scene_search_recall)
+
     common_concurrent = update_dict_value({
         load_params: {prepare_load: ([type(bool())], OPTION)},
         concurrent_params: {concurrent_number: ([type((int())), type(list())], MUST),
                             during_time: ([type((int())), type((str()))], MUST),
                             interval: ([type((int()))], MUST),
-                            spawn_rate: ([type((int())), type(None)], OPTION)
+                            spawn_rate: ([type((int())), type(None)], OPTION),
+                            locust_workers: ([type((int()))], OPTION),
+                            arrival_rates: ([type(dict()), type(list())], OPTION),
+                            arrival_distribution: ([type(str()), type(list())], OPTION),
+                            concurrent_backend: ([type(str())], OPTION),
+                            load_shape: ([type(dict()), type(list())], OPTION)
                             },
         concurrent_tasks: ([type(list())], MUST)
     }, common_scene_build_index)
@@ -290,19 +352,18 @@ class ConcurrentTaskUpsert(DataClassBase):
     random_vector: Optional[bool] = False
     varchar_filled: Optional[bool] = False
 
-    _loop_ids = None
     fixed_ids = None
     fixed_vectors = None
 
     def set_params(self):
-        self._loop_ids = loop_ids(step=self.upsert_number)
         self.fixed_ids = [k for k in range(self.upsert_number)]
         self.fixed_vectors = gen_vectors(self.upsert_number, self.dim)
 
     @property
     def get_ids(self):
         if self.random_id:
-            _ids = next(self._loop_ids)
+            # ids are allocated from the shared counter, do not overlap with other tasks and users
+            _ids = concurrent_global_params.id_allocator.allocate_array(self.upsert_number)
             concurrent_global_params.put_data_to_insert_queue(concurrent_global_params.concurrent_insert_ids, _ids)
             return _ids
         concurrent_global_params.put_data_to_insert_queue(
@@ -350,6 +411,10 @@ class ConcurrentInputParamsInsert(DataClassBase):
     random_vector: Optional[bool] = False
     varchar_filled: Optional[bool] = False
 
+    # rows inserted per second by all users, not limited if None
+    target_rows_per_sec: Optional[Union[int, float]] = None
+    burst: Optional[int] = None
+
 
 @dataclass
 class ConcurrentTaskInsert(DataClassBase):
@@ -362,19 +427,25 @@ class ConcurrentTaskInsert(DataClassBase):
     random_vector: Optional[bool] = False
     varchar_filled: Optional[bool] = False
 
-    _loop_ids = None
+    target_rows_per_sec: Optional[Union[int, float]] = None
+    burst: Optional[int] = None
+
     fixed_ids = None
     fixed_vectors = None
+    # shared by all users of the process
+    rate_limiter = None
 
     def set_params(self):
-        self._loop_ids = loop_ids(step=self.nb)
         self.fixed_ids = [k for k in range(self.nb)]
         self.fixed_vectors = gen_vectors(self.nb, self.dim)
+        if self.target_rows_per_sec:
+            self.rate_limiter = TokenBucket(self.target_rows_per_sec, self.burst)
 
     @property
     def get_ids(self):
         if self.random_id:
-            _ids = next(self._loop_ids)
+            # ids are allocated from the shared counter, do not overlap with other tasks and users
+            _ids = concurrent_global_params.id_allocator.allocate_array(self.nb)
             concurrent_global_params.put_data_to_insert_queue(concurrent_global_params.concurrent_insert_ids, _ids)
             return _ids
         concurrent_global_params.put_data_to_insert_queue(
@@ -457,19 +528,17 @@ class ConcurrentTaskSceneInsertDeleteFlush(DataClassBase):
     random_vector: Optional[bool] = False
     varchar_filled: Optional[bool] = False
 
-    _loop_ids = None
     fixed_ids = None
     fixed_vectors = None
 
     def set_params(self):
-        self._loop_ids = loop_ids(step=self.insert_length)
         self.fixed_ids = [k for k in range(self.insert_length)]
         self.fixed_vectors = gen_vectors(self.insert_length, self.dim)
 
     @property
     def get_insert_ids(self):
         if self.random_id:
-            _ids = next(self._loop_ids)
+            _ids = concurrent_global_params.id_allocator.allocate_array(self.insert_length)
             concurrent_global_params.put_data_to_insert_queue(
                 concurrent_global_params.concurrent_insert_delete_flush, _ids)
             return _ids
@@ -15,6 +15,9 @@ concurrent_params = "concurrent_params"
 concurrent_tasks = "concurrent_tasks"
 resource_groups_params = "resource_groups_params"
 database_user_params = "database_user_params"
+bulk_insert_params = "bulk_insert_params"
+insert_tuner_params = "insert_tuner_params"
+measurement_params = "measurement_params"
 
 # request type
 search = "search"
@@ -50,6 +53,13 @@ scalars_index = "scalars_index"
 scalars_params = "scalars_params"
 show_resource_groups = "show_resource_groups"
 show_db_user = "show_db_user"
+random_seed = "random_seed"
+read_prefetch = "read_prefetch"
+insert_workers = "insert_workers"
+insert_worker_type = "insert_worker_type"
+target_rows_per_sec = "target_rows_per_sec"
+burst = "burst"
+ann_cache = "ann_cache"
 
 # common
 metric_type = "metric_type"
@@ -74,6 +84,36 @@ upsert_number = "upsert_number"
 # flush
 prepare_flush = "prepare_flush"
 
+# bulk insert
+prepare_bulk_insert = "prepare_bulk_insert"
+bulk_insert_tasks = "bulk_insert_tasks"
+rows_per_task = "rows_per_task"
+minio_endpoint = "minio_endpoint"
+minio_access_key = "minio_access_key"
+minio_secret_key = "minio_secret_key"
+minio_bucket_name = "minio_bucket_name"
+minio_secure = "minio_secure"
+remote_path = "remote_path"
+
+# insert tuner
+ni_range = "ni_range"
+probe_batches = "probe_batches"
+latency_bound = "latency_bound"
+max_message_size = "max_message_size"
+tolerance = "tolerance"
+max_probes = "max_probes"
+
+# measurement
+warmup_time = "warmup_time"
+steady_window = "steady_window"
+steady_tolerance = "steady_tolerance"
+ci_target = "ci_target"
+ci_statistic = "ci_statistic"
+confidence = "confidence"
+min_counts = "min_counts"
+max_counts = "max_counts"
+time_budget = "time_budget"
+
 # index
 index_type = "index_type"
 index_param = "index_param"
@@ -103,6 +143,26 @@ interval = "interval"
 
 # concurrent
 spawn_rate = "spawn_rate"
+locust_workers = "locust_workers"
+arrival_rates = "arrival_rates"
+arrival_distribution = "arrival_distribution"
+concurrent_backend = "concurrent_backend"
+
+# load shape
+load_shape = "load_shape"
+shape_type = "type"
+stages = "stages"
+users = "users"
+duration = "duration"
+start_users = "start_users"
+end_users = "end_users"
+step_users = "step_users"
+steps = "steps"
+step_duration = "step_duration"
+spike_users = "spike_users"
+spike_duration = "spike_duration"
+amplitude = "amplitude"
+period = "period"
 
 
 # resource groups
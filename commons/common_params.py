@@ -16,6 +16,10 @@ class EnvVariable:
     FOURAM_LOG_LEVEL = "FOURAM_LOG_LEVEL"
     LOG_LEVEL = BaseConfig.get_env_variable(default_var=FOURAM_LOG_LEVEL, default_value="INFO").upper()
 
+    FOURAM_ANN_CACHE_DIR_NAME = "FOURAM_ANN_CACHE_DIR"
+    # the cache is next to the hdf5 files if not set
+    FOURAM_ANN_CACHE_DIR = BaseConfig.get_env_variable(default_var=FOURAM_ANN_CACHE_DIR_NAME, default_value="")
+
     WORK_DIR_NAME = "FOURAM_WORK_DIR"
     WORK_DIR = BaseConfig.get_env_variable(default_var=WORK_DIR_NAME, default_value="/Users/wt/Desktop/")
 
@@ -1,6 +1,8 @@
 import pytest
 
-from client.cases import AccCases, InsertBatch, BuildIndex, Load, Query, Search, SearchRecall, GoBenchCases
+from client.cases import (
+    AccCases, InsertBatch, InsertBatchTuner, BulkInsert, BuildIndex, Load, Query, Search, SearchRecall, GoBenchCases,
+    SearchPareto)
 from client.parameters.input_params import (
     AccParams, InsertBatchParams, BuildIndexParams, LoadParams, QueryParams, SearchParams, GoBenchParams)
 from client.parameters import params_name as pn
@@ -606,6 +608,22 @@ class TestPerformanceCases(PerfTemplate):
         self.serial_template(input_params=input_params, cpu=dp.default_cpu, mem=dp.default_mem, deploy_mode=CLUSTER,
                              case_callable_obj=InsertBatch().scene_insert_batch)
 
+    def test_insert_batch_tuner_custom_parameters(self, input_params: InputParamsBase):
+        """
+        :test steps:
+            1. probe batch sizes of insert and choose the ni with the max VPS
+        """
+        self.serial_template(input_params=input_params, cpu=dp.default_cpu, mem=dp.default_mem, deploy_mode=CLUSTER,
+                             case_callable_obj=InsertBatchTuner().scene_insert_batch_tuner)
+
+    def test_bulk_insert_custom_parameters(self, input_params: InputParamsBase):
+        """
+        :test steps:
+            1. bulk insert and calculation of bulk insert time
+        """
+        self.serial_template(input_params=input_params, cpu=dp.default_cpu, mem=dp.default_mem, deploy_mode=CLUSTER,
+                             case_callable_obj=BulkInsert().scene_bulk_insert)
+
     @pytest.mark.insert
     @pytest.mark.parametrize("deploy_mode", [STANDALONE])
     def test_batch_insert_standalone(self, input_params: InputParamsBase, deploy_mode):
@@ -877,6 +895,15 @@ class TestPerformanceCases(PerfTemplate):
         self.serial_template(input_params=input_params, cpu=dp.default_cpu, mem=dp.default_mem, deploy_mode=deploy_mode,
                              case_callable_obj=SearchRecall().scene_search_recall, default_case_params=case_params)
 
+    def test_search_pareto_custom_parameters(self, input_params: InputParamsBase):
+        """
+        :test steps:
+            1. sweep search_param, calculation of recall and concurrent search RPS
+            2. get the pareto frontier of recall and RPS
+        """
+        self.concurrency_template(input_params=input_params, cpu=dp.default_cpu, mem=dp.default_mem,
+                                  deploy_mode=STANDALONE, case_callable_obj=SearchPareto().scene_search_pareto)
+
 
 class TestGoBenchCases(PerfTemplate):
     """
@@ -0,0 +1,26 @@
+import numpy as np
+from pymilvus import DataType
+
+from client.common import common_func
+from client.common.common_bulk_insert import gen_column_array
+
+
+def test_gen_column_array_binary_vectors():
+    dim = 16
+    bits = np.random.randint(2, size=(5, dim))
+    values = common_func.normalize_data(common_func.SimilarityMetrics.Hamming, bits)
+
+    array = gen_column_array(DataType.BINARY_VECTOR, values, dim)
+    assert array.dtype == np.uint8
+    assert array.shape == (5, dim // 8)
+    assert np.array_equal(array, np.packbits(bits, axis=-1))
+
+    # binary vectors already packed into uint8 arrays are kept
+    packed = gen_column_array(DataType.BINARY_VECTOR, np.packbits(bits, axis=-1), dim)
+    assert np.array_equal(packed, array)
+
+
+def test_gen_column_array_float_vectors():
+    array = gen_column_array(DataType.FLOAT_VECTOR, [[1, 2], [3, 4]], 2)
+    assert array.dtype == np.float32
+    assert array.shape == (2, 2)
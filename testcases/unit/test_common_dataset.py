@@ -0,0 +1,54 @@
+import os
+import json
+
+from client.common import common_func
+from client.common.common_dataset import build_dataset
+from client.common.common_type import DatasetDistribution, ScalarDatasetType
+
+
+def build_small_dataset(path, monkeypatch, processes):
+    monkeypatch.setitem(common_func.DatasetPath, "random", str(path / "random") + "/")
+    monkeypatch.setitem(common_func.ScalarDatasetPath, "laion2b_int64", str(path / "laion2b_int64") + "/")
+    return build_dataset("random", 8, 250, shard_size=100, nq=10, seed=1,
+                         distribution=DatasetDistribution.GAUSSIAN_MIXTURE, clusters=4,
+                         scalars={"laion2b_int64": ScalarDatasetType.INT64}, processes=processes)
+
+
+def read_files(path):
+    files = {}
+    for root, _, names in os.walk(str(path)):
+        for name in names:
+            with open(os.path.join(root, name), "rb") as f:
+                files[os.path.relpath(os.path.join(root, name), str(path))] = f.read()
+    return files
+
+
+def test_build_dataset_deterministic(tmp_path, monkeypatch):
+    info_1 = build_small_dataset(tmp_path / "1", monkeypatch, processes=1)
+    info_2 = build_small_dataset(tmp_path / "2", monkeypatch, processes=3)
+    assert info_1["rows"] == info_2["rows"] == 250
+    assert info_1["shards"] == info_2["shards"] == 3
+    assert os.path.basename(info_1["query_file"]) == "query_8.npy"
+
+    manifest_name = os.path.basename(common_func.gen_manifest_file_name(8, "random"))
+    files_1, files_2 = read_files(tmp_path / "1"), read_files(tmp_path / "2")
+    manifest_1, manifest_2 = [json.loads(files.pop(os.path.join("random", manifest_name)))
+                              for files in [files_1, files_2]]
+    # shards are built by the seed of each shard, whatever the number of processes
+    assert sorted(files_1.keys()) == sorted(files_2.keys())
+    assert len(files_1) == 3 + 1 + 3
+    assert all(files_1[k] == files_2[k] for k in files_1.keys())
+
+    # only the mtime of the manifest changes
+    for manifest in [manifest_1, manifest_2]:
+        for shard in manifest["shards"].values():
+            shard.pop("mtime")
+    assert manifest_1 == manifest_2
+    assert [s["rows"] for _, s in sorted(manifest_1["shards"].items())] == [100, 100, 50]
+
+
+def test_build_dataset_without_query_file(tmp_path, monkeypatch):
+    monkeypatch.setitem(common_func.DatasetPath, "jaccard", str(tmp_path) + "/")
+    info = build_dataset("jaccard", 8, 10, seed=1, processes=1)
+    assert info["query_file"] is None
+    assert not os.path.isfile(str(tmp_path / "query_8.npy"))
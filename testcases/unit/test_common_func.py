@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+
+from client.common.common_func import gen_bool_values
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_gen_bool_values_same_as_row_by_row():
+    ids = np.arange(-1050, 1050, dtype=np.int64)
+    # the values generated row by row before vectorizing
+    expected = [bool(sum(np.fromstring(str(_id), dtype=np.uint8)) & 1) for _id in ids]
+    assert gen_bool_values(ids).tolist() == expected
+    assert gen_bool_values(np.array([2 ** 62, -(2 ** 62)], dtype=np.int64)).tolist() == [
+        bool(sum(np.fromstring(str(_id), dtype=np.uint8)) & 1) for _id in [2 ** 62, -(2 ** 62)]]
@@ -0,0 +1,78 @@
+import numpy as np
+from pymilvus import DataType
+
+from client.common import common_func
+from client.common import common_ground_truth
+from client.common.common_ground_truth import (
+    compute_ground_truth, read_query_vectors, get_ground_truth_ids, get_filter_ground_truth_ids)
+
+
+def prepare_dataset(tmp_path, monkeypatch, datasets: dict, data_type="random"):
+    """ :param datasets: {dim: (vectors, queries)}, the files of all the dims are in the same path """
+    for dim, (vectors, queries) in datasets.items():
+        np.save(str(tmp_path / "vectors_{}d.npy".format(dim)), vectors)
+        np.save(str(tmp_path / "query_{}.npy".format(dim)), queries, allow_pickle=True)
+
+    def get_dataset_shards(dim, data_type, data_size):
+        file_name = str(tmp_path / "vectors_{}d.npy".format(dim))
+        return [dict(common_func.gen_shard_info(file_name), file_name=file_name)]
+
+    monkeypatch.setitem(common_ground_truth.DatasetPath, data_type, str(tmp_path) + "/")
+    monkeypatch.setattr(common_ground_truth, "get_dataset_shards", get_dataset_shards)
+    monkeypatch.setattr(common_ground_truth, "get_query_file_name",
+                        lambda dim, data_type: str(tmp_path / "query_{}.npy".format(dim)))
+
+
+def test_read_query_vectors_object_file(tmp_path, monkeypatch):
+    queries = np.random.random((4, 8)).astype(np.float32)
+    object_queries = np.empty(4, dtype=object)
+    object_queries[:] = list(queries)
+    prepare_dataset(tmp_path, monkeypatch, {8: (queries, object_queries)})
+
+    vectors = read_query_vectors(8, "cohere", nq=2)
+    assert vectors.shape == (2, 8)
+    assert np.array_equal(vectors, queries[:2])
+
+
+def test_compute_ground_truth_nq(tmp_path, monkeypatch):
+    vectors = np.random.random((100, 8)).astype(np.float32)
+    prepare_dataset(tmp_path, monkeypatch, {8: (vectors, vectors[:10])})
+
+    true_ids = compute_ground_truth("sift", 8, 100, "L2", top_k=5, processes=1, nq=3)
+    assert true_ids.shape == (3, 5)
+    assert np.array_equal(true_ids[:, 0], np.arange(3))
+
+
+def test_compute_ground_truth_unsupported_metric():
+    assert compute_ground_truth("binary", 128, 100, "JACCARD") == []
+
+
+def test_get_ground_truth_ids_dims(tmp_path, monkeypatch):
+    vectors_8d = np.random.random((200, 8)).astype(np.float32)
+    vectors_16d = np.random.random((200, 16)).astype(np.float32)
+    prepare_dataset(tmp_path, monkeypatch, {8: (vectors_8d, vectors_8d[:3]), 16: (vectors_16d, vectors_16d[5:8])})
+
+    true_ids_8d = get_ground_truth_ids(200, "random", dim=8, metric_type="L2", top_k=10, nq=3)
+    true_ids_16d = get_ground_truth_ids(200, "random", dim=16, metric_type="L2", top_k=10, nq=3)
+    assert np.array_equal(true_ids_8d[:, 0], [0, 1, 2])
+    assert np.array_equal(true_ids_16d[:, 0], [5, 6, 7])
+
+    # the cached ground truth of each dim is read back
+    assert np.array_equal(get_ground_truth_ids(200, "random", dim=8, metric_type="L2", top_k=10, nq=3), true_ids_8d)
+    assert len(list(tmp_path.glob("gnd/*.ivecs"))) == 2
+
+
+def test_get_filter_ground_truth_ids_dims(tmp_path, monkeypatch):
+    vectors_8d = np.random.random((200, 8)).astype(np.float32)
+    vectors_16d = np.random.random((200, 16)).astype(np.float32)
+    prepare_dataset(tmp_path, monkeypatch, {8: (vectors_8d, vectors_8d[100:103]),
+                                            16: (vectors_16d, vectors_16d[105:108])})
+    schema = {"fields": [{"name": "id", "type": DataType.INT64}]}
+
+    true_ids_8d, selectivity = get_filter_ground_truth_ids(200, "random", 8, "L2", "id >= 100", schema, top_k=10, nq=3)
+    true_ids_16d, _ = get_filter_ground_truth_ids(200, "random", 16, "L2", "id >= 100", schema, top_k=10, nq=3)
+    assert selectivity == 0.5
+    assert np.array_equal(true_ids_8d[:, 0], [100, 101, 102])
+    assert np.array_equal(true_ids_16d[:, 0], [105, 106, 107])
+    assert (true_ids_16d >= 100).all()
+    assert len(list(tmp_path.glob("gnd/*.ivecs"))) == 2
@@ -0,0 +1,91 @@
+import time
+import numpy as np
+
+from client.common import common_func, common_reader
+from client.common.common_reader import (
+    seek_scalar_arrays, gen_scalar_values, PrefetchFilesReader, ArraysBatchCursor, read_shards_batches)
+
+
+def prepare_scalar_files(tmp_path, monkeypatch, rows=(10, 20, 30), dataset_name="laion2b_int64"):
+    monkeypatch.setitem(common_func.ScalarDatasetPath, dataset_name, str(tmp_path) + "/")
+    start = 0
+    for i, r in enumerate(rows):
+        np.save(common_func.gen_scalar_file_name(i, dataset_name), np.arange(start, start + r, dtype=np.int64))
+        start += r
+    return dataset_name
+
+
+def record_read_files(monkeypatch):
+    read_files = []
+    read_scalar_file = common_reader.read_scalar_file
+
+    def _read(file_name):
+        read_files.append(file_name)
+        return read_scalar_file(file_name)
+
+    monkeypatch.setattr(common_reader, "read_scalar_file", _read)
+    return read_files
+
+
+def test_seek_scalar_arrays_skip_shards(tmp_path, monkeypatch):
+    dataset_name = prepare_scalar_files(tmp_path, monkeypatch)
+    read_files = record_read_files(monkeypatch)
+
+    cursor = seek_scalar_arrays(dataset_name, start_row=35)
+    assert cursor.next_batch(10).tolist() == list(range(35, 45))
+    # the first two files before the start row are not read
+    assert read_files == [common_func.gen_scalar_file_name(2, dataset_name)]
+
+
+def test_seek_scalar_arrays_wrap_around(tmp_path, monkeypatch):
+    dataset_name = prepare_scalar_files(tmp_path, monkeypatch)
+
+    cursor = seek_scalar_arrays(dataset_name, start_row=55)
+    assert cursor.next_batch(10).tolist() == list(range(55, 60)) + list(range(0, 5))
+    assert seek_scalar_arrays(dataset_name, start_row=60 + 12).next_batch(3).tolist() == [12, 13, 14]
+
+
+def test_gen_scalar_values_start_row(tmp_path, monkeypatch):
+    dataset_name = prepare_scalar_files(tmp_path, monkeypatch)
+    read_files = record_read_files(monkeypatch)
+    scalars_params = {"int64_1": {"params": {}, "other_params": {"dataset": dataset_name}}}
+
+    values = next(gen_scalar_values(scalars_params, insert_length=5, start_row=30))
+    assert values["int64_1"]["default_value"].tolist() == list(range(30, 35))
+    assert read_files == [common_func.gen_scalar_file_name(2, dataset_name)]
+
+
+def test_prefetch_stall_time_slow_read():
+    def slow_read(file_name):
+        time.sleep(0.05)
+        return file_name
+
+    reader = PrefetchFilesReader(iter(range(4)), read_func=slow_read, prefetch=1)
+    try:
+        assert list(reader) == [0, 1, 2, 3]
+    finally:
+        reader.stop()
+    # the insert does not wait for a file that is ready, so the stall is the time of the slow reads
+    assert reader.stall_time >= 0.15
+    assert reader.read_counts == 4
+
+
+def test_read_shards_batches(tmp_path):
+    shards = []
+    for i, (start, rows) in enumerate([(0, 10), (10, 15)]):
+        file_name = str(tmp_path / "vectors_{}.npy".format(i))
+        np.save(file_name, np.arange(start, start + rows, dtype=np.float32).reshape(-1, 1))
+        shards.append(dict(common_func.gen_shard_info(file_name), file_name=file_name))
+
+    batches = list(read_shards_batches(shards, batch_rows=4, offset=3, rows=15))
+    # the rows are copied from the memory-mapped files by the prefetch thread
+    assert all(type(b) is np.ndarray for b in batches)
+    assert np.concatenate(batches).ravel().tolist() == list(range(3, 18))
+
+    reader = PrefetchFilesReader(read_shards_batches(shards, batch_rows=4, offset=3, rows=15), read_func=None)
+    cursor = ArraysBatchCursor(reader)
+    try:
+        assert cursor.next_batch(4).ravel().tolist() == [3, 4, 5, 6]
+        assert cursor.next_batch(6).ravel().tolist() == list(range(7, 13))
+    finally:
+        reader.stop()